@@ -0,0 +1,197 @@
+# acquisition_worker.py
+"""
+Hilo de adquisición: único dueño del enlace serial del SR400 en la interfaz
+"""
+
+import math
+import time
+import queue
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from sr400_controller import CommandPriority, DiscriminatorChannel
+
+@dataclass
+class AcquisitionSnapshot:
+    """Última lectura publicada por el hilo de adquisición"""
+    timestamp: float
+    count_rates: dict = field(default_factory=dict)
+    discriminator_levels: dict = field(default_factory=dict)
+    is_counting: bool = False
+
+class AcquisitionWorker(QThread):
+    """
+    Sondea el SR400 a un ritmo configurable y publica snapshots por señales Qt.
+    Las acciones de la UI se encolan con submit() y se ejecutan entre sondeos,
+    de modo que nunca se intercalan comandos en el puerto serial.
+    """
+    snapshot_ready = pyqtSignal(object)
+    request_finished = pyqtSignal(object, object)
+    error = pyqtSignal(str)
+
+    def __init__(self, sr400, interval: float=0.5, status_every: int=2, history=None, parent=None):
+        super().__init__(parent)
+        self.sr400 = sr400
+        #CountHistory opcional donde se acumula cada lectura
+        self.history = history
+        #SessionWriter opcional: guarda en disco las lecturas mientras hay conteo
+        self.recorder = None
+        self.interval = interval
+        #Los niveles de discriminador se leen cada status_every sondeos
+        self.status_every = max(1, status_every)
+        self._requests: queue.Queue = queue.Queue()
+        self._running = False
+        self._last_levels = {}
+
+        self.request_finished.connect(self._deliver_result)
+
+    def set_interval(self, seconds: float):
+        """Cambia el periodo de sondeo (segundos)"""
+        self.interval = max(0.05, seconds)
+
+    def submit(self, function: Callable, *args, callback: Optional[Callable]=None):
+        """Encola una acción sobre el SR400; callback recibe el resultado en el hilo de la UI"""
+        self._requests.put((function, args, callback))
+
+    def stop(self):
+        """Detiene el hilo y espera a que termine"""
+        self._running = False
+        self._requests.put(None)
+        self.wait(2000)
+
+    def run(self):
+        self._running = True
+        cycle = 0
+        next_poll = time.monotonic()
+        while self._running:
+            #Las acciones del usuario despiertan al hilo de inmediato
+            timeout = max(0.0, next_poll - time.monotonic())
+            try:
+                request = self._requests.get(timeout=timeout)
+            except queue.Empty:
+                request = None
+            if request is not None:
+                self._execute(request)
+                continue
+            if not self._running:
+                break
+
+            next_poll = time.monotonic() + self.interval
+            if self.sr400.is_connected:
+                try:
+                    #Los sondeos ceden el puerto a las acciones del usuario y a las mediciones
+                    with self.sr400.priority(CommandPriority.STATUS):
+                        snapshot = self._poll(cycle % self.status_every == 0)
+                    self._record(snapshot)
+                    self.snapshot_ready.emit(snapshot)
+                except Exception as e:
+                    self.error.emit(f"Error en adquisición: {str(e)}")
+            cycle += 1
+
+    def _execute(self, request):
+        function, args, callback = request
+        try:
+            result = function(*args)
+        except Exception as e:
+            self.error.emit(f"Error ejecutando comando: {str(e)}")
+            result = None
+        if callback:
+            self.request_finished.emit(callback, result)
+
+    def _deliver_result(self, callback, result):
+        try:
+            callback(result)
+        except Exception as e:
+            print(f"Error en callback de adquisición: {e}")
+
+    def _record(self, snapshot: AcquisitionSnapshot):
+        """Guarda las tasas del snapshot en el historial y la sesión (NaN si no hubo lectura)"""
+        rate_a = snapshot.count_rates.get('A')
+        rate_b = snapshot.count_rates.get('B')
+        sample = (snapshot.timestamp,
+                  math.nan if rate_a is None else rate_a,
+                  math.nan if rate_b is None else rate_b)
+        if self.history is not None:
+            self.history.append(*sample)
+        recorder = self.recorder
+        if recorder is not None and snapshot.is_counting:
+            recorder.append(*sample)
+
+    def _poll(self, read_status: bool) -> AcquisitionSnapshot:
+        """Lee tasas de conteo y, cuando toca, los niveles de discriminador"""
+        if read_status:
+            self._last_levels = {
+                'A': self.sr400.get_discriminator_level(DiscriminatorChannel.A),
+                'B': self.sr400.get_discriminator_level(DiscriminatorChannel.B),
+            }
+        return AcquisitionSnapshot(
+            timestamp=time.time(),
+            count_rates={
+                'A': self.sr400.get_count_rate('A'),
+                'B': self.sr400.get_count_rate('B'),
+            },
+            discriminator_levels=dict(self._last_levels),
+            is_counting=self.sr400.is_counting,
+        )
+
+class ReplayWorker(AcquisitionWorker):
+    """
+    Reproduce una sesión guardada (session_replay.SessionReplay) con la interfaz de
+    AcquisitionWorker: las muestras van al historial y al recorder, y en cada tick se
+    publica un snapshot con la última. La interfaz no distingue la reproducción de
+    una adquisición real.
+    """
+    replay_finished = pyqtSignal()
+
+    def __init__(self, replay, interval: float=0.05, history=None, parent=None):
+        super().__init__(None, interval=interval, history=history, parent=parent)
+        self.replay = replay
+
+    def stop(self):
+        """Detiene la reproducción y espera a que termine el hilo"""
+        self.replay.stop()
+        super().stop()
+
+    def run(self):
+        self._running = True
+        try:
+            for block in self.replay.blocks(tick=self.interval):
+                self._execute_pending()
+                if not self._running:
+                    break
+                if len(block):
+                    self._publish(block)
+        except Exception as e:
+            self.error.emit(f"Error en reproducción: {str(e)}")
+        finally:
+            self.replay_finished.emit()
+
+    def _execute_pending(self):
+        #Acciones encoladas con submit() entre bloques
+        while True:
+            try:
+                request = self._requests.get_nowait()
+            except queue.Empty:
+                return
+            if request is not None:
+                self._execute(request)
+
+    def _publish(self, block):
+        """Agrega el bloque al historial/sesión y publica la última muestra"""
+        times, rates_a, rates_b = block['timestamp'], block['count_a'], block['count_b']
+        if self.history is not None:
+            self.history.extend(times, rates_a, rates_b)
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.extend(times, rates_a, rates_b)
+        settings = self.replay.settings()
+        rate_a, rate_b = float(rates_a[-1]), float(rates_b[-1])
+        self.snapshot_ready.emit(AcquisitionSnapshot(
+            timestamp=float(times[-1]),
+            count_rates={'A': None if math.isnan(rate_a) else rate_a,
+                         'B': None if math.isnan(rate_b) else rate_b},
+            discriminator_levels={'A': settings.get('DL0'), 'B': settings.get('DL1')},
+            is_counting=True,
+        ))
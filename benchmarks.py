@@ -0,0 +1,348 @@
+# benchmarks.py
+"""
+Benchmarks del controlador, el simulador y el análisis.
+
+Uso:
+    python benchmarks.py                      # ejecutar y comparar con la línea base
+    python benchmarks.py --save               # guardar los resultados como línea base
+    python benchmarks.py -k scurve --repeat 3 # solo los casos que contienen "scurve"
+
+Los casos de E/S usan el SR400 virtual (sr400_virtual) sobre un pty, así que miden
+el camino real de la clase SR400 sin hardware. Sale con código 1 si algún caso es
+más lento que la línea base por encima de la tolerancia.
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+import contextlib
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import sr400_controller as controller
+from sr400_controller import SR400, SR400Simulator, DiscriminatorChannel
+from sr400_virtual import VirtualSR400
+from count_history import CountHistory
+from decimation import MinMaxPyramid
+from instrument_manager import InstrumentManager
+from scurve_analysis import fit_s_curves
+from session_store import SessionReader, SessionWriter
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks_baseline.json")
+
+#Registro de casos: nombre -> (fábrica del contexto, repeticiones)
+BENCHMARKS: Dict[str, tuple] = {}
+
+def benchmark(name: str, repeat: int=5):
+    """
+    Registra un caso. La función es un context manager que prepara lo necesario
+    y entrega la operación a medir; lo que sigue al yield es la limpieza.
+    """
+    def register(function):
+        BENCHMARKS[name] = (contextmanager(function), repeat)
+        return function
+    return register
+
+#-----Instrumentos compartidos ------
+class _Devices:
+    """SR400 conectados a dispositivos virtuales, uno por baudrate, reutilizados entre casos"""
+
+    def __init__(self):
+        self._open = {}
+
+    def get(self, baudrate: int) -> SR400:
+        if baudrate not in self._open:
+            device = VirtualSR400(baudrate=baudrate, seed=1)
+            device.start()
+            sr400 = SR400(device.port, baudrate=baudrate)
+            with _quiet():
+                if not sr400.connect():
+                    device.stop()
+                    raise RuntimeError(f"No se pudo conectar al SR400 virtual a {baudrate} baud")
+            self._open[baudrate] = (device, sr400)
+        return self._open[baudrate][1]
+
+    def close(self):
+        for device, sr400 in self._open.values():
+            with _quiet():
+                sr400.disconnect()
+            device.stop()
+        self._open.clear()
+
+DEVICES = _Devices()
+
+@contextmanager
+def _quiet():
+    """Silencia los print del controlador durante la medición"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+#-----Casos ------
+def _serial_cases(baudrate: int):
+    @benchmark(f"query_roundtrip_{baudrate}", repeat=50)
+    def query_roundtrip():
+        sr400 = DEVICES.get(baudrate)
+        yield lambda: sr400.query("XA")
+
+    @benchmark(f"get_status_{baudrate}", repeat=20)
+    def get_status():
+        sr400 = DEVICES.get(baudrate)
+        yield sr400.get_status
+
+    @benchmark(f"scurve_scan_100pts_{baudrate}", repeat=3)
+    def scurve_scan():
+        sr400 = DEVICES.get(baudrate)
+        yield lambda: sr400.measure_s_curve(DiscriminatorChannel.A, -0.1, 0.1, 100, dwell_time=1e-3)
+
+for _baudrate in (9600, 19200):
+    _serial_cases(_baudrate)
+
+@benchmark("scurve_host_10pts_19200", repeat=3)
+def scurve_host():
+    sr400 = DEVICES.get(19200)
+    yield lambda: sr400.measure_s_curve(DiscriminatorChannel.A, -0.1, 0.1, 10, dwell_time=1e-3, use_scan=False)
+
+def _manager_case(instruments: int):
+    @benchmark(f"manager_poll_{instruments}x_19200", repeat=20)
+    def manager_poll():
+        #Con un hilo de E/S por equipo el sondeo de N equipos tarda lo mismo que el de uno
+        devices = [VirtualSR400(baudrate=19200, seed=i) for i in range(instruments)]
+        manager = InstrumentManager()
+        for i, device in enumerate(devices):
+            manager.add(f"sr400_{i}", device.start(), baudrate=19200)
+        with _quiet():
+            manager.connect_all()
+        try:
+            yield manager.poll_rates
+        finally:
+            with _quiet():
+                manager.disconnect_all()
+            for device in devices:
+                device.stop()
+
+for _instruments in (1, 4):
+    _manager_case(_instruments)
+
+@benchmark("simulator_scurve_2000pts", repeat=20)
+def simulator_scurve():
+    simulator = SR400Simulator(seed=1)
+    yield lambda: simulator.measure_s_curve(DiscriminatorChannel.A, -0.3, 0.3, 2000, fast=True)
+
+@benchmark("simulator_1000_curves_x_500pts", repeat=10)
+def simulator_batch():
+    simulator = SR400Simulator(seed=1)
+    thresholds = np.linspace(-0.3, 0.3, 500)
+    yield lambda: simulator.simulate_s_curves(thresholds, 0.5, n_curves=1000)
+
+def _optimal_threshold_case(points: int):
+    @benchmark(f"find_optimal_threshold_{points}", repeat=10 if points < 10**6 else 3)
+    def find_optimal():
+        simulator = SR400Simulator(seed=1)
+        thresholds = np.linspace(-0.3, 0.3, points)
+        rates = simulator.simulate_s_curves(thresholds, 0.5)[0]
+        yield lambda: controller.find_optimal_threshold(thresholds, rates)
+
+for _points in (10, 1000, 10**5, 10**6):
+    _optimal_threshold_case(_points)
+
+@benchmark("fit_1000_curves_x_200pts", repeat=5)
+def fit_batch():
+    simulator = SR400Simulator(seed=1)
+    thresholds = np.linspace(-0.3, 0.3, 200)
+    rates = simulator.simulate_s_curves(thresholds, 0.5, n_curves=1000)
+    yield lambda: fit_s_curves(thresholds, rates)
+
+@benchmark("count_history_append_10k", repeat=10)
+def history_append():
+    history = CountHistory(capacity=4096)
+
+    def run():
+        for i in range(10_000):
+            history.append(i, 1.0, 2.0)
+    yield run
+
+@benchmark("minmax_pyramid_extend_1M", repeat=5)
+def pyramid_extend():
+    samples = np.arange(10**6, dtype=float)
+
+    def run():
+        pyramid = MinMaxPyramid(columns=2)
+        for start in range(0, len(samples), 4096):
+            block = samples[start:start + 4096]
+            pyramid.extend(block, block, block)
+    yield run
+
+@benchmark("minmax_pyramid_view_24h_window", repeat=10)
+def pyramid_view():
+    #Un día a 20 muestras/s, consultado a 2000 puntos como una gráfica de ~1000 px
+    pyramid = MinMaxPyramid(columns=2)
+    times = np.arange(24 * 3600 * 20, dtype=float) / 20
+    pyramid.extend(times, times, times)
+
+    def run():
+        for t_start in range(0, 24 * 3600, 3600):
+            level = pyramid.level_for(t_start, 24 * 3600, 2000)
+            pyramid.view(max(level, 1), t_start, 24 * 3600)
+    yield run
+
+@benchmark("session_write_1M_samples", repeat=3)
+def session_write():
+    root = tempfile.mkdtemp(prefix="sr400_bench_")
+    samples = np.arange(10**6, dtype=float)
+    counter = iter(range(10**9))
+
+    def run():
+        with SessionWriter(os.path.join(root, f"s{next(counter)}"), flush_interval=None) as writer:
+            writer.extend(samples, samples, samples)
+    try:
+        yield run
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+@benchmark("session_read_window_and_csv_100k", repeat=5)
+def session_read():
+    root = tempfile.mkdtemp(prefix="sr400_bench_")
+    path = os.path.join(root, "sesion")
+    samples = np.arange(10**6, dtype=float)
+    with SessionWriter(path, flush_interval=None) as writer:
+        writer.extend(samples, samples, samples)
+
+    def run():
+        reader = SessionReader(path)
+        reader.time_window(400_000, 500_000)['count_a'].sum()
+        reader.to_csv(os.path.join(root, "export.csv"), 0, 100_000)
+    try:
+        yield run
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+#-----Ejecución y comparación ------
+def run_benchmarks(pattern: str="", repeat: int=None) -> Tuple[Dict[str, dict], List[str]]:
+    """
+    Ejecuta los casos cuyo nombre contiene pattern; devuelve los tiempos en segundos
+    y los nombres de los casos que fallaron con una excepción
+    """
+    results = {}
+    failures = []
+    try:
+        for name, (case, default_repeat) in BENCHMARKS.items():
+            if pattern not in name:
+                continue
+            times = []
+            try:
+                with case() as operation:
+                    with _quiet():
+                        operation()  # calentamiento
+                    for _ in range(repeat or default_repeat):
+                        start = time.perf_counter()
+                        with _quiet():
+                            operation()
+                        times.append(time.perf_counter() - start)
+            except Exception as e:
+                print(f"❌ {name}: {e}")
+                failures.append(name)
+                continue
+            results[name] = {
+                'median': statistics.median(times),
+                'min': min(times),
+                'repeat': len(times),
+            }
+            print(f"⏱️ {name:<40} {_format_time(results[name]['median'])}  (min {_format_time(min(times))})")
+    finally:
+        DEVICES.close()
+    return results, failures
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """Casos cuya mediana supera la de la línea base por más de tolerance (fracción)"""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        ratio = result['median'] / reference['median'] if reference['median'] > 0 else float('inf')
+        marker = "✅"
+        if ratio > 1 + tolerance:
+            marker = "❌"
+            regressions.append(name)
+        print(f"{marker} {name:<40} {ratio:6.2f}x vs línea base")
+    return regressions
+
+def _format_time(seconds: float) -> str:
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:8.1f} µs"
+    if seconds < 1:
+        return f"{seconds * 1e3:8.2f} ms"
+    return f"{seconds:8.3f} s "
+
+def _machine_info() -> dict:
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+    }
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks del controlador SR400")
+    parser.add_argument("-k", "--filter", default="", help="solo casos cuyo nombre contiene este texto")
+    parser.add_argument("--repeat", type=int, default=None, help="repeticiones por caso")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="archivo JSON de línea base")
+    parser.add_argument("--save", action="store_true", help="guardar los resultados como línea base")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="regresión permitida sobre la mediana (0.25 = 25%%)")
+    parser.add_argument("--list", action="store_true", help="listar los casos y salir")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name in BENCHMARKS:
+            print(name)
+        return 0
+
+    results, failures = run_benchmarks(args.filter, args.repeat)
+    #Un caso roto es un fallo, no un caso menos en la comparación
+    status = 1 if failures else 0
+    if failures:
+        print(f"❌ {len(failures)} caso(s) fallaron: {', '.join(failures)}")
+
+    if args.save:
+        baseline = {'machine': _machine_info(), 'created': time.time(), 'results': {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding='utf-8') as f:
+                baseline = json.load(f)
+        #Se actualizan solo los casos ejecutados
+        baseline['results'].update(results)
+        baseline['machine'] = _machine_info()
+        baseline['updated'] = time.time()
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"💾 Línea base guardada en {args.baseline}")
+        return status
+
+    if not os.path.exists(args.baseline):
+        print("ℹ️ No hay línea base; use --save para crearla")
+        return status
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('machine') != _machine_info():
+        print("⚠️ La línea base se creó en otra máquina; la comparación es orientativa")
+    regressions = compare(results, baseline.get('results', {}), args.tolerance)
+    if regressions:
+        print(f"❌ {len(regressions)} caso(s) con regresión: {', '.join(regressions)}")
+        return 1
+    if not failures:
+        print("✅ Sin regresiones")
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
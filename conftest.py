@@ -0,0 +1,27 @@
+# conftest.py
+"""
+Fixtures compartidas de las pruebas: SR400 virtual sobre un pty y el cliente conectado
+"""
+
+import pytest
+
+from sr400_controller import SR400
+from sr400_virtual import VirtualSR400
+
+@pytest.fixture
+def device(tmp_path):
+    """SR400 virtual con semilla fija; el enlace simbólico sobrevive a drop_link()"""
+    virtual = VirtualSR400(baudrate=115200, seed=1, link=str(tmp_path / "sr400"))
+    virtual.start()
+    yield virtual
+    virtual.stop()
+
+@pytest.fixture
+def sr400(device):
+    """Cliente SR400 conectado al equipo virtual; los errores quedan en sr400.errors"""
+    client = SR400(device.port, baudrate=device.baudrate, timeout=0.3)
+    assert client.connect()
+    client.errors = []
+    client.on_error = client.errors.append
+    yield client
+    client.disconnect()
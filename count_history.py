@@ -0,0 +1,96 @@
+# count_history.py
+"""
+Historial de conteos de tamaño fijo (buffer circular preasignado)
+"""
+
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+
+class CountHistory:
+    """
+    Buffer circular de (timestamp, A, B) con memoria constante.
+
+    Cada muestra se escribe dos veces (posición i e i+capacity) para que las últimas
+    n muestras siempre formen un bloque contiguo: view() devuelve vistas de NumPy
+    sin copiar ni reordenar, y append() es O(1).
+
+    decimator: MinMaxPyramid opcional que recibe cada muestra (incluidas las que el
+    buffer ya descartó), para graficar ventanas más largas que capacity.
+    """
+
+    def __init__(self, capacity: int=100_000, decimator=None):
+        if capacity < 1:
+            raise ValueError("La capacidad debe ser positiva")
+        self.capacity = capacity
+        self._data = np.full((3, 2 * capacity), np.nan)
+        self._count = 0
+        self._lock = threading.Lock()
+        self.decimator = decimator
+
+    def __len__(self) -> int:
+        return min(self._count, self.capacity)
+
+    @property
+    def total(self) -> int:
+        """Muestras recibidas desde el último clear() (incluye las ya descartadas)"""
+        return self._count
+
+    def append(self, timestamp: float, count_a: float, count_b: float):
+        """Agrega una muestra; la más antigua se descarta cuando el buffer está lleno"""
+        with self._lock:
+            i = self._count % self.capacity
+            column = self._data[:, i]
+            column[0] = timestamp
+            column[1] = count_a
+            column[2] = count_b
+            self._data[:, i + self.capacity] = column
+            self._count += 1
+        if self.decimator is not None:
+            self.decimator.append(timestamp, count_a, count_b)
+
+    def extend(self, timestamps, counts_a, counts_b):
+        """Agrega un bloque de muestras (p.ej. de stream_counts) con escrituras vectorizadas"""
+        block = np.array([timestamps, counts_a, counts_b], dtype=float, ndmin=2)
+        if self.decimator is not None:
+            self.decimator.extend(block[0], block[1], block[2])
+        n = block.shape[1]
+        if n > self.capacity:
+            block = block[:, -self.capacity:]
+            skipped, n = n - self.capacity, self.capacity
+        else:
+            skipped = 0
+        with self._lock:
+            self._count += skipped
+            start = self._count % self.capacity
+            first = min(n, self.capacity - start)
+            for offset in (0, self.capacity):
+                self._data[:, offset + start:offset + start + first] = block[:, :first]
+                self._data[:, offset:offset + n - first] = block[:, first:]
+            self._count += n
+
+    def view(self, n: Optional[int]=None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Vistas (timestamps, A, B) de las últimas n muestras en orden cronológico.
+        Son válidas hasta el siguiente append: no se deben guardar.
+        """
+        with self._lock:
+            available = min(self._count, self.capacity)
+            n = available if n is None else max(0, min(n, available))
+            end = self._count % self.capacity + self.capacity
+            block = self._data[:, end - n:end]
+        return block[0], block[1], block[2]
+
+    def since(self, timestamp: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Vistas de las muestras con timestamp >= timestamp"""
+        times, _, _ = self.view()
+        start = int(np.searchsorted(times, timestamp))
+        return self.view(len(times) - start)
+
+    def clear(self):
+        """Vacía el historial sin liberar memoria"""
+        with self._lock:
+            self._count = 0
+        if self.decimator is not None:
+            self.decimator.clear()
@@ -0,0 +1,223 @@
+# decimation.py
+"""
+Pirámide min/max para graficar historiales muy largos.
+
+El nivel k agrupa factor**k muestras por cubeta y guarda, para cada columna, el
+mínimo y el máximo de la cubeta junto con su primer y último timestamp. Cada cubeta
+se dibuja como dos puntos (mínimo y máximo), así que un pico o una caída de una sola
+muestra sigue visible a cualquier nivel de zoom. El nivel 0 son las muestras
+originales y no se guarda aquí: se leen del almacén de origen (CountHistory o
+SessionReader).
+
+La pirámide se construye de forma incremental: append/extend solo tocan las
+cubetas que se completan, y cada nivel es un buffer circular con memoria acotada.
+Al consultar se elige el nivel con a lo sumo max_points puntos en la ventana,
+por lo que el costo de dibujar no depende de la longitud del historial.
+"""
+
+import threading
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+#Filas de una cubeta: primer timestamp, último timestamp, mínimos y máximos por columna
+T_FIRST, T_LAST = 0, 1
+
+class _Level:
+    """
+    Buffer circular de cubetas con el mismo doble escrito que CountHistory: las
+    últimas n cubetas siempre forman un bloque contiguo y ordenado por tiempo.
+    Crece por duplicación hasta capacity.
+    """
+
+    def __init__(self, rows: int, capacity: int, initial: int=1024):
+        self.capacity = capacity
+        self.size = min(initial, capacity)
+        self._data = np.full((rows, 2 * self.size), np.nan)
+        self.total = 0
+
+    def __len__(self) -> int:
+        return min(self.total, self.size)
+
+    def extend(self, block: np.ndarray):
+        n = block.shape[1]
+        if n == 0:
+            return
+        if self.total + n > self.size < self.capacity:
+            self._grow(self.total + n)
+        if n > self.size:
+            self.total += n - self.size
+            block, n = block[:, -self.size:], self.size
+        start = self.total % self.size
+        first = min(n, self.size - start)
+        for offset in (0, self.size):
+            self._data[:, offset + start:offset + start + first] = block[:, :first]
+            self._data[:, offset:offset + n - first] = block[:, first:]
+        self.total += n
+
+    def _grow(self, needed: int):
+        size = self.size
+        while size < needed and size < self.capacity:
+            size *= 2
+        size = min(size, self.capacity)
+        kept = self.view()[:, -size:]
+        self._data = np.full((self._data.shape[0], 2 * size), np.nan)
+        self.size, self.total = size, kept.shape[1]
+        self._data[:, :self.total] = kept
+        self._data[:, size:size + self.total] = kept
+
+    def view(self) -> np.ndarray:
+        end = self.total % self.size + self.size
+        return self._data[:, end - len(self):end]
+
+class MinMaxPyramid:
+    """
+    Pirámide min/max de columns columnas con marca de tiempo.
+
+    factor: muestras (o cubetas del nivel anterior) por cubeta
+    levels: número de niveles agregados (el nivel k agrupa factor**k muestras)
+    capacity: cubetas máximas por nivel; los niveles altos cubren más tiempo
+    """
+
+    def __init__(self, columns: int=2, factor: int=4, levels: int=9, capacity: int=65536):
+        if factor < 2:
+            raise ValueError("El factor de agrupación debe ser al menos 2")
+        if capacity < factor:
+            raise ValueError("La capacidad debe ser al menos igual al factor")
+        self.columns = columns
+        self.factor = factor
+        self.capacity = capacity
+        self._rows = 2 + 2 * columns
+        self._levels = [_Level(self._rows, capacity) for _ in range(levels)]
+        #Entradas del nivel anterior que aún no completan una cubeta (una por nivel)
+        self._pending = [np.empty((self._rows, 0)) for _ in range(levels)]
+        self._samples = 0
+        self._lock = threading.Lock()
+
+    @property
+    def levels(self) -> int:
+        return len(self._levels)
+
+    @property
+    def total(self) -> int:
+        """Muestras recibidas desde el último clear()"""
+        return self._samples
+
+    def append(self, timestamp: float, *values: float):
+        """Agrega una muestra (un valor por columna)"""
+        self.extend([timestamp], *[[value] for value in values])
+
+    def extend(self, timestamps, *columns):
+        """Agrega un bloque de muestras; solo se calculan las cubetas que se completan"""
+        if len(columns) != self.columns:
+            raise ValueError(f"Se esperaban {self.columns} columnas")
+        timestamps = np.asarray(timestamps, dtype=float)
+        values = np.array(columns, dtype=float, ndmin=2)
+        #Una muestra es una cubeta de nivel 0: mismo timestamp inicial y final, mínimo = máximo
+        block = np.concatenate((timestamps[None, :], timestamps[None, :], values, values))
+        with self._lock:
+            self._samples += len(timestamps)
+            for k, level in enumerate(self._levels):
+                block = self._merge(k, block)
+                if block.shape[1] == 0:
+                    break
+                level.extend(block)
+
+    def clear(self):
+        """Vacía la pirámide"""
+        with self._lock:
+            self._levels = [_Level(self._rows, self.capacity) for _ in self._levels]
+            self._pending = [np.empty((self._rows, 0)) for _ in self._pending]
+            self._samples = 0
+
+    def _merge(self, k: int, block: np.ndarray) -> np.ndarray:
+        """Agrupa las entradas pendientes del nivel k con block y devuelve las cubetas completas"""
+        entries = np.concatenate((self._pending[k], block), axis=1) if self._pending[k].shape[1] else block
+        full = entries.shape[1] // self.factor * self.factor
+        self._pending[k] = entries[:, full:].copy()
+        if full == 0:
+            return entries[:, :0]
+        groups = entries[:, :full].reshape(self._rows, -1, self.factor)
+        c = self.columns
+        buckets = np.empty((self._rows, groups.shape[1]))
+        buckets[T_FIRST] = groups[T_FIRST, :, 0]
+        buckets[T_LAST] = groups[T_LAST, :, -1]
+        #fmin/fmax ignoran NaN (lecturas perdidas); una cubeta sin lecturas queda en NaN
+        buckets[2:2 + c] = np.fmin.reduce(groups[2:2 + c], axis=2)
+        buckets[2 + c:] = np.fmax.reduce(groups[2 + c:], axis=2)
+        return buckets
+
+    def level_for(self, t_start: float, t_end: float, max_points: int,
+                  raw_from: Optional[float]=None) -> int:
+        """
+        Nivel a dibujar para la ventana [t_start, t_end): 0 (muestras originales) si son
+        a lo sumo max_points, si no el nivel más fino que cubre la ventana con a lo sumo
+        max_points puntos (dos por cubeta).
+
+        raw_from: timestamp más antiguo que conserva el almacén de origen (None si lo
+        conserva todo); antes de él no se elige el nivel 0
+        """
+        max_points = max(1, int(max_points))
+        raw_available = raw_from is None or t_start >= raw_from
+        with self._lock:
+            for k, level in enumerate(self._levels):
+                buckets = level.view()
+                if buckets.shape[1] == 0:
+                    return 0 if k == 0 else k
+                #Cubetas descartadas por el buffer circular: el nivel no cubre el inicio
+                if level.total > len(level) and buckets[T_FIRST, 0] > t_start:
+                    continue
+                first, last = self._bounds(buckets, t_start, t_end)
+                n = last - first
+                if raw_available and n * self.factor ** (k + 1) <= max_points:
+                    return 0
+                if 2 * n <= max_points:
+                    return k + 1
+            return len(self._levels)
+
+    def view(self, level: int, t_start: float, t_end: float) -> Tuple[np.ndarray, ...]:
+        """
+        (x, y_0, y_1, ...) de las cubetas del nivel (1..levels) que tocan la ventana,
+        dos puntos por cubeta: (primer timestamp, mínimo) y (último timestamp, máximo).
+        Son arreglos nuevos, listos para setData.
+        """
+        if not 1 <= level <= len(self._levels):
+            raise ValueError(f"Nivel fuera de rango: {level}")
+        with self._lock:
+            buckets = self._levels[level - 1].view()
+            first, last = self._bounds(buckets, t_start, t_end)
+            buckets = buckets[:, first:last]
+            c = self.columns
+            x = np.column_stack((buckets[T_FIRST], buckets[T_LAST])).ravel()
+            ys = [np.column_stack((buckets[2 + i], buckets[2 + c + i])).ravel() for i in range(c)]
+        return (x, *ys)
+
+    @staticmethod
+    def _bounds(buckets: np.ndarray, t_start: float, t_end: float) -> Tuple[int, int]:
+        #Cubetas con último timestamp >= t_start y primer timestamp < t_end
+        first = int(np.searchsorted(buckets[T_LAST], t_start))
+        last = int(np.searchsorted(buckets[T_FIRST], t_end))
+        return first, max(first, last)
+
+    @classmethod
+    def from_session(cls, reader, fields=("count_a", "count_b"), block_size: int=1 << 20,
+                     **kwargs) -> "MinMaxPyramid":
+        """Pirámide de una sesión guardada, leída por bloques sin cargarla completa"""
+        if 'timestamp' not in reader.fields:
+            raise ValueError("La sesión no tiene campo timestamp")
+        pyramid = cls(columns=len(fields), **kwargs)
+        for start in range(0, len(reader), block_size):
+            block = reader.window(start, start + block_size)
+            pyramid.extend(block['timestamp'], *[block[name] for name in fields])
+        return pyramid
+
+def select_level(pyramid: MinMaxPyramid, t_start: float, t_end: float, max_points: int,
+                 raw: Optional[Callable]=None, raw_from: Optional[float]=None) -> Tuple[int, Tuple[np.ndarray, ...]]:
+    """
+    Datos a dibujar en la ventana: raw(t_start, t_end) -> (x, y_0, ...) si las muestras
+    originales caben en max_points, si no las cubetas del nivel adecuado
+    """
+    level = pyramid.level_for(t_start, t_end, max_points, raw_from if raw is not None else float('inf'))
+    if level == 0 and raw is not None:
+        return 0, raw(t_start, t_end)
+    return level, pyramid.view(max(level, 1), t_start, t_end)
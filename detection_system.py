@@ -6,8 +6,22 @@ Sistema de detección automática de hardware SR400
 import serial.tools.list_ports
 import serial
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Iterator, List
+
+#Consulta de identificación: byte de estado y nivel del discriminador A.
+#El SR400 no tiene comando de identificación; una respuesta con el formato de
+#ambas consultas lo confirma (un eco o un equipo distinto no la produce)
+PROBE_COMMAND = b'SS;DZ0\r'
 
 class HardwareDetector:
+    #Tiempo de asentamiento tras abrir el puerto (los adaptadores USB no necesitan 2 s)
+    SETTLE_TIME = 0.1
+    #Límite compartido por todos los puertos en una detección concurrente
+    PROBE_DEADLINE = 3.0
+    READ_POLL_INTERVAL = 0.05
+
     @staticmethod
     def detect_sr400_ports():
         """Detectar puertos seriales que podrían ser el SR400"""
@@ -40,36 +54,137 @@ class HardwareDetector:
         return available_ports
     
     @staticmethod
-    def test_connection(port_name):
+    def test_connection(port_name, baudrate=9600, timeout=2.0, settle_time=None):
         """Probar conexión con un puerto específico"""
         print(f"🧪 Probando conexión con {port_name}...")
-        
+        result = HardwareDetector.probe_port(port_name, baudrate, timeout, settle_time)
+        print(f"   - Respuesta: '{result['response']}'")
+        return result['responded'], result['message']
+
+    @staticmethod
+    def probe_port(port_name, baudrate=9600, timeout=1.0, settle_time=None) -> dict:
+        """Prueba un solo puerto; el resultado indica si es un SR400 confirmado"""
+        return HardwareDetector._probe(port_name, baudrate, time.monotonic() + timeout,
+                                       settle_time, threading.Event())
+
+    @staticmethod
+    def probe_ports(ports=None, deadline=None, baudrate=9600, max_workers=8, stop_on_first=True) -> List[dict]:
+        """
+        Prueba todos los puertos en paralelo y devuelve los resultados ordenados:
+        SR400 confirmados primero, luego puertos con alguna respuesta y luego el resto
+        """
+        results = list(HardwareDetector.iter_probe_results(ports, deadline, baudrate, max_workers, stop_on_first))
+        return sorted(results, key=HardwareDetector._rank)
+
+    @staticmethod
+    def iter_probe_results(ports=None, deadline=None, baudrate=9600, max_workers=8,
+                           stop_on_first=True) -> Iterator[dict]:
+        """
+        Prueba los puertos en un pool de hilos con un límite de tiempo común y entrega
+        cada resultado al terminar. Con stop_on_first se detiene al confirmar un SR400;
+        los puertos sin terminar se entregan como no confirmados.
+
+        ports: lista de detect_sr400_ports() (por defecto se detectan)
+        deadline: segundos para toda la detección (por defecto PROBE_DEADLINE)
+        """
+        if ports is None:
+            ports = HardwareDetector.detect_sr400_ports()
+        if not ports:
+            return
+        deadline = time.monotonic() + (HardwareDetector.PROBE_DEADLINE if deadline is None else deadline)
+        cancel = threading.Event()
+        print(f"🧪 Probando {len(ports)} puerto(s) en paralelo...")
+
+        executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(ports))),
+                                      thread_name_prefix="sr400-probe")
+        pending = {executor.submit(HardwareDetector._probe, port['device'], baudrate, deadline, None, cancel): port
+                   for port in ports}
+        try:
+            while pending:
+                done, _ = wait(pending, timeout=max(0.0, deadline - time.monotonic()) + 0.5,
+                               return_when=FIRST_COMPLETED)
+                if not done:
+                    break
+                for future in done:
+                    port = pending.pop(future)
+                    result = dict(port, **future.result())
+                    mark = "✅" if result['confirmed'] else "⚠️ " if result['responded'] else "❌"
+                    print(f"   {mark} {result['device']}: {result['message']}")
+                    yield result
+                    if result['confirmed'] and stop_on_first:
+                        cancel.set()
+        finally:
+            #Los hilos en curso ven la cancelación en su siguiente lectura y cierran el puerto
+            cancel.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+        for port in pending.values():
+            yield dict(port, confirmed=False, responded=False, response="",
+                       message="Sin respuesta antes del límite", elapsed=None)
+
+    @staticmethod
+    def _rank(result: dict):
+        elapsed = result['elapsed'] if result['elapsed'] is not None else float('inf')
+        return (not result['confirmed'], not result['responded'], not result.get('likely_sr400', False), elapsed)
+
+    @staticmethod
+    def _probe(port_name, baudrate, deadline, settle_time, cancel) -> dict:
+        """Abre el puerto, envía PROBE_COMMAND y lee hasta dos líneas antes del límite"""
+        start = time.monotonic()
+        if cancel.is_set():
+            return HardwareDetector._result(False, "", "Prueba cancelada", start)
+        settle_time = HardwareDetector.SETTLE_TIME if settle_time is None else settle_time
+        lines = []
         try:
-            # Intentar conectar y enviar comando de prueba
             with serial.Serial(
                 port=port_name,
-                baudrate=9600,
+                baudrate=baudrate,
                 bytesize=serial.EIGHTBITS,
                 parity=serial.PARITY_NONE,
                 stopbits=serial.STOPBITS_ONE,
-                timeout=2
+                timeout=HardwareDetector.READ_POLL_INTERVAL
             ) as ser:
-                time.sleep(2)  # Tiempo de inicialización
-                
-                # Enviar comando de identificación si existe, o comando simple
-                ser.write(b'ID?\r')
-                time.sleep(0.5)
-                
-                response = ser.readline().decode('ascii', errors='ignore').strip()
-                print(f"   - Respuesta: '{response}'")
-                
-                # Si hay respuesta, probablemente es el SR400
-                if response:
-                    return True, f"Dispositivo respondió: {response}"
-                else:
-                    return False, "No hubo respuesta del dispositivo"
-                    
+                time.sleep(settle_time)  # Tiempo de inicialización
+                ser.reset_input_buffer()
+                ser.write(PROBE_COMMAND)
+
+                buffer = b""
+                while len(lines) < 2 and time.monotonic() < deadline and not cancel.is_set():
+                    buffer += ser.read(ser.in_waiting or 1)
+                    *complete, buffer = buffer.replace(b'\r', b'\n').split(b'\n')
+                    lines += [l.decode('ascii', errors='ignore').strip() for l in complete if l.strip()]
+                if buffer.strip():
+                    lines.append(buffer.decode('ascii', errors='ignore').strip())
         except serial.SerialException as e:
-            return False, f"Error de conexión: {e}"
+            return HardwareDetector._result(False, "", f"Error de conexión: {e}", start)
         except Exception as e:
-            return False, f"Error inesperado: {e}"
\ No newline at end of file
+            return HardwareDetector._result(False, "", f"Error inesperado: {e}", start)
+
+        response = " | ".join(lines)
+        if HardwareDetector._is_sr400_reply(lines):
+            return HardwareDetector._result(True, response, f"SR400 confirmado (estado {lines[0]}, nivel A {lines[1]} V)", start)
+        if lines:
+            return HardwareDetector._result(False, response, f"Dispositivo respondió: {response}", start)
+        if cancel.is_set():
+            return HardwareDetector._result(False, "", "Prueba cancelada", start)
+        return HardwareDetector._result(False, "", "No hubo respuesta del dispositivo", start)
+
+    @staticmethod
+    def _is_sr400_reply(lines) -> bool:
+        """Byte de estado (0-255) seguido de un nivel de discriminador (-0.3 V a 0.3 V)"""
+        if len(lines) < 2:
+            return False
+        try:
+            status, level = int(lines[0]), float(lines[1])
+        except ValueError:
+            return False
+        return 0 <= status <= 255 and -0.3 <= level <= 0.3
+
+    @staticmethod
+    def _result(confirmed, response, message, start) -> dict:
+        return {
+            'confirmed': confirmed,
+            'responded': bool(response),
+            'response': response,
+            'message': message,
+            'elapsed': time.monotonic() - start,
+        }
@@ -0,0 +1,136 @@
+# device_cache.py
+"""
+Caché en disco del último SR400 confirmado para reconectar sin detección.
+
+Se guarda el puerto, el VID/PID y número de serie del adaptador USB, el baudrate y
+la respuesta de identificación. Al reconectar se busca el adaptador por VID/PID/serie
+(el nombre del puerto puede cambiar entre reinicios) y se prueba con una sola
+consulta; solo si falla se hace la detección completa de todos los puertos.
+"""
+
+import os
+import json
+import time
+from dataclasses import dataclass, asdict
+from typing import List, Optional
+
+import serial.tools.list_ports
+
+from detection_system import HardwareDetector
+
+CACHE_FILE = os.path.join(os.path.expanduser("~"), "FotoContador", "dispositivo.json")
+
+@dataclass
+class DeviceFingerprint:
+    """Identidad de un SR400 confirmado"""
+    device: str
+    baudrate: int = 9600
+    vid: Optional[int] = None
+    pid: Optional[int] = None
+    serial_number: Optional[str] = None
+    description: str = ""
+    identification: str = ""
+    confirmed_at: float = 0.0
+
+def fingerprint(device: str, baudrate: int=9600, identification: str="") -> DeviceFingerprint:
+    """Huella del puerto con los datos USB que reporta el sistema (si los hay)"""
+    info = next((p for p in serial.tools.list_ports.comports() if p.device == device), None)
+    return DeviceFingerprint(
+        device=device,
+        baudrate=baudrate,
+        vid=getattr(info, 'vid', None),
+        pid=getattr(info, 'pid', None),
+        serial_number=getattr(info, 'serial_number', None),
+        description=getattr(info, 'description', "") or "",
+        identification=identification,
+        confirmed_at=time.time(),
+    )
+
+def load_cached_device(path: str=CACHE_FILE) -> Optional[DeviceFingerprint]:
+    """Lee la caché; un archivo ausente o dañado equivale a no tener caché"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return DeviceFingerprint(**json.load(f))
+    except FileNotFoundError:
+        return None
+    except (ValueError, TypeError) as e:
+        print(f"⚠️ Caché de dispositivo inválida, se ignora: {e}")
+        return None
+
+def save_device(device: DeviceFingerprint, path: str=CACHE_FILE):
+    """Escribe la caché de forma atómica"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = path + ".tmp"
+    with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump(asdict(device), f, indent=2)
+    os.replace(temporary, path)
+
+def forget_device(path: str=CACHE_FILE):
+    """Borra la caché"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def remember_connection(sr400, path: str=CACHE_FILE) -> Optional[DeviceFingerprint]:
+    """Guarda un SR400 recién conectado (se ignora si no hay conexión real)"""
+    if not getattr(sr400, 'is_connected', False) or not getattr(sr400, 'identification', None):
+        return None
+    device = fingerprint(sr400.port, sr400.baudrate, sr400.identification)
+    _store(device, path)
+    return device
+
+def _store(device: DeviceFingerprint, path: str):
+    #La caché es opcional: un error de escritura no debe impedir la conexión
+    try:
+        save_device(device, path)
+    except OSError as e:
+        print(f"⚠️ No se pudo guardar la caché de dispositivo: {e}")
+
+def locate_device(device: DeviceFingerprint) -> List[str]:
+    """
+    Puertos candidatos para el dispositivo guardado: los adaptadores con el mismo
+    VID/PID/serie primero y el nombre de puerto guardado al final
+    """
+    candidates = []
+    if device.vid is not None:
+        for port in serial.tools.list_ports.comports():
+            if (port.vid, port.pid) != (device.vid, device.pid):
+                continue
+            if device.serial_number and port.serial_number != device.serial_number:
+                continue
+            candidates.append(port.device)
+    if device.device not in candidates:
+        candidates.append(device.device)
+    return candidates
+
+def find_cached_sr400(path: str=CACHE_FILE, timeout: float=0.5) -> Optional[DeviceFingerprint]:
+    """Prueba rápida del dispositivo guardado; None si no hay caché o no responde"""
+    cached = load_cached_device(path)
+    if cached is None:
+        return None
+    for port in locate_device(cached):
+        result = HardwareDetector.probe_port(port, cached.baudrate, timeout)
+        if result['confirmed']:
+            print(f"⚡ SR400 de la caché respondió en {port}")
+            device = fingerprint(port, cached.baudrate, result['response'])
+            #Se conserva la identidad USB guardada si el sistema no la reporta
+            if device.vid is None:
+                device.vid, device.pid, device.serial_number = cached.vid, cached.pid, cached.serial_number
+            _store(device, path)
+            return device
+    print(f"⚠️ El SR400 guardado ({cached.device}) no respondió")
+    return None
+
+def find_sr400(baudrate: int=9600, path: str=CACHE_FILE, timeout: float=0.5,
+               deadline: Optional[float]=None) -> Optional[DeviceFingerprint]:
+    """Dispositivo de la caché o, si no responde, detección concurrente de todos los puertos"""
+    device = find_cached_sr400(path, timeout)
+    if device is not None:
+        return device
+    for result in HardwareDetector.probe_ports(deadline=deadline, baudrate=baudrate):
+        if result['confirmed']:
+            device = fingerprint(result['device'], baudrate, result['response'])
+            _store(device, path)
+            return device
+    return None
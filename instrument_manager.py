@@ -0,0 +1,223 @@
+# instrument_manager.py
+"""
+Control simultáneo de varios SR400.
+
+Cada SR400 conserva su propio scheduler (un hilo de E/S por puerto), así que las
+operaciones sobre equipos distintos corren en paralelo: el tiempo total de un sondeo
+es el del equipo más lento y no la suma de todos. El arranque y la parada usan una
+barrera, de modo que el comando sale hacia todos los equipos en el mismo instante.
+"""
+
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional
+
+from sr400_controller import SR400, CommandPriority
+
+@dataclass
+class InstrumentSample:
+    """Un periodo de un equipo dentro del flujo combinado"""
+    timestamp: float
+    instrument: str
+    period: int
+    count_a: float
+    count_b: float
+
+class InstrumentManager:
+    """
+    Conjunto de SR400 identificados por nombre.
+
+    Los eventos de cada equipo se reenvían a on_error(nombre, mensaje) y
+    on_counting_changed(nombre, contando).
+    """
+
+    def __init__(self, sync_timeout: float=5.0):
+        self.instruments: Dict[str, SR400] = {}
+        #Tiempo máximo de espera en la barrera de arranque/parada
+        self.sync_timeout = sync_timeout
+        self._stamp_lock = threading.Lock()
+
+        #Eventos
+        self.on_error = None
+        self.on_counting_changed = None
+
+    def __len__(self) -> int:
+        return len(self.instruments)
+
+    def __getitem__(self, name: str) -> SR400:
+        return self.instruments[name]
+
+    def add(self, name: str, port: str, baudrate: int=9600, timeout: float=1.0) -> SR400:
+        """Registra un SR400 (sin conectarlo)"""
+        if name in self.instruments:
+            raise ValueError(f"Ya existe un instrumento llamado {name}")
+        sr400 = SR400(port, baudrate=baudrate, timeout=timeout)
+        sr400.on_error = lambda message: self._trigger_event(self.on_error, name, message)
+        sr400.on_counting_changed = lambda counting: self._trigger_event(self.on_counting_changed, name, counting)
+        self.instruments[name] = sr400
+        return sr400
+
+    def remove(self, name: str):
+        """Desconecta y quita un equipo"""
+        sr400 = self.instruments.pop(name)
+        if sr400.is_connected:
+            sr400.disconnect()
+
+    #-----Conexión ------
+    def connect_all(self) -> Dict[str, bool]:
+        """Conecta todos los equipos en paralelo"""
+        return self._run_in_threads(lambda sr400: sr400.connect())
+
+    def disconnect_all(self):
+        """Desconecta todos los equipos en paralelo"""
+        self._run_in_threads(lambda sr400: sr400.disconnect() if sr400.is_connected else None)
+
+    @property
+    def connected(self) -> List[str]:
+        return [name for name, sr400 in self.instruments.items() if sr400.is_connected]
+
+    #-----Operaciones en paralelo ------
+    def map(self, function: Callable, *args, priority: CommandPriority=CommandPriority.USER) -> Dict[str, object]:
+        """
+        Ejecuta function(sr400, *args) en el hilo de E/S de cada equipo conectado y
+        devuelve {nombre: resultado} (None si falló)
+        """
+        futures = {name: sr400.submit(function, sr400, *args, priority=priority)
+                   for name, sr400 in self.instruments.items() if sr400.is_connected}
+        return {name: self._result(name, future) for name, future in futures.items()}
+
+    def configure_all(self, configure: Callable[[SR400], None], name: str="configuración") -> Dict[str, bool]:
+        """Aplica la misma configuración a todos los equipos (ver SR400.apply_configuration)"""
+        return self.map(lambda sr400: sr400.apply_configuration(configure, name))
+
+    def poll_rates(self) -> Dict[str, dict]:
+        """Tasas de conteo A y B de todos los equipos"""
+        return self.map(lambda sr400: {'A': sr400.get_count_rate('A'), 'B': sr400.get_count_rate('B')},
+                        priority=CommandPriority.STATUS)
+
+    def start_all(self) -> bool:
+        """Inicia el conteo en todos los equipos a la vez"""
+        return self._synchronized(SR400.start_count)
+
+    def stop_all(self) -> bool:
+        """Detiene el conteo en todos los equipos a la vez"""
+        return self._synchronized(SR400.stop_count)
+
+    def _synchronized(self, method: Callable[[SR400, threading.Barrier], bool]) -> bool:
+        names = self.connected
+        if not names:
+            return False
+        barrier = threading.Barrier(len(names), timeout=self.sync_timeout)
+        #Cada equipo espera la barrera en su propio hilo de E/S
+        futures = {name: self.instruments[name].submit(method, self.instruments[name], barrier,
+                                                       priority=CommandPriority.ACQUISITION)
+                   for name in names}
+        return all([self._result(name, future) for name, future in futures.items()])
+
+    #-----Flujo combinado ------
+    def stream(self, periods: int, command: str="FA", queue_size: int=65536) -> Iterator[InstrumentSample]:
+        """
+        Scan sincronizado de periods periodos en todos los equipos conectados; entrega
+        los periodos de todos en un solo flujo ordenado por timestamp de recepción.
+        Los periodos por equipo deben configurarse antes (set_count_period).
+        """
+        names = self.connected
+        if not names:
+            return
+        samples: queue.Queue = queue.Queue(maxsize=queue_size)
+        barrier = threading.Barrier(len(names), timeout=self.sync_timeout)
+        stop_event = threading.Event()
+        readers = [threading.Thread(target=self._stream_instrument,
+                                    args=(name, periods, command, barrier, samples, stop_event),
+                                    name=f"{name}-stream", daemon=True)
+                   for name in names]
+        for reader in readers:
+            reader.start()
+
+        running = len(readers)
+        try:
+            while running:
+                sample = samples.get()
+                if sample is None:
+                    running -= 1
+                    continue
+                yield sample
+        finally:
+            stop_event.set()
+            for reader in readers:
+                reader.join(timeout=2.0)
+
+    def _stream_instrument(self, name: str, periods: int, command: str, barrier: threading.Barrier,
+                           samples: queue.Queue, stop_event: threading.Event):
+        """Hilo por equipo: pasa sus CountRecord al flujo común"""
+        sr400 = self.instruments[name]
+        records = sr400.stream_counts(periods, command, start_barrier=barrier)
+        try:
+            for record in records:
+                if stop_event.is_set():
+                    break
+                #Timestamp y encolado juntos: el flujo combinado queda ordenado
+                with self._stamp_lock:
+                    sample = InstrumentSample(time.time(), name, record.period, record.count_a, record.count_b)
+                    if not self._put(samples, sample, stop_event):
+                        break
+        except Exception as e:
+            #Los demás equipos no deben quedar esperando en la barrera
+            barrier.abort()
+            self._trigger_event(self.on_error, name, f"Error en streaming: {str(e)}")
+        finally:
+            records.close()
+            #Marca de fin para el consumidor
+            self._put(samples, None, stop_event)
+
+    @staticmethod
+    def _put(samples: queue.Queue, item, stop_event: threading.Event) -> bool:
+        #Cola acotada: si el consumidor se atrasa se espera sin perder datos
+        while not stop_event.is_set():
+            try:
+                samples.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    #-----Utilidades ------
+    def _run_in_threads(self, function: Callable[[SR400], object]) -> Dict[str, object]:
+        futures = {}
+        for name, sr400 in self.instruments.items():
+            future: Future = Future()
+            threading.Thread(target=self._fill_future, args=(future, function, sr400),
+                             name=f"{name}-connect", daemon=True).start()
+            futures[name] = future
+        return {name: self._result(name, future) for name, future in futures.items()}
+
+    @staticmethod
+    def _fill_future(future: Future, function: Callable, *args):
+        try:
+            future.set_result(function(*args))
+        except Exception as e:
+            future.set_exception(e)
+
+    def _result(self, name: str, future: Future):
+        try:
+            return future.result()
+        except Exception as e:
+            self._trigger_event(self.on_error, name, str(e))
+            return None
+
+    def _trigger_event(self, event_handler: Optional[Callable], *data):
+        if event_handler:
+            try:
+                event_handler(*data)
+            except Exception as e:
+                print(f"Error en evento: {str(e)}")
+
+    def __enter__(self):
+        self.connect_all()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self.disconnect_all()
@@ -1,14 +1,17 @@
 import os
 import sys
 import time
+import math
+import threading
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 import logging
 import numpy as np
 from PyQt5.QtWidgets import (QMainWindow, QTabWidget, QWidget, QVBoxLayout, QCheckBox, 
                              QHBoxLayout, QGridLayout, QSplitter, QStatusBar, QProgressBar,
                              QMenuBar, QAction, QMessageBox, QFileDialog, QToolBar,
-                             QLabel, QSlider, QComboBox, QDoubleSpinBox, QSpinBox)
-from PyQt5.QtCore import Qt, QTimer
+                             QLabel, QSlider, QComboBox, QDoubleSpinBox, QSpinBox, QListWidget,
+                             QTableWidget, QTableWidgetItem, QHeaderView)
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
 from PyQt5.QtGui import QIcon
 import pyqtgraph as pg
 from datetime import datetime
@@ -29,10 +32,57 @@ except ImportError as e:
         def disconnect(self): pass
     class DiscriminatorChannel: A=1; B=2; T=3
     class GateChannel: A=1; B=2
+from acquisition_worker import AcquisitionWorker, ReplayWorker
+from count_history import CountHistory
+from decimation import MinMaxPyramid, select_level
+from device_cache import remember_connection
+from scurve_analysis import optimal_threshold
+from session_replay import SessionReplay
+from session_store import (COUNT_FIELDS, SessionReader, SessionWriter, TranscriptWriter,
+                           list_sessions, new_session_path)
+
+#Directorio donde se guardan las sesiones de adquisición
+SESSIONS_DIR = os.path.join(os.path.expanduser("~"), "FotoContador", "sesiones")
+#Ancho mínimo (px) supuesto al decimar, por si la gráfica aún no tiene tamaño
+MIN_PLOT_WIDTH = 200
+#Velocidades de reproducción de sesiones (None: sin esperas)
+REPLAY_SPEEDS = {"1×": 1.0, "10×": 10.0, "100×": 100.0, "Máxima": None}
 
 class MainWindow(QMainWindow):
+    #Los eventos del SR400 pueden llegar desde el hilo de adquisición o del scheduler
+    sr400_error = pyqtSignal(str)
+    sr400_counting_changed = pyqtSignal(bool)
+    sr400_status_changed = pyqtSignal(object)
+    sr400_data_received = pyqtSignal(str)
+    #Fin de la curva S (desde el hilo de medición)
+    scurve_finished = pyqtSignal(object, object)
+    scurve_failed = pyqtSignal(str)
+    #Resultados de la búsqueda de SR400 (desde el hilo de detección)
+    ports_probed = pyqtSignal(object)
+    #Resultado de la prueba del SR400 guardado (desde su hilo)
+    cached_device_probed = pyqtSignal(object)
+    #Repintados por segundo de la curva S en curso y periodo de reajuste del threshold óptimo
+    SCURVE_FPS = 20
+    SCURVE_FIT_INTERVAL = 0.5
+    #Puntos por tramo de la curva en curso: cada repintado actualiza solo el último tramo
+    SCURVE_SEGMENT_POINTS = 64
+
     def __init__(self):
         super().__init__()
+        self.sr400_error.connect(self.on_error)
+        self.sr400_counting_changed.connect(self.on_counting_changed)
+        self.sr400_status_changed.connect(self.on_status_changed)
+        self.sr400_data_received.connect(self.on_data_received)
+        self.scurve_finished.connect(self._finalize_scurve)
+        self.scurve_failed.connect(self._handle_scurve_error)
+        self.acquisition_worker = None
+        self.replay_worker = None
+        self.latest_snapshot = None
+        #Historial de tasas con memoria constante (alimentado por el hilo de adquisición);
+        #la pirámide min/max permite dibujar ventanas más largas que el buffer
+        self.count_history = CountHistory(capacity=200_000, decimator=MinMaxPyramid(columns=2))
+        self.session_writer = None
+        self.session_transcript = None
     
         # ✅ SISTEMA INTELIGENTE DE DETECCIÓN
         self.setup_connection_mode()
@@ -51,10 +101,7 @@ class MainWindow(QMainWindow):
 
         from sr400_controller import SR400Simulator
         self.sr400 = SR400Simulator()
-        self.sr400.on_data_received = self.on_data_received
-        self.sr400.on_error = self.on_error
-        self.sr400.on_status_changed = self.on_status_changed
-        self.sr400.on_counting_changed = self.on_counting_changed
+        self.setup_sr400_events()
 
         print("✅ Simulador SR400 inicializado (NO hay conexión real)")
 
@@ -104,11 +151,6 @@ class MainWindow(QMainWindow):
         # Barra de estado
         self.statusBar().showMessage("Sistema listo - Desconectado")
         
-        # Timer para actualizaciones
-        self.update_timer = QTimer()
-        self.update_timer.timeout.connect(self.update_status)
-        self.update_timer.start(1000)  # Actualizar cada segundo
-        
     def create_menu(self):
         menubar = self.menuBar()
         
@@ -167,7 +209,8 @@ class MainWindow(QMainWindow):
 
     def create_realtime_tab(self):
         tab = QWidget()
-        layout = QHBoxLayout(tab)
+        layout = QVBoxLayout(tab)
+        panels_layout = QHBoxLayout()
         
         # Panel izquierdo - Control de conteo
         left_panel = ControlGroup("Control en Tiempo Real")
@@ -221,11 +264,46 @@ class MainWindow(QMainWindow):
         
         self.apply_threshold_btn = ModernButton("Aplicar Threshold")
         right_layout.addWidget(self.apply_threshold_btn)
+
+        # Ritmo de sondeo del hilo de adquisición
+        right_layout.addWidget(QLabel("Intervalo de muestreo:"))
+        self.poll_interval = QSpinBox()
+        self.poll_interval.setRange(50, 5000)
+        self.poll_interval.setValue(500)
+        self.poll_interval.setSingleStep(50)
+        self.poll_interval.setSuffix(" ms")
+        right_layout.addWidget(self.poll_interval)
+
+        # Ventana visible de la gráfica de historial
+        right_layout.addWidget(QLabel("Ventana de historial:"))
+        self.history_window = QSpinBox()
+        self.history_window.setRange(10, 86400)
+        self.history_window.setValue(300)
+        self.history_window.setSingleStep(60)
+        self.history_window.setSuffix(" s")
+        right_layout.addWidget(self.history_window)
+        right_layout.addStretch()
         
         right_panel.setLayout(right_layout)
         
-        layout.addWidget(left_panel)
-        layout.addWidget(right_panel)
+        panels_layout.addWidget(left_panel)
+        panels_layout.addWidget(right_panel)
+        layout.addLayout(panels_layout)
+
+        # Gráfica de historial (strip chart)
+        self.history_plot = pg.PlotWidget()
+        self.history_plot.setBackground('w')
+        self.history_plot.setLabel('left', 'Tasa de Conteo', 'Hz')
+        self.history_plot.setLabel('bottom', 'Tiempo relativo', 's')
+        self.history_plot.showGrid(x=True, y=True, alpha=0.3)
+        self.history_plot.addLegend()
+        self.history_curve_a = self.history_plot.plot(pen=pg.mkPen('#2980b9', width=2), name='Canal A')
+        self.history_curve_b = self.history_plot.plot(pen=pg.mkPen('#e67e22', width=2), name='Canal B')
+        #Eje x preasignado: se reescribe en cada refresco sin crear arreglos nuevos
+        self._history_x = np.empty(self.count_history.capacity)
+        #Zoom y desplazamiento del usuario piden el nivel de la pirámide del nuevo rango
+        self.history_plot.getViewBox().sigXRangeChanged.connect(self._on_history_range_changed)
+        layout.addWidget(self.history_plot, stretch=1)
         
         self.tab_widget.addTab(tab, "⏱️ Tiempo Real")
 
@@ -328,8 +406,13 @@ class MainWindow(QMainWindow):
         self.scurve_plot.addLegend()
 
         #Curvas de la gráfica
-        self.scurve_data_line = self.scurve_plot.plot([], [], pen='b', symbol= 'o', symbolSize=5, name='Datos')
-        self.optimal_threshold_line = None
+        self.scurve_data_line = self.scurve_plot.plot([], [], pen='b', symbol= 'o', symbolSize=5, name='Datos',
+                                                      connect='finite')
+        #Marcador único del threshold óptimo: se mueve, no se recrea
+        self.optimal_threshold_line = pg.InfiniteLine(angle=90, pen='r', label='Óptimo: {value:.4f} V',
+                                                      labelOpts={'position': 0.9})
+        self.optimal_threshold_line.setVisible(False)
+        self.scurve_plot.addItem(self.optimal_threshold_line)
 
         graph_layout.addWidget(self.scurve_plot)
         graph_group.setLayout(graph_layout)
@@ -339,9 +422,9 @@ class MainWindow(QMainWindow):
         results_group = ControlGroup("Resultados")
         results_layout = QGridLayout()
         results_layout.addWidget(QLabel("Threshold Óptimo:"), 0, 0)
-        self.optimal_threshold_line = QLabel("-- V")
-        self.optimal_threshold_line.setStyleSheet("font-weight: bold; color: #e74c3c")
-        results_layout.addWidget(self.optimal_threshold_line, 0, 1)
+        self.optimal_threshold_label = QLabel("-- V")
+        self.optimal_threshold_label.setStyleSheet("font-weight: bold; color: #e74c3c")
+        results_layout.addWidget(self.optimal_threshold_label, 0, 1)
 
         results_layout.addWidget(QLabel("Tasa Máxima:"), 1, 0)
         self.max_count_label = QLabel("-- Hz")
@@ -375,14 +458,233 @@ class MainWindow(QMainWindow):
         self.scurve_measuring = False
         self.scurve_thread = None
         self.current_scurve_data = None
+        #Puntos de la curva en curso: el hilo de medición escribe, el temporizador pinta
+        self._scurve_x = np.empty(0)
+        self._scurve_y = np.empty(0)
+        self._scurve_count = 0
+        self._scurve_drawn = 0
+        self._scurve_ordered = True
+        self._scurve_max = -np.inf
+        self._scurve_segments = []
+        self._scurve_segment_start = 0
+        self._scurve_progress = (0.0, "")
+        self._scurve_last_fit = 0.0
+        self.scurve_timer = QTimer(self)
+        self.scurve_timer.setInterval(int(1000 / self.SCURVE_FPS))
+        self.scurve_timer.timeout.connect(self._refresh_scurve_plot)
 
     def create_data_tab(self):
-        """Pestaña de datos (simplificada por ahora)"""
+        """Pestaña de datos: sesiones guardadas y exportación a CSV"""
         tab = QWidget()
         layout = QVBoxLayout(tab)
-        layout.addWidget(QLabel("Datos - En desarrollo"))
+
+        sessions_group = ControlGroup("Sesiones Guardadas")
+        sessions_layout = QVBoxLayout()
+        self.sessions_list = QListWidget()
+        self.sessions_list.currentRowChanged.connect(self.show_session_info)
+        sessions_layout.addWidget(self.sessions_list)
+
+        self.session_info = QLabel("Seleccione una sesión")
+        sessions_layout.addWidget(self.session_info)
+
+        btn_layout = QHBoxLayout()
+        self.refresh_sessions_btn = ModernButton("Actualizar", color="#3498db")
+        self.refresh_sessions_btn.clicked.connect(self.refresh_sessions)
+        self.export_session_btn = ModernButton("Exportar CSV", color="#27ae60")
+        self.export_session_btn.clicked.connect(self.export_session_csv)
+        btn_layout.addWidget(self.refresh_sessions_btn)
+        btn_layout.addWidget(self.export_session_btn)
+        sessions_layout.addLayout(btn_layout)
+
+        #Reproducción: la sesión pasa por la pestaña de tiempo real como una adquisición
+        replay_layout = QHBoxLayout()
+        replay_layout.addWidget(QLabel("Velocidad:"))
+        self.replay_speed = QComboBox()
+        self.replay_speed.addItems(list(REPLAY_SPEEDS))
+        replay_layout.addWidget(self.replay_speed)
+        self.replay_btn = ModernButton("Reproducir", color="#8e44ad")
+        self.replay_btn.clicked.connect(self.toggle_replay)
+        replay_layout.addWidget(self.replay_btn)
+        sessions_layout.addLayout(replay_layout)
+
+        sessions_group.setLayout(sessions_layout)
+        layout.addWidget(sessions_group)
+
+        #Gráfica de la sesión seleccionada, redibujada con la resolución del rango visible
+        self.session_plot = pg.PlotWidget()
+        self.session_plot.setBackground('w')
+        self.session_plot.setLabel('left', 'Tasa de Conteo', 'Hz')
+        self.session_plot.setLabel('bottom', 'Tiempo desde el inicio', 's')
+        self.session_plot.showGrid(x=True, y=True, alpha=0.3)
+        self.session_plot.addLegend()
+        self.session_curve_a = self.session_plot.plot(pen=pg.mkPen('#2980b9', width=1), name='Canal A')
+        self.session_curve_b = self.session_plot.plot(pen=pg.mkPen('#e67e22', width=1), name='Canal B')
+        self.session_plot.getViewBox().sigXRangeChanged.connect(self.update_session_plot)
+        self.session_reader = None
+        self.session_pyramid = None
+        self._session_t0 = 0.0
+        layout.addWidget(self.session_plot, stretch=1)
         self.tab_widget.addTab(tab, "💾 Datos")
-        
+        self.refresh_sessions()
+
+    def refresh_sessions(self):
+        """Recargar la lista de sesiones guardadas"""
+        self.sessions_list.clear()
+        self.session_paths = list_sessions(SESSIONS_DIR)
+        for path in self.session_paths:
+            self.sessions_list.addItem(os.path.basename(path))
+
+    def _selected_session(self):
+        row = self.sessions_list.currentRow()
+        if 0 <= row < len(self.session_paths):
+            return self.session_paths[row]
+        return None
+
+    def show_session_info(self, row):
+        """Mostrar resumen de la sesión seleccionada"""
+        path = self._selected_session()
+        if path is None:
+            self.session_info.setText("Seleccione una sesión")
+            self._load_session_plot(None)
+            return
+        try:
+            reader = SessionReader(path)
+            created = datetime.fromtimestamp(reader.header['created']).strftime("%Y-%m-%d %H:%M:%S")
+            self.session_info.setText(f"{created} - {len(reader)} muestras en {len(reader.chunks)} bloques "
+                                      f"({', '.join(reader.fields)})")
+            self._load_session_plot(reader)
+        except Exception as e:
+            self.session_info.setText(f"Sesión ilegible: {str(e)}")
+            self._load_session_plot(None)
+
+    def _load_session_plot(self, reader):
+        """Construir la pirámide min/max de una sesión de conteo y mostrarla completa"""
+        self.session_reader = None
+        self.session_pyramid = None
+        self.session_curve_a.setData([], [])
+        self.session_curve_b.setData([], [])
+        if reader is None or len(reader) == 0 or not set(COUNT_FIELDS) <= set(reader.fields):
+            return
+        self.session_pyramid = MinMaxPyramid.from_session(reader, fields=COUNT_FIELDS[1:])
+        self.session_reader = reader
+        times = reader.window()['timestamp']
+        self._session_t0 = float(times[0])
+        #Fijar el rango desactiva el auto-rango en x y dispara update_session_plot
+        self.session_plot.setXRange(0.0, float(times[-1]) - self._session_t0, padding=0.02)
+        self.update_session_plot()
+
+    def update_session_plot(self, *args):
+        """Dibujar el rango visible de la sesión con el nivel de la pirámide que le corresponde"""
+        if self.session_pyramid is None:
+            return
+        view_box = self.session_plot.getViewBox()
+        x_min, x_max = view_box.viewRange()[0]
+        max_points = 2 * max(int(view_box.width()), MIN_PLOT_WIDTH)
+        x, rates_a, rates_b = select_level(self.session_pyramid, self._session_t0 + x_min,
+                                           self._session_t0 + x_max, max_points, raw=self._session_samples)[1]
+        x = x - self._session_t0
+        self.session_curve_a.setData(x, rates_a, connect='finite')
+        self.session_curve_b.setData(x, rates_b, connect='finite')
+
+    def _session_samples(self, t_start, t_end):
+        """Muestras originales de la sesión en [t_start, t_end) (vistas del memmap)"""
+        block = self.session_reader.time_window(t_start, t_end)
+        return block['timestamp'], block['count_a'], block['count_b']
+
+    def export_session_csv(self):
+        """Exportar la sesión seleccionada a CSV"""
+        path = self._selected_session()
+        if path is None:
+            self.show_error("Seleccione una sesión para exportar")
+            return
+        filename, _ = QFileDialog.getSaveFileName(
+            self, "Exportar Sesión", os.path.basename(path) + ".csv", "CSV Files (*.csv)"
+        )
+        if not filename:
+            return
+        if not filename.endswith('.csv'):
+            filename += '.csv'
+        try:
+            SessionReader(path).to_csv(filename)
+            self.show_info(f"Datos exportados a {filename}")
+        except Exception as e:
+            self.show_error(f"Error al exportar: {str(e)}")
+
+    def _start_session_recording(self):
+        """Abrir una sesión nueva y pedir al hilo de adquisición que la alimente"""
+        self._stop_session_recording()
+        if self.acquisition_worker is None:
+            return
+        try:
+            settings_provider = getattr(self.sr400, 'get_cached_settings', None)
+            self.session_writer = SessionWriter(new_session_path(SESSIONS_DIR, "conteo"),
+                                                settings_provider=settings_provider,
+                                                metadata={'port': getattr(self.sr400, 'port', 'SIMULADOR')})
+            self.acquisition_worker.recorder = self.session_writer
+            #La comunicación serial se graba junto a las muestras (el simulador no tiene puerto)
+            if hasattr(self.sr400, 'transcript'):
+                self.session_transcript = TranscriptWriter(self.session_writer.path)
+                self.sr400.transcript = self.session_transcript
+        except Exception as e:
+            self.session_writer = None
+            print(f"No se pudo crear la sesión: {e}")
+
+    def _stop_session_recording(self):
+        """Cerrar la sesión en curso (el último bloque se vuelca a disco)"""
+        if self.acquisition_worker is not None:
+            self.acquisition_worker.recorder = None
+        if self.session_transcript is not None:
+            self.sr400.transcript = None
+            self.session_transcript.close()
+            self.session_transcript = None
+        if self.session_writer is not None:
+            self.session_writer.close()
+            print(f"💾 Sesión guardada: {self.session_writer.path} ({self.session_writer.samples_written} muestras)")
+            self.session_writer = None
+            self.refresh_sessions()
+        
+    def toggle_replay(self):
+        """Iniciar o detener la reproducción de la sesión seleccionada"""
+        if self.replay_worker is not None:
+            self.stop_replay()
+            return
+        path = self._selected_session()
+        if path is None:
+            self.show_error("Seleccione una sesión para reproducir")
+            return
+        try:
+            replay = SessionReplay(path, speed=REPLAY_SPEEDS[self.replay_speed.currentText()])
+        except Exception as e:
+            self.show_error(f"No se puede reproducir la sesión: {str(e)}")
+            return
+
+        #La reproducción ocupa el lugar del hilo de adquisición
+        self.stop_real_time_updates()
+        self.count_history.clear()
+        self.replay_worker = ReplayWorker(replay, history=self.count_history)
+        self.replay_worker.snapshot_ready.connect(self.on_snapshot)
+        self.replay_worker.error.connect(self.on_error)
+        self.replay_worker.replay_finished.connect(self._on_replay_finished)
+        self.replay_worker.start()
+        self.replay_btn.setText("Detener")
+        self.statusBar().showMessage(f"Reproduciendo {os.path.basename(path)} ({len(replay)} muestras)")
+
+    def stop_replay(self):
+        """Detener la reproducción"""
+        if self.replay_worker is not None:
+            self.replay_worker.stop()
+
+    def _on_replay_finished(self):
+        """Fin de la reproducción: se vuelve a la adquisición si hay equipo conectado"""
+        worker, self.replay_worker = self.replay_worker, None
+        if worker is not None:
+            worker.wait(2000)
+            print(f"⏹️ Reproducción terminada ({worker.replay.position}/{len(worker.replay)} muestras)")
+        self.replay_btn.setText("Reproducir")
+        self.statusBar().showMessage("Reproducción terminada")
+        if getattr(self.sr400, 'is_connected', False):
+            self.setup_real_time_updates()
+
     def create_status_panel(self):
         panel = ControlGroup("Estado del Sistema")
         layout = QVBoxLayout()
@@ -407,6 +709,20 @@ class MainWindow(QMainWindow):
         self.rate_b_value = QLabel("Canal B: -- Hz")
         layout.addWidget(self.rate_a_value)
         layout.addWidget(self.rate_b_value)
+
+        # Uso del enlace serial por comando
+        layout.addWidget(QLabel("Enlace Serial:"))
+        self.link_usage_value = QLabel("Uso: --")
+        layout.addWidget(self.link_usage_value)
+        self.command_stats_table = QTableWidget(0, 5)
+        self.command_stats_table.setHorizontalHeaderLabels(["Cmd", "N", "Bytes", "Media ms", "p95 ms"])
+        self.command_stats_table.verticalHeader().setVisible(False)
+        self.command_stats_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.command_stats_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        layout.addWidget(self.command_stats_table)
+        self.reset_stats_btn = ModernButton("Reiniciar Estadísticas", color="#7f8c8d")
+        self.reset_stats_btn.clicked.connect(self.reset_command_stats)
+        layout.addWidget(self.reset_stats_btn)
         
         layout.addStretch()
         
@@ -425,14 +741,47 @@ class MainWindow(QMainWindow):
     def setup_connection_mode(self):
         """Configurar modo de conexión - Detección automática + diálogo"""
         print("🔧 Configurando modo de conexión...")
-    
+
+        import device_cache
+
+        # El último SR400 confirmado se usa sin detección ni diálogo. Abrir y consultar
+        # sus puertos puede tardar: la prueba corre fuera del hilo de la interfaz
+        cached = device_cache.load_cached_device()
+        if cached is not None:
+            from sr400_controller import SR400
+            self.sr400 = SR400(cached.device, baudrate=cached.baudrate)
+            self.setup_sr400_events()
+            print(f"✅ Usando el SR400 guardado en {cached.device}; verificando...")
+            self.cached_device_probed.connect(self._on_cached_device_probed)
+            threading.Thread(target=lambda: self.cached_device_probed.emit(device_cache.find_cached_sr400()),
+                             name="sr400-cache", daemon=True).start()
+            return
+        self.choose_connection_mode()
+
+    def _on_cached_device_probed(self, device):
+        """Resultado de la prueba del SR400 guardado (hilo de la UI)"""
+        self.cached_device_probed.disconnect(self._on_cached_device_probed)
+        if self.sr400.is_connected:
+            return
+        if device is None:
+            # El equipo guardado no respondió: selección manual, como sin caché
+            self.statusBar().showMessage("⚠️ El SR400 guardado no respondió")
+            self.choose_connection_mode()
+            return
+        if device.device != self.sr400.port:
+            # El adaptador USB cambió de nombre de puerto
+            from sr400_controller import SR400
+            self.sr400 = SR400(device.device, baudrate=device.baudrate)
+            self.setup_sr400_events()
+        self.statusBar().showMessage(f"✅ SR400 guardado encontrado en {device.device}")
+
+    def choose_connection_mode(self):
+        """Detección de puertos y diálogo de selección entre hardware y simulación"""
         from detection_system import HardwareDetector
-        from PyQt5.QtWidgets import QMessageBox, QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QListWidget
-    
-        # Detectar hardware disponible
+        from PyQt5.QtWidgets import QMessageBox, QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QListWidget, QListWidgetItem
+
+        # Puertos del sistema, sin escribir en ninguno: la prueba se hace solo a pedido
         available_ports = HardwareDetector.detect_sr400_ports()
-        sr400_ports = [port for port in available_ports if port['likely_sr400']]
-        other_ports = [port for port in available_ports if not port['likely_sr400']]
     
         # Si no hay puertos detectados, forzar simulación
         if not available_ports:
@@ -453,32 +802,69 @@ class MainWindow(QMainWindow):
         layout.addWidget(title)
     
         # Información de detección
-        if sr400_ports:
-            info_text = f"✅ Se detectaron {len(sr400_ports)} dispositivo(s) posible(es) SR400"
-            info_label = QLabel(info_text)
-            info_label.setStyleSheet("color: green; margin: 10px;")
-            layout.addWidget(info_label)
-        
-            # Lista de dispositivos SR400 detectados
-            sr400_list = QListWidget()
-            for port in sr400_ports:
-                sr400_list.addItem(f"📟 {port['device']} - {port['description']}")
-            layout.addWidget(QLabel("Dispositivos SR400 detectados:"))
-            layout.addWidget(sr400_list)
+        info_label = QLabel()
+        info_label.setStyleSheet("margin: 10px;")
+        layout.addWidget(info_label)
+    
+        # Lista de puertos; el seleccionado es el que se usa en modo real
+        port_list = QListWidget()
+        layout.addWidget(QLabel("Puertos seriales detectados:"))
+        layout.addWidget(port_list)
+    
+        def show_ports(ports):
+            port_list.clear()
+            for port in ports:
+                if port.get('confirmed'):
+                    mark = "✅"
+                elif port['likely_sr400']:
+                    mark = "📟"
+                else:
+                    mark = "🔌"
+                detail = f" ({port['message']})" if 'message' in port else ""
+                item = QListWidgetItem(f"{mark} {port['device']} - {port['description']}{detail}")
+                item.setData(Qt.UserRole, port['device'])
+                port_list.addItem(item)
+            port_list.setCurrentRow(0)
+            confirmed = sum(1 for port in ports if port.get('confirmed'))
+            likely = sum(1 for port in ports if port['likely_sr400'])
+            if confirmed:
+                info_label.setText(f"✅ {confirmed} SR400 confirmado(s)")
+                info_label.setStyleSheet("color: green; margin: 10px;")
+            elif likely:
+                info_label.setText(f"📟 {likely} dispositivo(s) posible(s) SR400; use Buscar para confirmarlo")
+                info_label.setStyleSheet("color: green; margin: 10px;")
+            else:
+                info_label.setText(f"⚠️  {len(ports)} puerto(s) serial(es) sin identificar")
+                info_label.setStyleSheet("color: orange; margin: 10px;")
     
-        if other_ports:
-            other_label = QLabel(f"⚠️  También hay {len(other_ports)} otro(s) puerto(s) serial(es)")
-            other_label.setStyleSheet("color: orange; margin: 10px;")
-            layout.addWidget(other_label)
+        show_ports(sorted(available_ports, key=lambda port: not port['likely_sr400']))
     
         # Botones de opción
         buttons_layout = QHBoxLayout()
     
-        if sr400_ports:
-            real_mode_btn = QPushButton("🚀 Modo Real (Hardware)")
-            real_mode_btn.setStyleSheet("QPushButton { background-color: #27ae60; color: white; font-weight: bold; padding: 10px; }")
-            real_mode_btn.clicked.connect(lambda: self.select_real_mode(sr400_ports[0]['device'], dialog))
-            buttons_layout.addWidget(real_mode_btn)
+        search_btn = QPushButton("🔍 Buscar SR400")
+        search_btn.setToolTip("Envía una consulta a cada puerto para identificar el SR400")
+        buttons_layout.addWidget(search_btn)
+    
+        def start_search():
+            search_btn.setEnabled(False)
+            search_btn.setText("🔍 Buscando...")
+            #La prueba abre y escribe en los puertos: fuera del hilo de la interfaz
+            threading.Thread(target=lambda: self.ports_probed.emit(HardwareDetector.probe_ports(available_ports)),
+                             name="sr400-detect", daemon=True).start()
+    
+        def search_finished(ports):
+            show_ports(ports)
+            search_btn.setText("🔍 Buscar SR400")
+            search_btn.setEnabled(True)
+    
+        search_btn.clicked.connect(start_search)
+        self.ports_probed.connect(search_finished)
+    
+        real_mode_btn = QPushButton("🚀 Modo Real (Hardware)")
+        real_mode_btn.setStyleSheet("QPushButton { background-color: #27ae60; color: white; font-weight: bold; padding: 10px; }")
+        real_mode_btn.clicked.connect(lambda: self.select_real_mode(port_list.currentItem().data(Qt.UserRole), dialog))
+        buttons_layout.addWidget(real_mode_btn)
     
         simulation_btn = QPushButton("🔧 Modo Simulación")
         simulation_btn.setStyleSheet("QPushButton { background-color: #3498db; color: white; font-weight: bold; padding: 10px; }")
@@ -494,7 +880,11 @@ class MainWindow(QMainWindow):
         dialog.setLayout(layout)
     
         # Mostrar diálogo
-        dialog.exec_()
+        try:
+            dialog.exec_()
+        finally:
+            #Una búsqueda que termine después de cerrar el diálogo se descarta
+            self.ports_probed.disconnect(search_finished)
 
     def select_real_mode(self, port, dialog):
         """Seleccionar modo real con hardware"""
@@ -547,10 +937,10 @@ class MainWindow(QMainWindow):
 
     def setup_sr400_events(self):
         """Configurar eventos del SR400 (común para ambos modos)"""
-        self.sr400.on_data_received = self.on_data_received
-        self.sr400.on_error = self.on_error
-        self.sr400.on_status_changed = self.on_status_changed
-        self.sr400.on_counting_changed = self.on_counting_changed
+        self.sr400.on_data_received = self.sr400_data_received.emit
+        self.sr400.on_error = self.sr400_error.emit
+        self.sr400.on_status_changed = self.sr400_status_changed.emit
+        self.sr400.on_counting_changed = self.sr400_counting_changed.emit
 
     def force_initial_state(self):
         """Forzar el estado inicial correcto de todos los controles"""
@@ -576,13 +966,11 @@ class MainWindow(QMainWindow):
         self.reset_btn.clicked.connect(self.reset_counting)
         self.apply_threshold_btn.clicked.connect(self.apply_threshold)
         self.threshold_slider.valueChanged.connect(self.update_threshold_display)
+        self.poll_interval.valueChanged.connect(self.set_acquisition_interval)
         self.setup_scurve_connections()
 
         # Conectar señales del controlador SR400
-        self.sr400.on_data_received = self.on_data_received
-        self.sr400.on_error = self.on_error
-        self.sr400.on_status_changed = self.on_status_changed
-        self.sr400.on_counting_changed = self.on_counting_changed
+        self.setup_sr400_events()
 
     def check_development_mode(self):
         """Determina si estamos en modo desarrollo"""
@@ -634,8 +1022,9 @@ class MainWindow(QMainWindow):
             success = self.sr400.connect()
         
             if success:
+                # Recordar el equipo para la próxima vez (solo hardware real)
+                remember_connection(self.sr400)
                 # Configurar valores por defecto
-                time.sleep(0.5)
                 if self.sr400.set_default_configuration():
                     print("✅ Configuración por defecto aplicada (SIMULADOR)")
                 
@@ -659,11 +1048,9 @@ class MainWindow(QMainWindow):
     def disconnect_device(self):
         """Desconectar del dispositivo SR400 - CORREGIDO"""
         try:
-            # Detener timers de actualización
-            if hasattr(self, 'update_timer'):
-                self.update_timer.stop()
-            if hasattr(self, 'status_timer'):
-                self.status_timer.stop()
+            # Detener hilo de adquisición
+            self._stop_session_recording()
+            self.stop_real_time_updates()
         
             # Desconectar dispositivo
             self.sr400.stop_monitoring()
@@ -698,46 +1085,48 @@ class MainWindow(QMainWindow):
                 print("⚠️  El contador ya está iniciado")
                 return
             
-            success = self.sr400.start_count()
-            if success:
-                print("✅ Conteo INICIADO manualmente")
-                self.update_counting_indicators(True)
-                self.statusBar().showMessage("Conteo iniciado")
-            
-                # ✅ INICIAR actualización automática del display durante el conteo
-                self.start_display_updates()
-            else:
-                self.show_error("Error al iniciar conteo")
+            self._run_sr400(self.sr400.start_count, callback=self._on_count_started)
             
         except Exception as e:
             self.show_error(f"Error al iniciar conteo: {str(e)}")
+
+    def _on_count_started(self, success):
+        """Resultado de start_count (hilo de la UI)"""
+        if success:
+            print("✅ Conteo INICIADO manualmente")
+            self._start_session_recording()
+            self.update_counting_indicators(True)
+            self.statusBar().showMessage("Conteo iniciado")
+        else:
+            self.show_error("Error al iniciar conteo")
             
     def stop_counting(self):
-        """Detener conteo - y detener actualizaciones del display"""
+        """Detener conteo"""
         try:
             if not self.sr400.is_counting:
                 print("⚠️  El contador ya está detenido")
                 return
             
-            success = self.sr400.stop_count()
-            if success:
-                print("✅ Conteo DETENIDO manualmente")
-                self.update_counting_indicators(False)
-                self.statusBar().showMessage("Conteo detenido")
-            
-                # ✅ DETENER actualización automática del display
-                self.stop_display_updates()
-            else:
-                self.show_error("Error al detener conteo")
+            self._run_sr400(self.sr400.stop_count, callback=self._on_count_stopped)
             
         except Exception as e:
             self.show_error(f"Error al detener conteo: {str(e)}")
 
+    def _on_count_stopped(self, success):
+        """Resultado de stop_count (hilo de la UI)"""
+        if success:
+            print("✅ Conteo DETENIDO manualmente")
+            self._stop_session_recording()
+            self.update_counting_indicators(False)
+            self.statusBar().showMessage("Conteo detenido")
+        else:
+            self.show_error("Error al detener conteo")
+
             
     def reset_counting(self):
         """Resetear conteo"""
         try:
-            self.sr400.reset_count()
+            self._run_sr400(self.sr400.reset_count)
         except Exception as e:
             self.show_error(f"Error al resetear conteo: {str(e)}")
             
@@ -746,7 +1135,7 @@ class MainWindow(QMainWindow):
         try:
             threshold_mv = self.threshold_slider.value() / 10.0  # Convertir a mV
             threshold_v = threshold_mv / 1000.0  # Convertir a voltios
-            self.sr400.set_discriminator_level(DiscriminatorChannel.A, threshold_v)
+            self._run_sr400(self.sr400.set_discriminator_level, DiscriminatorChannel.A, threshold_v)
         except Exception as e:
             self.show_error(f"Error al aplicar threshold: {str(e)}")
             
@@ -757,11 +1146,15 @@ class MainWindow(QMainWindow):
     def set_default_config(self):
         """Establecer configuración por defecto"""
         try:
-            if self.sr400.set_default_configuration():
-                QMessageBox.information(self, "Éxito", "Configuración por defecto aplicada")
+            self._run_sr400(self.sr400.set_default_configuration, callback=self._on_default_config_applied)
         except Exception as e:
             self.show_error(f"Error al aplicar configuración: {str(e)}")
             
+    def _on_default_config_applied(self, success):
+        """Resultado de set_default_configuration (hilo de la UI)"""
+        if success:
+            QMessageBox.information(self, "Éxito", "Configuración por defecto aplicada")
+            
     def show_about(self):
         """Mostrar diálogo Acerca de"""
         QMessageBox.about(self, "Acerca de", 
@@ -774,7 +1167,7 @@ class MainWindow(QMainWindow):
         QMessageBox.critical(self, "Error", message)
         
     def on_data_received(self, data):
-        """Manejar datos recibidos"""
+        """Manejar datos recibidos (hilo de la UI, vía sr400_data_received)"""
         print(f"Datos: {data}")
         
     def on_error(self, message):
@@ -782,7 +1175,10 @@ class MainWindow(QMainWindow):
         self.show_error(message)
         
     def on_status_changed(self, status):
-        """Manejar cambios de estado"""
+        """Manejar cambios de estado (hilo de la UI, vía sr400_status_changed)"""
+        #Estados del enlace: "Conectado", "Reconectando", "Reconectado", "Desconectado"
+        if isinstance(status, str):
+            self.statusBar().showMessage(f"SR400: {status}")
         # Actualizar UI con el estado del equipo
         if hasattr(status, 'discriminator_levels'):
             if status.discriminator_levels['A'] is not None:
@@ -805,120 +1201,156 @@ class MainWindow(QMainWindow):
         self.start_count_btn.setEnabled(not is_counting)
         self.stop_count_btn.setEnabled(is_counting)
         
-    def update_status(self):
-        """Actualizar estado periódicamente"""
-        if self.sr400.is_connected:
-            # Puedes agregar actualizaciones adicionales aquí
-            pass
     def setup_real_time_updates(self):
-        """Configurar actualizaciones en tiempo real"""
-        # Timer para actualizar el display cada 500ms
-        self.update_timer = QTimer()
-        self.update_timer.timeout.connect(self.update_real_time_display)
-        self.update_timer.start(500)
-
-        #Timer para actualizar el estado cada 1 segundo
-        self.status_timer = QTimer()
-        self.status_timer.timeout.connect(self.update_status_display)
-        self.status_timer.start(1000)
-    
-    def stop_counting(self):
-        """Detener conteo - y detener actualizaciones del display"""
-        try:
-            if not self.sr400.is_counting:
-                print("⚠️  El contador ya está detenido")
-                return
-            
-            success = self.sr400.stop_count()
-            if success:
-                print("✅ Conteo DETENIDO manualmente")
-                self.update_counting_indicators(False)
-                self.statusBar().showMessage("Conteo detenido")
-            
-                # ✅ DETENER actualización automática del display
-                self.stop_display_updates()
-            else:
-                self.show_error("Error al detener conteo")
-            
-        except Exception as e:
-            self.show_error(f"Error al detener conteo: {str(e)}")
+        """Iniciar el hilo de adquisición (único dueño del puerto serial)"""
+        self.stop_real_time_updates()
+        self.acquisition_worker = AcquisitionWorker(self.sr400, interval=self.poll_interval.value() / 1000.0,
+                                                    history=self.count_history)
+        self.acquisition_worker.snapshot_ready.connect(self.on_snapshot)
+        self.acquisition_worker.error.connect(self.on_error)
+        self.acquisition_worker.start()
+
+    def stop_real_time_updates(self):
+        """Detener el hilo de adquisición"""
+        if self.acquisition_worker is not None:
+            self.acquisition_worker.stop()
+            self.acquisition_worker = None
+
+    def set_acquisition_interval(self, value_ms):
+        """Cambiar el ritmo de sondeo del hilo de adquisición"""
+        if self.acquisition_worker is not None:
+            self.acquisition_worker.set_interval(value_ms / 1000.0)
+
+    def _run_sr400(self, function, *args, callback=None):
+        """Ejecutar una acción sobre el SR400 en el hilo de adquisición si está activo"""
+        if self.acquisition_worker is not None and self.acquisition_worker.isRunning():
+            self.acquisition_worker.submit(function, *args, callback=callback)
+        else:
+            result = function(*args)
+            if callback:
+                callback(result)
+
+    def on_snapshot(self, snapshot):
+        """Recibir un snapshot del hilo de adquisición y refrescar la UI"""
+        self.latest_snapshot = snapshot
+        self.update_status_display()
+        self.update_history_plot()
+        self.update_command_stats()
+        if snapshot.is_counting:
+            self.update_display_during_counting()
+        else:
+            self.update_real_time_display()
 
-    def start_display_updates(self):
-        """Iniciar actualización automática del display durante el conteo"""
-        if hasattr(self, 'display_update_timer'):
-            self.display_update_timer.stop()
-    
-        self.display_update_timer = QTimer()
-        self.display_update_timer.timeout.connect(self.update_display_during_counting)
-        self.display_update_timer.start(500)  # Actualizar cada 500ms durante el conteo
-        print("🔄 Actualización automática del display INICIADA")
-
-    def stop_display_updates(self):
-        """Detener actualización automática del display"""
-        if hasattr(self, 'display_update_timer'):
-            self.display_update_timer.stop()
-            print("⏹️ Actualización automática del display DETENIDA")
+    def update_command_stats(self):
+        """Refrescar la tabla de uso del enlace (mnemónicos con más bytes primero)"""
+        if not hasattr(self, 'sr400'):
+            return
+        stats = self.sr400.get_command_stats()
+        rows = sorted(stats.items(), key=lambda item: item[1]['bytes_sent'] + item[1]['bytes_received'], reverse=True)
+        self.command_stats_table.setRowCount(len(rows))
+        for row, (mnemonic, stat) in enumerate(rows):
+            mean = stat['mean_latency']
+            p95 = stat['p95_latency']
+            values = [
+                mnemonic,
+                str(stat['count']),
+                str(stat['bytes_sent'] + stat['bytes_received']),
+                f"{mean * 1000:.1f}" if mean is not None else "--",
+                f"{p95 * 1000:.0f}" if p95 is not None and math.isfinite(p95) else ("--" if p95 is None else "> 5000"),
+            ]
+            for column, value in enumerate(values):
+                self.command_stats_table.setItem(row, column, QTableWidgetItem(value))
+        self.link_usage_value.setText(f"Uso: {self.sr400.get_link_usage() * 100:.1f}% del ancho de banda")
+
+    def reset_command_stats(self):
+        """Reiniciar las estadísticas de comandos"""
+        if hasattr(self, 'sr400'):
+            self.sr400.reset_command_stats()
+        self.update_command_stats()
+
+    def update_history_plot(self):
+        """
+        Refrescar el strip chart con la ventana de historial seleccionada (o el rango
+        visible si el usuario hizo zoom). Ventanas con más muestras que pixeles se
+        dibujan desde la pirámide min/max.
+        """
+        latest = self.count_history.view(1)[0]
+        if len(latest) == 0:
+            self.history_curve_a.setData([], [])
+            self.history_curve_b.setData([], [])
+            return
+        t_ref = float(latest[0])
+        view_box = self.history_plot.getViewBox()
+        if view_box.autoRangeEnabled()[0]:
+            #Relativo a la última muestra: también sirve al reproducir sesiones grabadas
+            t_start, t_end = t_ref - self.history_window.value(), t_ref
+        else:
+            x_min, x_max = view_box.viewRange()[0]
+            t_start, t_end = t_ref + x_min, t_ref + x_max
+        max_points = 2 * max(int(view_box.width()), MIN_PLOT_WIDTH)
+        oldest = float(self.count_history.view()[0][0])
+        level = self.count_history.decimator.level_for(t_start, t_end, max_points, raw_from=oldest)
+        if level == 0:
+            times, rates_a, rates_b = self.count_history.since(t_start)
+            n = int(np.searchsorted(times, t_end, side='right'))
+            x = self._history_x[:n]
+            np.subtract(times[:n], t_ref, out=x)
+            rates_a, rates_b = rates_a[:n], rates_b[:n]
+        else:
+            x, rates_a, rates_b = self.count_history.decimator.view(level, t_start, t_end)
+            x -= t_ref
+        self.history_curve_a.setData(x, rates_a, connect='finite')
+        self.history_curve_b.setData(x, rates_b, connect='finite')
+
+    def _on_history_range_changed(self, *args):
+        """Zoom o desplazamiento del usuario; con auto-rango el cambio viene de los datos"""
+        if not self.history_plot.getViewBox().autoRangeEnabled()[0]:
+            self.update_history_plot()
+
+    def _show_count_rates(self, count_rates):
+        """Mostrar tasas A/B en los displays"""
+        count_rate_a = count_rates.get('A')
+        count_rate_b = count_rates.get('B')
+        if count_rate_a is not None:
+            self.count_display.display(count_rate_a)
+            self.rate_a_value.setText(f"Canal A: {count_rate_a:.1f} Hz")
+        if count_rate_b is not None:
+            self.rate_b_value.setText(f"Canal B: {count_rate_b:.1f} Hz")
     
     def update_display_during_counting(self):
         """Actualizar el display SOLO durante el conteo activo"""
-        if self.sr400.is_connected and self.sr400.is_counting:
+        snapshot = self.latest_snapshot
+        if snapshot is not None and snapshot.is_counting:
             try:
-                # Leer tasas de conteo actuales
-                count_rate_a = self.sr400.get_count_rate('A')
-                count_rate_b = self.sr400.get_count_rate('B')
-            
-                # Actualizar displays
-                if count_rate_a is not None:
-                    self.count_display.display(count_rate_a)
-                    self.rate_a_value.setText(f"Canal A: {count_rate_a:.1f} Hz")
-            
-                if count_rate_b is not None:
-                    self.rate_b_value.setText(f"Canal B: {count_rate_b:.1f} Hz")
-                
-                # Actualizar timestamp
-                self.update_time.setText(datetime.now().strftime("%H:%M:%S"))
-            
+                self._show_count_rates(snapshot.count_rates)
+                self.update_time.setText(datetime.fromtimestamp(snapshot.timestamp).strftime("%H:%M:%S"))
             except Exception as e:
                 print(f"Error actualizando display durante conteo: {e}")
 
     def update_real_time_display(self):
         """Actualizar display cuando NO hay conteo activo"""
-        if self.sr400.is_connected and not self.sr400.is_counting:
+        snapshot = self.latest_snapshot
+        if snapshot is not None and not snapshot.is_counting:
             try:
-                # Solo leer si no estamos contando activamente
-                count_rate_a = self.sr400.get_count_rate('A')
-                count_rate_b = self.sr400.get_count_rate('B')
-            
-                if count_rate_a is not None:
-                    self.count_display.display(count_rate_a)
-                    self.rate_a_value.setText(f"Canal A: {count_rate_a:.1f} Hz")
-            
-                if count_rate_b is not None:
-                    self.rate_b_value.setText(f"Canal B: {count_rate_b:.1f} Hz")
-                
+                self._show_count_rates(snapshot.count_rates)
             except Exception as e:
                 print(f"Error en actualización en tiempo real: {e}")
     
     def update_status_display(self):
         """Actualizar la información de estado del equipo"""
-        if self.sr400.is_connected:
+        snapshot = self.latest_snapshot
+        if snapshot is not None:
             try:
-                #Leer niveles de discriminador
-                disc_a = self.sr400.get_discriminator_level(DiscriminatorChannel.A)
-                disc_b = self.sr400.get_discriminator_level(DiscriminatorChannel.B)
+                disc_a = snapshot.discriminator_levels.get('A')
+                disc_b = snapshot.discriminator_levels.get('B')
 
                 if disc_a is not None:
                     self.disc_a_value.setText(f"A: {disc_a*1000:.1f} mV")
                 if disc_b is not None:
                     self.disc_b_value.setText(f"B: {disc_b*1000:.1f} mV")
-                
-                #Lerr tasa del canal B también
-                count_rate_b = self.sr400.get_count_rate('B')
-                if count_rate_b is not None:
-                    self.rate_b_value.setText(f"Canal B: {count_rate_b:.1f} Hz")
 
                 #Acutalizar timestamp
-                self.update_time.setText(datetime.now().strftime("%H:%M:%S"))
+                self.update_time.setText(datetime.fromtimestamp(snapshot.timestamp).strftime("%H:%M:%S"))
             
             except Exception as e:
                 print(f"Error actualizando estado: {e}")
@@ -975,15 +1407,24 @@ class MainWindow(QMainWindow):
             return
         try:
             print("=== PRUEBA DE LECTURAS ===")
+            self._run_sr400(self._read_test_values, callback=self._show_test_readings)
+        except Exception as e:
+            self.show_error(f"Error en prueba: {str(e)}")
 
-            #Leer tasa de conteo
-            rate_a = self.sr400.get_count_rate('A')
-            rate_b = self.sr400.get_count_rate('B')
-            print(f"Tasa A: {rate_a} Hz, Tasa B: {rate_b} Hz")
+    def _read_test_values(self):
+        """Leer tasas y niveles (se ejecuta en el hilo de adquisición)"""
+        return (self.sr400.get_count_rate('A'),
+                self.sr400.get_count_rate('B'),
+                self.sr400.get_discriminator_level(DiscriminatorChannel.A),
+                self.sr400.get_discriminator_level(DiscriminatorChannel.B))
 
-            #Leer niveles
-            disc_a = self.sr400.get_discriminator_level(DiscriminatorChannel.A)
-            disc_b = self.sr400.get_discriminator_level(DiscriminatorChannel.B)
+    def _show_test_readings(self, values):
+        """Mostrar resultado de la prueba de lecturas"""
+        if values is None:
+            return
+        try:
+            rate_a, rate_b, disc_a, disc_b = values
+            print(f"Tasa A: {rate_a} Hz, Tasa B: {rate_b} Hz")
             print(f"Disc A: {disc_a} V, Disc B: {disc_b} V")
 
             #Actualizar displays
@@ -1004,6 +1445,7 @@ class MainWindow(QMainWindow):
         except Exception as e:
             self.show_error(f"Error en prueba: {str(e)}")
 
+    #-----Curva S ------
     def start_scurve_measurement(self):
         """Iniciar medición de Curva S en un hilo separado"""
         if not self.sr400.is_connected:
@@ -1011,229 +1453,9 @@ class MainWindow(QMainWindow):
             return
         if self.scurve_measuring:
             return
-    def stop_scurve_measurement(self):
-        """Detener medición de Curva S"""
-        print("⏹️ Deteniendo medición de curva S...")
-        self.scurve_measuring = False
-        self.scurve_status.setText("Medición detenida por el usuario")
-        self.start_scurve_btn.setEnabled(True)
-        self.stop_scurve_btn.setEnabled(False)
-        self.scurve_progress.setVisible(False)
-        
-        # También podríamos agregar una bandera de cancelación al simulador
-        if hasattr(self.sr400, '_scurve_cancel'):
-            self.sr400._scurve_cancel = True
-    def export_scurve_data(self):
-        """Exportar datos de Curva S a archivo CSV"""
-        if not hasattr(self, 'current_scurve_data') or not self.current_scurve_data:
-            self.show_error("No hay datos de curva S para exportar")
-            return
-    def apply_optimal_threshold(self):
-        """Aplicar el threshold óptimo calculado"""
-        if not hasattr(self, 'current_scurve_data') or not self.current_scurve_data:
-            self.show_error("No hay datos de curva S para aplicar threshold óptimo")
-            return
-            
-        try:
-            thresholds, count_rates = self.current_scurve_data
-            optimal_threshold = self.calculate_optimal_threshold(thresholds, count_rates)
-            
-            # Determinar canal basado en la selección
-            from sr400_controller import DiscriminatorChannel
-            channel = DiscriminatorChannel.A if self.scurve_channel.currentIndex() == 0 else DiscriminatorChannel.B
-            
-            success = self.sr400.set_discriminator_level(channel, optimal_threshold)
-            
-            if success:
-                message = f"Threshold óptimo aplicado: {optimal_threshold:.4f} V"
-                self.show_info(message)
-                self.statusBar().showMessage(message)
-                print(f"✅ {message}")
-            else:
-                self.show_error("Error al aplicar threshold óptimo")
-                
-        except Exception as e:
-            self.show_error(f"Error al aplicar threshold óptimo: {str(e)}")
-    def _simple_scurve_measurement(self, channel, start_v, end_v, steps, dwell_time):
-        """Medición de curva S simplificada - sin problemas de hilos"""
-        try:
-            print(f"🔧 Iniciando curva S: {steps} puntos")
-            
-            # Usar QTimer para actualizar UI desde hilo principal
-            from PyQt5.QtCore import QTimer
-            import numpy as np
-            
-            # Actualizar progreso inicial
-            QTimer.singleShot(0, lambda: self._update_scurve_progress(0, "Iniciando..."))
-            
-            # Ejecutar medición
-            thresholds, count_rates = self.sr400.measure_s_curve(
-                channel, start_v, end_v, steps, dwell_time,
-                progress_callback=self._safe_progress_update
-            )
-            
-            print(f"✅ Curva S completada: {len(thresholds)} puntos")
-            
-            # Actualizar resultados finales
-            QTimer.singleShot(0, lambda: self._finalize_scurve(thresholds, count_rates))
-            
-        except Exception as e:
-            print(f"❌ Error en curva S: {e}")
-            QTimer.singleShot(0, lambda: self._handle_scurve_error(str(e)))
-    def _safe_progress_update(self, progress, message):
-        """Actualización segura de progreso"""
-        from PyQt5.QtCore import QTimer
-        QTimer.singleShot(0, lambda: self._update_scurve_progress(progress, message))
-
-    def _update_scurve_progress(self, progress, message):
-        """Actualizar progreso en UI"""
-        try:
-            progress_percent = int(progress * 100)
-            self.scurve_progress.setValue(progress_percent)
-            self.scurve_status.setText(message)
-            print(f"📊 Progreso: {progress_percent}% - {message}")
-        except Exception as e:
-            print(f"Error actualizando progreso: {e}")
-
-    def _finalize_scurve(self, thresholds, count_rates):
-        """Finalizar medición de curva S"""
-        try:
-            import numpy as np
-            
-            # Convertir a arrays numpy si es necesario
-            if not hasattr(thresholds, '__array__'):
-                thresholds = np.array(thresholds)
-            if not hasattr(count_rates, '__array__'):
-                count_rates = np.array(count_rates)
-            
-            print(f"📈 Finalizando: {len(thresholds)} puntos")
-            
-            # Guardar datos
-            self.current_scurve_data = (thresholds, count_rates)
-            
-            # Actualizar gráfica
-            self.scurve_data_line.setData(thresholds, count_rates)
-            
-            # Calcular threshold óptimo
-            optimal_threshold = self.calculate_optimal_threshold(thresholds, count_rates)
-            max_count = np.max(count_rates) if len(count_rates) > 0 else 0
-            
-            # Dibujar línea de threshold óptimo
-            if self.optimal_threshold_line:
-                self.scurve_plot.removeItem(self.optimal_threshold_line)
-            
-            import pyqtgraph as pg
-            self.optimal_threshold_line = pg.InfiniteLine(
-                pos=optimal_threshold, angle=90, pen='r',
-                label=f'Óptimo: {optimal_threshold:.4f} V'
-            )
-            self.scurve_plot.addItem(self.optimal_threshold_line)
-            
-            # Actualizar labels
-            if hasattr(self, 'optimal_threshold_label'):
-                self.optimal_threshold_label.setText(f"{optimal_threshold:.4f} V")
-            if hasattr(self, 'max_count_label'):  
-                self.max_count_label.setText(f"{max_count:.1f} Hz")
-            if hasattr(self, 'points_measured_label'):
-                self.points_measured_label.setText(f"{len(thresholds)}")
-            
-            # Habilitar botones
-            self.export_scurve_btn.setEnabled(True)
-            self.apply_optimal_btn.setEnabled(True)
-            
-            # Finalizar medición
-            self.scurve_measuring = False
-            self.start_scurve_btn.setEnabled(True)
-            self.stop_scurve_btn.setEnabled(False)
-            self.scurve_progress.setVisible(False)
-            self.scurve_status.setText("Medición completada correctamente")
-            
-            print("🎉 Curva S finalizada exitosamente")
-            
-        except Exception as e:
-            print(f"Error finalizando curva S: {e}")
-            self._handle_scurve_error(str(e))
-
-    def _handle_scurve_error(self, error_msg):
-        """Manejar error de curva S"""
-        try:
-            self.scurve_measuring = False
-            self.start_scurve_btn.setEnabled(True)
-            self.stop_scurve_btn.setEnabled(False)
-            self.scurve_progress.setVisible(False)
-            self.scurve_status.setText(f"Error: {error_msg}")
-            print(f"❌ Error en curva S: {error_msg}")
-        except Exception as e:
-            print(f"Error manejando error de curva S: {e}")
-
-    def _simple_scurve_measurement(self, channel, start_v, end_v, steps, dwell_time):
-        """Medición de curva S simplificada - sin problemas de hilos"""
-        try:
-            print(f"🔧 Iniciando curva S: {steps} puntos")
-            
-            # Usar QTimer para actualizar UI desde hilo principal
-            from PyQt5.QtCore import QTimer
-            
-            # Actualizar progreso inicial
-            QTimer.singleShot(0, lambda: self._update_scurve_progress(0, "Iniciando..."))
-            
-            # Ejecutar medición
-            thresholds, count_rates = self.sr400.measure_s_curve(
-                channel, start_v, end_v, steps, dwell_time,
-                progress_callback=self._safe_progress_update
-            )
-            
-            print(f"✅ Curva S completada: {len(thresholds)} puntos")
-            
-            # Actualizar resultados finales
-            QTimer.singleShot(0, lambda: self._finalize_scurve(thresholds, count_rates))
-            
-        except Exception as e:
-            print(f"❌ Error en curva S: {e}")
-            QTimer.singleShot(0, lambda: self._handle_scurve_error(str(e)))
-
-        try:
-            from PyQt5.QtWidgets import QFileDialog
-            import numpy as np
-            
-            filename, _ = QFileDialog.getSaveFileName(
-                self, "Guardar Datos Curva S", "", "CSV Files (*.csv)"
-            )
-            
-            if filename:
-                if not filename.endswith('.csv'):
-                    filename += '.csv'
-            
-                thresholds, count_rates = self.current_scurve_data
-                
-                # Asegurarse de que son arrays numpy
-                if not hasattr(thresholds, '__array__'):
-                    thresholds = np.array(thresholds)
-                if not hasattr(count_rates, '__array__'):
-                    count_rates = np.array(count_rates)
-                
-                # Combinar datos
-                data = np.column_stack((thresholds, count_rates))
-                
-                # Guardar con header
-                np.savetxt(
-                    filename, 
-                    data, 
-                    delimiter=',', 
-                    header='Threshold (V),Count Rate (Hz)', 
-                    comments='',
-                    fmt='%.6f,%.2f'
-                )
-                
-                self.show_info(f"Datos exportados a {filename}")
-                print(f"💾 Datos exportados: {filename}")
-        
-        except Exception as e:
-            self.show_error(f"Error al exportar: {str(e)}")
-            print(f"❌ Error exportando: {e}")
 
         #Obtener parámetros
-        channel = DiscriminatorChannel.A if self.scurve_channel.currentIndex() == "Discriminador A" else DiscriminatorChannel.B
+        channel = DiscriminatorChannel.A if self.scurve_channel.currentIndex() == 0 else DiscriminatorChannel.B
         start_v = self.start_v.value()
         end_v = self.end_v.value()
         steps = self.scurve_steps.value()
@@ -1244,297 +1466,208 @@ class MainWindow(QMainWindow):
             self.show_error("Voltaje inicial debe ser menor que final")
             return
 
+        self._reset_scurve_plot(steps)
+        self._scurve_progress = (0.0, "Iniciando medición de Curva S...")
+
         #Configurar UI
         self.scurve_measuring = True
         self.start_scurve_btn.setEnabled(False)
         self.stop_scurve_btn.setEnabled(True)
+        self.apply_optimal_btn.setEnabled(False)
         self.scurve_progress.setVisible(True)
-        self.scurve_progress.setRange(0, steps)
+        self.scurve_progress.setRange(0, 100)
         self.scurve_progress.setValue(0)
-        self.scurve_status.setText("Iniciando medicion de  Curva S...")
+        self.scurve_status.setText("Iniciando medición de Curva S...")
+        self.optimal_threshold_label.setText("-- V")
+        self.max_count_label.setText("-- Hz")
+        self.points_measured_label.setText("0")
+        self.optimal_threshold_line.setVisible(False)
 
-        #Limpiar gráfica anterior
-        self.scurve_data_line.setData([], [])
-        if self.optimal_threshold_line:
-            self.scurve_plot.removeItem(self.optimal_threshold_line)
-            self.optimal_threshold_line = None
-        
         #Ejecutar en hilo separado para no bloquear UI
-        import threading
         self.scurve_thread = threading.Thread(
             target=self._run_scurve_measurement,
             args=(channel, start_v, end_v, steps, dwell_time),
+            name="scurve",
             daemon=True
         )
         self.scurve_thread.start()
+        self.scurve_timer.start()
+
+    def _reset_scurve_plot(self, steps):
+        """Vaciar la gráfica y preparar los arreglos de una medición nueva"""
+        #Arreglos preasignados: cada punto nuevo es una escritura, no una copia de la curva
+        self._scurve_x = np.full(steps, np.nan)
+        self._scurve_y = np.full(steps, np.nan)
+        self._scurve_count = 0
+        self._scurve_drawn = 0
+        self._scurve_ordered = True
+        self._scurve_max = -np.inf
+        self._scurve_last_fit = 0.0
+        self._clear_scurve_segments()
+        self.scurve_data_line.setData([], [])
 
-    # Agrega estos métodos a main_window.py
-
-    
-def _simple_scurve_measurement(self, channel, start_v, end_v, steps, dwell_time):
-    """Medición de curva S simplificada - sin problemas de hilos"""
-    try:
-        print(f"🔧 Iniciando curva S: {steps} puntos")
-        
-        # Usar QTimer para actualizar UI desde hilo principal
-        from PyQt5.QtCore import QTimer
-        import numpy as np
-        
-        # Actualizar progreso inicial
-        QTimer.singleShot(0, lambda: self._update_scurve_progress(0, "Iniciando..."))
-        
-        # Ejecutar medición
-        thresholds, count_rates = self.sr400.measure_s_curve(
-            channel, start_v, end_v, steps, dwell_time,
-            progress_callback=self._safe_progress_update
-        )
-        
-        print(f"✅ Curva S completada: {len(thresholds)} puntos")
-        
-        # Actualizar resultados finales
-        QTimer.singleShot(0, lambda: self._finalize_scurve(thresholds, count_rates))
-        
-    except Exception as e:
-        print(f"❌ Error en curva S: {e}")
-        QTimer.singleShot(0, lambda: self._handle_scurve_error(str(e)))
-
-def _safe_progress_update(self, progress, message):
-    """Actualización segura de progreso"""
-    from PyQt5.QtCore import QTimer
-    QTimer.singleShot(0, lambda: self._update_scurve_progress(progress, message))
-
-def _update_scurve_progress(self, progress, message):
-    """Actualizar progreso en UI"""
-    try:
-        progress_percent = int(progress * 100)
-        self.scurve_progress.setValue(progress_percent)
-        self.scurve_status.setText(message)
-        print(f"📊 Progreso: {progress_percent}% - {message}")
-    except Exception as e:
-        print(f"Error actualizando progreso: {e}")
-
-def _finalize_scurve(self, thresholds, count_rates):
-    """Finalizar medición de curva S"""
-    try:
-        import numpy as np
-        
-        # Convertir a arrays numpy si es necesario
-        if not hasattr(thresholds, '__array__'):
-            thresholds = np.array(thresholds)
-        if not hasattr(count_rates, '__array__'):
-            count_rates = np.array(count_rates)
-        
-        print(f"📈 Finalizando: {len(thresholds)} puntos")
-        
-        # Guardar datos
-        self.current_scurve_data = (thresholds, count_rates)
-        
-        # Actualizar gráfica
-        self.scurve_data_line.setData(thresholds, count_rates)
-        
-        # Calcular threshold óptimo
-        optimal_threshold = self.calculate_optimal_threshold(thresholds, count_rates)
-        max_count = np.max(count_rates) if len(count_rates) > 0 else 0
-        
-        # Dibujar línea de threshold óptimo
-        if self.optimal_threshold_line:
-            self.scurve_plot.removeItem(self.optimal_threshold_line)
-        
-        import pyqtgraph as pg
-        self.optimal_threshold_line = pg.InfiniteLine(
-            pos=optimal_threshold, angle=90, pen='r',
-            label=f'Óptimo: {optimal_threshold:.4f} V'
-        )
-        self.scurve_plot.addItem(self.optimal_threshold_line)
-        
-        # Actualizar labels (corregir nombres)
-        if hasattr(self, 'optimal_threshold_label'):
-            self.optimal_threshold_label.setText(f"{optimal_threshold:.4f} V")
-        if hasattr(self, 'max_count_label'):  
-            self.max_count_label.setText(f"{max_count:.1f} Hz")
-        if hasattr(self, 'points_measured_label'):
-            self.points_measured_label.setText(f"{len(thresholds)}")
-        
-        # Habilitar botones
-        self.export_scurve_btn.setEnabled(True)
-        self.apply_optimal_btn.setEnabled(True)
-        
-        # Finalizar medición
-        self.scurve_measuring = False
-        self.start_scurve_btn.setEnabled(True)
+    def stop_scurve_measurement(self):
+        """Detener medición de Curva S (se conservan los puntos ya medidos)"""
+        print("⏹️ Deteniendo medición de curva S...")
         self.stop_scurve_btn.setEnabled(False)
-        self.scurve_progress.setVisible(False)
-        self.scurve_status.setText("Medición completada correctamente")
-        
-        print("🎉 Curva S finalizada exitosamente")
-        
-    except Exception as e:
-        print(f"Error finalizando curva S: {e}")
-        self._handle_scurve_error(str(e))
+        self.scurve_status.setText("Deteniendo medición...")
+        if hasattr(self.sr400, '_scurve_cancel'):
+            self.sr400._scurve_cancel = True
 
-def _handle_scurve_error(self, error_msg):
-    """Manejar error de curva S"""
-    try:
-        self.scurve_measuring = False
-        self.start_scurve_btn.setEnabled(True)
-        self.stop_scurve_btn.setEnabled(False)
-        self.scurve_progress.setVisible(False)
-        self.scurve_status.setText(f"Error: {error_msg}")
-        print(f"❌ Error en curva S: {error_msg}")
-    except Exception as e:
-        print(f"Error manejando error de curva S: {e}")
-    
-    def _thread_safe_progress_callback(self, progress, message):
-        """Callback seguro para hilos - usa invokeMethod"""
-        from PyQt5.QtCore import QMetaObject, Qt, Q_ARG
+    def _run_scurve_measurement(self, channel, start_v, end_v, steps, dwell_time):
+        """Hilo de medición: solo escribe en los arreglos; la UI se pinta con scurve_timer"""
         try:
-            QMetaObject.invokeMethod(
-                self, 
-                "_update_progress_ui", 
-                Qt.QueuedConnection,
-                Q_ARG(float, progress),
-                Q_ARG(str, message)
+            print(f"🔧 Iniciando curva S: {steps} puntos")
+            thresholds, count_rates = self.sr400.measure_s_curve(
+                channel, start_v, end_v, steps, dwell_time,
+                progress_callback=self._on_scurve_progress,
+                point_callback=self._on_scurve_point
             )
+            print(f"✅ Curva S completada: {len(thresholds)} puntos")
+            self.scurve_finished.emit(np.asarray(thresholds), np.asarray(count_rates))
         except Exception as e:
-            print(f"Error en callback: {e}")
-
-    def _invoke_update_progress(self, progress, message):
-        """Actualizar progreso de forma segura"""
-        from PyQt5.QtCore import QMetaObject, Qt, Q_ARG
-        QMetaObject.invokeMethod(
-            self, 
-            "_update_progress_ui", 
-            Qt.QueuedConnection,
-            Q_ARG(float, progress),
-            Q_ARG(str, message)
-        )
-
-    def _invoke_update_results(self, thresholds, count_rates):
-        """Actualizar resultados de forma segura"""
-        from PyQt5.QtCore import QMetaObject, Qt, Q_ARG
-        import numpy as np
-    
-        # Convertir a listas para serialización (Q_ARG no maneja numpy arrays bien)
-        thresholds_list = thresholds.tolist() if hasattr(thresholds, 'tolist') else list(thresholds)
-        count_rates_list = count_rates.tolist() if hasattr(count_rates, 'tolist') else list(count_rates)
-    
-        QMetaObject.invokeMethod(
-            self, 
-            "_update_scurve_ui", 
-            Qt.QueuedConnection,
-            Q_ARG(list, thresholds_list),
-            Q_ARG(list, count_rates_list)
-        )
-
-    def _invuke_handle_error(self, error_msg):
-        """Manejar error de forma segura"""
-        from PyQt5.QtCore import QMetaObject, Qt, Q_ARG
-        QMetaObject.invokeMethod(
-            self, 
-            "_show_scurve_error_ui", 
-            Qt.QueuedConnection,
-            Q_ARG(str, error_msg)
-        )
-        
-    def _update_scurve_progress(self, progress, message):
-        """Actualizar progreso desde el hilo de medición"""
-        from PyQt5.QtCore import QTimer
-        QTimer.singleShot(0, lambda: self._update_progress_ui(progress, message))
+            print(f"❌ Error en curva S: {e}")
+            self.scurve_failed.emit(str(e))
 
-    def _update_progress_ui(self, progress, message):
-        """Actualizar UI de progreso en el hilo principal"""
-        try:
-            self.scurve_progress.setValue(int(progress * 100))
-            self.scurve_status.setText(message)
-            print(f"📊 Progreso: {progress*100:.1f}% - {message}")
-        except Exception as e:
-            print(f"Error actualizando progreso: {e}")
-    
-    def _update_scurve_results(self, thresholds, count_rates):
-        """Actualizar UI con resultados de Curva S (llamar desde hilo principal)"""
-        #Usar QTimer para ejecutar en hilo principal de Qt
-        from PyQt5.QtCore import QTimer
-        QTimer.singleShot(0, lambda: self._update_scurve_ui(thresholds, count_rates))
-    
-    def _update_scurve_ui(self, thresholds, count_rates):
-        """Actualizar UI con los resultados"""
-        try:
-            #Guardar datos
-            self.current_scurve_data = (thresholds, count_rates)
+    def _on_scurve_point(self, threshold, count_rate):
+        """Punto nuevo (hilo de medición)"""
+        i = self._scurve_count
+        if i >= len(self._scurve_x):
+            return
+        self._scurve_x[i] = threshold
+        self._scurve_y[i] = count_rate
+        #Un barrido que mide fuera de orden (adaptativo) se redibuja ordenado en cada cuadro
+        if i > 0 and threshold < self._scurve_x[i - 1]:
+            self._scurve_ordered = False
+        #El contador se publica después del punto: el temporizador nunca lee un punto a medias
+        self._scurve_count = i + 1
+
+    def _on_scurve_progress(self, progress, message):
+        """Progreso (hilo de medición); se muestra en el siguiente repintado"""
+        self._scurve_progress = (progress, message)
+
+    def _refresh_scurve_plot(self):
+        """Repintado de la curva en curso, a SCURVE_FPS como máximo"""
+        progress, message = self._scurve_progress
+        self.scurve_progress.setValue(int(progress * 100))
+        self.scurve_status.setText(message)
 
-            #Actualizar gráfica
-            self.scurve_data_line.setData(thresholds, count_rates)
+        n = self._scurve_count
+        drawn = self._scurve_drawn
+        if n == drawn:
+            return
+        self._scurve_drawn = n
+        thresholds, count_rates = self._scurve_x[:n], self._scurve_y[:n]
+        if self._scurve_ordered:
+            self._append_scurve(drawn, n)
+        else:
+            self._draw_scurve(thresholds, count_rates)
+        self.points_measured_label.setText(f"{n}")
+        #Máximo acumulado: solo se revisan los puntos nuevos
+        new_rates = count_rates[drawn:]
+        new_rates = new_rates[np.isfinite(new_rates)]
+        if new_rates.size:
+            self._scurve_max = max(self._scurve_max, new_rates.max())
+            self.max_count_label.setText(f"{self._scurve_max:.1f} Hz")
+
+        #El ajuste recorre toda la curva: se limita a uno cada SCURVE_FIT_INTERVAL
+        now = time.monotonic()
+        if now - self._scurve_last_fit >= self.SCURVE_FIT_INTERVAL:
+            self._scurve_last_fit = now
+            self._show_optimal_threshold(thresholds, count_rates)
+
+    def _append_scurve(self, drawn, n):
+        """Barrido ordenado: se agregan los puntos nuevos al último tramo, sin tocar el resto"""
+        if not self._scurve_segments or drawn - self._scurve_segment_start >= self.SCURVE_SEGMENT_POINTS:
+            #Tramo nuevo desde el último punto dibujado para que la línea no se corte
+            self._scurve_segment_start = max(drawn - 1, 0)
+            self._scurve_segments.append(self.scurve_plot.plot(pen='b', symbol='o', symbolSize=5,
+                                                               connect='finite'))
+        start = self._scurve_segment_start
+        self._scurve_segments[-1].setData(self._scurve_x[start:n], self._scurve_y[start:n])
+
+    def _clear_scurve_segments(self):
+        for segment in self._scurve_segments:
+            self.scurve_plot.removeItem(segment)
+        self._scurve_segments = []
+        self._scurve_segment_start = 0
+
+    def _draw_scurve(self, thresholds, count_rates):
+        """Dibujar la curva completa, ordenada por threshold si se midió fuera de orden"""
+        self._clear_scurve_segments()
+        thresholds, count_rates = np.asarray(thresholds), np.asarray(count_rates)
+        if np.any(np.diff(thresholds) < 0):
+            order = np.argsort(thresholds, kind='stable')
+            thresholds, count_rates = thresholds[order], count_rates[order]
+        self.scurve_data_line.setData(thresholds, count_rates)
 
-            #Calcular threshold óptimo
-            optimal_threshold = self.calculate_optimal_threshold(thresholds, count_rates)
-            max_count = np.max(count_rates) if len(count_rates) > 0 else 0
+    def _show_optimal_threshold(self, thresholds, count_rates):
+        """Mover el marcador del threshold óptimo"""
+        if not np.any(np.isfinite(count_rates)):
+            return
+        optimal_threshold = self.calculate_optimal_threshold(thresholds, count_rates)
+        self.optimal_threshold_line.setValue(optimal_threshold)
+        self.optimal_threshold_line.setVisible(True)
+        self.optimal_threshold_label.setText(f"{optimal_threshold:.4f} V")
 
-            #Dibujar linea de threshold óptimo
-            if self.optimal_threshold_line:
-                self.scurve_plot.removeItem(self.optimal_threshold_line)
-            
-            self.optimal_threshold_line = pg.InfiniteLine(
-                pos=optimal_threshold, angle=90, pen='r',
-                label=f'Óptimo: {optimal_threshold:.4f} V'
-            )
-            self.scurve_plot.addItem(self.optimal_threshold_line)
+    def _finish_scurve_ui(self, status):
+        """Dejar la pestaña lista para otra medición"""
+        self.scurve_timer.stop()
+        self.scurve_measuring = False
+        self.start_scurve_btn.setEnabled(True)
+        self.stop_scurve_btn.setEnabled(False)
+        self.scurve_progress.setVisible(False)
+        self.scurve_status.setText(status)
 
-            #Actualizar labels
-            self.optimal_threshold_label.setText(f"{optimal_threshold:.4f} V")
-            self.max_count_label.setText(f"{max_count:.1f} Hz")
-            self.points_measured_label.setText(f"{len(thresholds)}")
+    def _finalize_scurve(self, thresholds, count_rates):
+        """Finalizar medición de curva S con la curva completa"""
+        print(f"📈 Finalizando: {len(thresholds)} puntos")
+        cancelled = getattr(self.sr400, '_scurve_cancel', False)
+        self.current_scurve_data = (thresholds, count_rates)
 
-            #Habilitar botones
-            self.export_scurve_btn.setEnabled(True)
+        self._draw_scurve(thresholds, count_rates)
+        self.points_measured_label.setText(f"{len(thresholds)}")
+        if np.any(np.isfinite(count_rates)):
+            self.max_count_label.setText(f"{np.nanmax(count_rates):.1f} Hz")
+            self._show_optimal_threshold(thresholds, count_rates)
             self.apply_optimal_btn.setEnabled(True)
+        self.export_scurve_btn.setEnabled(len(thresholds) > 0)
 
-            #Finalizar medición
-            self.scurve_measuring = False
-            self.start_scurve_btn.setEnabled(True)
-            self.stop_scurve_btn.setEnabled(False)
-            self.scurve_progress.setVisible(False)
-            self.scurve_status.setText("Medición completada correctamente")
-        
-        except Exception as e:
-            self._handle_scurve_error(str(e))
+        self._finish_scurve_ui("Medición detenida por el usuario" if cancelled else "Medición completada correctamente")
+        print("🎉 Curva S finalizada")
+
+    def _handle_scurve_error(self, error_msg):
+        """Manejar error de curva S (hilo de la UI)"""
+        #Se dibuja lo medido antes del error
+        self._refresh_scurve_plot()
+        n = self._scurve_count
+        self._draw_scurve(self._scurve_x[:n], self._scurve_y[:n])
+        self._finish_scurve_ui(f"Error: {error_msg}")
+        self.show_error(f"Error en Curva S: {error_msg}")
 
     def calculate_optimal_threshold(self, thresholds, count_rates):
-        """Calcular threshold óptimo a partir de la curva S"""      
-        if len(count_rates) == 0:
-            return 0.0
-
-        #Encontrar la meseta (donde la derivada es mínima)
-        if len(count_rates)>3:
-            derivative = np.gradient(count_rates)
-            #Buscar región donde la derivada es cercana a cero
-            plateau_indices = np.where(np.abs(derivative) < 0.1)[0]
-            if len(plateau_indices) > 0:
-                optimal_idx = plateau_indices[len(plateau_indices)//2]
-                return thresholds[optimal_idx]
-
-        #Fallback: máximo de la curva
-        return thresholds[np.argmax(count_rates)]
+        """Calcular threshold óptimo a partir de la curva S (mismo ajuste que find_optimal_threshold)"""
+        return optimal_threshold(thresholds, count_rates)
 
-    def stop_scurve_measurement(self):
-        """Detener medición de Curva S"""
-        self.scurve_measuring = False
-        self.scurve_status.setText("Medición detenida por el usuario")
-        self.start_scurve_btn.setEnabled(True)
-        self.stop_scurve_btn.setEnabled(False)
-        self.scurve_progress.setVisible(False)
-        
     def apply_optimal_threshold(self):
         """Aplicar el threshold óptimo calculado"""
-        if self.current_scurve_data:
-            thresholds, count_rates = self.current_scurve_data
-            optimal_threshold = self.calculate_optimal_threshold(thresholds, count_rates)
-            channel = DiscriminatorChannel.A if self.scurve_channel.currentIndex() == "Discriminador A" else DiscriminatorChannel.B
-            success = self.sr400.set_discriminator_level(channel, optimal_threshold)
-            
-            if success:
-                self.show_info(f"Threshold óptimo hallado {optimal_threshold:.4f} V")
-            else:
-                self.show_error("Error al aplicar threshold óptimo")
+        if not self.current_scurve_data:
+            self.show_error("No hay datos de curva S para aplicar threshold óptimo")
+            return
+        thresholds, count_rates = self.current_scurve_data
+        optimal_threshold = self.calculate_optimal_threshold(thresholds, count_rates)
+        channel = DiscriminatorChannel.A if self.scurve_channel.currentIndex() == 0 else DiscriminatorChannel.B
+        self._run_sr400(self.sr400.set_discriminator_level, channel, optimal_threshold,
+                        callback=lambda success: self._on_optimal_threshold_applied(success, optimal_threshold))
+
+    def _on_optimal_threshold_applied(self, success, optimal_threshold):
+        """Resultado de set_discriminator_level (hilo de la UI)"""
+        if success:
+            message = f"Threshold óptimo aplicado: {optimal_threshold:.4f} V"
+            self.statusBar().showMessage(message)
+            print(f"✅ {message}")
+        else:
+            self.show_error("Error al aplicar threshold óptimo")
 
     def export_scurve_data(self):
         """Exportar datos de Curva S a archivo CSV"""
@@ -1549,28 +1682,24 @@ def _handle_scurve_error(self, error_msg):
             if filename:
                 if not filename.endswith('.csv'):
                     filename += '.csv'
-            
-                thresholds, count_rates = self.current_scurve_data
-                data = np.column_stack((thresholds, count_rates))
-                np.savetxt(filename, data, delimiter=',', header='Threshold (V),Count Rate (Hz)', comments='')
-                self.show_info(f"Datos exportados a {filename}")
-    
-        except Exception as e:
-            self.show_error(f"Error al exportar: {str(e)}")
 
-    def _handle_scurve_error(self, error_msg):
-        """Manejar error de Curva S en la UI"""
-        from PyQt5.QtCore import QTimer
-        QTimer.singleShot(0, lambda: self._show_scurve_error_ui(error_msg))
+                #La curva se guarda como sesión y el CSV se genera desde ella
+                thresholds, count_rates = (np.asarray(values, dtype=float) for values in self.current_scurve_data)
+                #Los puntos sin lectura (NaN) no se exportan
+                measured = np.isfinite(count_rates)
+                skipped = int(np.count_nonzero(~measured))
+                thresholds, count_rates = thresholds[measured], count_rates[measured]
+                with SessionWriter(new_session_path(SESSIONS_DIR, "curva_s"), fields=("threshold", "count_rate"),
+                                   flush_interval=None) as writer:
+                    writer.extend(thresholds, count_rates)
+                #Mismo encabezado que el CSV de curva S de versiones anteriores
+                SessionReader(writer.path).to_csv(filename, header=("Threshold (V)", "Count Rate (Hz)"))
+                self.refresh_sessions()
+                note = f"\n\n{skipped} punto(s) sin lectura se omitieron" if skipped else ""
+                self.show_info(f"Datos exportados a {filename}{note}")
 
-    def _show_scurve_error_ui(self, error_msg):
-        """Mostrar error de Curva S en la UI"""
-        self.scurve_measuring = False
-        self.start_scurve_btn.setEnabled(True)
-        self.stop_scurve_btn.setEnabled(False)
-        self.scurve_progress.setVisible(False)
-        self.scurve_status.setText(f"Error: {error_msg}")
-        self.show_error(f"Error en Curva S: {error_msg}")
+        except Exception as e:
+            self.show_error(f"Error al exportar: {str(e)}")
 
     def show_info(self, message):
         """Mostrar mensaje informativo"""
@@ -1578,20 +1707,20 @@ def _handle_scurve_error(self, error_msg):
 
     def verify_event_connections(self):
         """Verificar que todos los eventos estén correctamente conectados"""
-        if not hasattr(self.sr400, 'on_data_received') or self.sr400.on_data_received != self.on_data_received:
-            self.sr400.on_data_received = self.on_data_received
+        if not hasattr(self.sr400, 'on_data_received') or self.sr400.on_data_received != self.sr400_data_received.emit:
+            self.sr400.on_data_received = self.sr400_data_received.emit
             print("✅ on_data_received conectado")
-    
-        if not hasattr(self.sr400, 'on_error') or self.sr400.on_error != self.on_error:
-            self.sr400.on_error = self.on_error
+
+        if not hasattr(self.sr400, 'on_error') or self.sr400.on_error != self.sr400_error.emit:
+            self.sr400.on_error = self.sr400_error.emit
             print("✅ on_error conectado")
-        
-        if not hasattr(self.sr400, 'on_status_changed') or self.sr400.on_status_changed != self.on_status_changed:
-            self.sr400.on_status_changed = self.on_status_changed
+
+        if not hasattr(self.sr400, 'on_status_changed') or self.sr400.on_status_changed != self.sr400_status_changed.emit:
+            self.sr400.on_status_changed = self.sr400_status_changed.emit
             print("✅ on_status_changed conectado")
-        
-        if not hasattr(self.sr400, 'on_counting_changed') or self.sr400.on_counting_changed != self.on_counting_changed:
-            self.sr400.on_counting_changed = self.on_counting_changed
+
+        if not hasattr(self.sr400, 'on_counting_changed') or self.sr400.on_counting_changed != self.sr400_counting_changed.emit:
+            self.sr400.on_counting_changed = self.sr400_counting_changed.emit
             print("✅ on_counting_changed conectado")
 
 
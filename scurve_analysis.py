@@ -0,0 +1,259 @@
+# scurve_analysis.py
+"""
+Ajuste de curvas S (sigmoide + fondo) y threshold óptimo con incertidumbres.
+
+Modelo:  rate(x) = fondo + amplitud / (1 + exp(-(x - centro) / ancho))
+
+El signo de ancho indica si la curva sube o baja con el threshold. El threshold
+óptimo es la entrada a la meseta: el punto donde el modelo alcanza
+plateau_fraction del escalón (centro + ancho * logit(plateau_fraction)).
+
+fit_s_curves ajusta un arreglo 2-D de curvas en una sola llamada: Levenberg-Marquardt
+vectorizado sobre todas las curvas a la vez, sin bucles de Python por curva.
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+#Índices de los parámetros del modelo
+BACKGROUND, AMPLITUDE, CENTER, WIDTH = range(4)
+
+#Escalón mínimo, en desviaciones estándar de la amplitud, para aceptar un ajuste
+MIN_STEP_SIGNIFICANCE = 3.0
+
+@dataclass
+class SCurveFit:
+    """
+    Resultado del ajuste; cada campo es un arreglo con un valor por curva
+    """
+    background: np.ndarray
+    amplitude: np.ndarray
+    center: np.ndarray
+    width: np.ndarray
+    covariance: np.ndarray      # (curvas, 4, 4)
+    threshold: np.ndarray
+    threshold_err: np.ndarray
+    plateau: np.ndarray
+    plateau_err: np.ndarray
+    chi2_red: np.ndarray
+    converged: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.threshold)
+
+    @property
+    def center_err(self) -> np.ndarray:
+        return np.sqrt(self.covariance[:, CENTER, CENTER])
+
+    @property
+    def width_err(self) -> np.ndarray:
+        return np.sqrt(self.covariance[:, WIDTH, WIDTH])
+
+def s_curve_model(x: np.ndarray, params: np.ndarray) -> np.ndarray:
+    """Evalúa el modelo; params tiene forma (curvas, 4) y x (puntos,) o (curvas, puntos)"""
+    params = np.atleast_2d(params)
+    b, a, x0, w = (params[:, i:i + 1] for i in range(4))
+    return b + a * _sigmoid((x - x0) / w)
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    #Forma estable numéricamente
+    return 0.5 * (1.0 + np.tanh(0.5 * z))
+
+def _initial_guess(x: np.ndarray, y: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """Estimación inicial vectorizada a partir de extremos y cruce del 50%"""
+    m, n = y.shape
+    quarter = max(1, n // 4)
+    filled = np.where(valid, y, np.nan)
+    with np.errstate(all='ignore'):
+        low_end = np.nanmean(filled[:, :quarter], axis=1)
+        high_end = np.nanmean(filled[:, -quarter:], axis=1)
+    low_end = np.nan_to_num(low_end)
+    high_end = np.nan_to_num(high_end)
+    rising = high_end >= low_end
+
+    background = np.minimum(low_end, high_end)
+    amplitude = np.maximum(np.abs(high_end - low_end), 1e-12)
+
+    #Centro: primer punto que cruza la mitad del escalón en el sentido de la curva
+    half = background + amplitude / 2
+    above = np.where(valid, y >= half[:, None], False)
+    crossing = np.where(rising, np.argmax(above, axis=1), np.argmax(~above & valid, axis=1))
+    center = np.take_along_axis(x, crossing[:, None], axis=1)[:, 0]
+
+    span = np.nanmax(np.where(valid, x, np.nan), axis=1) - np.nanmin(np.where(valid, x, np.nan), axis=1)
+    width = np.where(rising, 1.0, -1.0) * np.maximum(span, 1e-12) / 20
+    return np.column_stack([background, amplitude, center, width])
+
+def _jacobian(x: np.ndarray, params: np.ndarray):
+    """Modelo y derivadas respecto a (fondo, amplitud, centro, ancho)"""
+    b, a, x0, w = (params[:, i:i + 1] for i in range(4))
+    z = (x - x0) / w
+    s = _sigmoid(z)
+    ds = s * (1.0 - s)
+    model = b + a * s
+    jac = np.stack([np.ones_like(s), s, -a * ds / w, -a * ds * z / w], axis=-1)
+    return model, jac
+
+def fit_s_curves(thresholds: np.ndarray,
+                 count_rates: np.ndarray,
+                 sigma: Optional[np.ndarray] = None,
+                 plateau_fraction: float = 0.95,
+                 max_iter: int = 200,
+                 tolerance: float = 1e-10) -> SCurveFit:
+    """
+    Ajusta una o varias curvas S.
+
+    thresholds: (puntos,) compartido o (curvas, puntos)
+    count_rates: (puntos,) o (curvas, puntos); los NaN se ignoran
+    sigma: error de cada tasa; por defecto forma Poisson (sqrt de la tasa) y la
+           covarianza se escala con el chi² reducido
+
+    converged es False si el amortiguamiento se desbocó, si el centro o el threshold
+    quedan fuera del rango medido, si la covarianza es singular o si el escalón no es
+    significativo; esos resultados no deben usarse.
+    """
+    y = np.atleast_2d(np.asarray(count_rates, dtype=float))
+    x = np.broadcast_to(np.asarray(thresholds, dtype=float), y.shape)
+    m, n = y.shape
+    valid = np.isfinite(y) & np.isfinite(x)
+
+    if sigma is None:
+        #Forma Poisson con piso para no dar peso infinito a puntos en cero
+        floor = np.maximum(np.nanmax(np.where(valid, np.abs(y), np.nan), axis=1, keepdims=True), 1.0) * 1e-3
+        sigma = np.sqrt(np.maximum(np.abs(np.nan_to_num(y)), floor))
+        absolute_sigma = False
+    else:
+        sigma = np.broadcast_to(np.asarray(sigma, dtype=float), y.shape)
+        absolute_sigma = True
+    weights = np.where(valid & (sigma > 0), 1.0 / np.where(sigma > 0, sigma, 1.0)**2, 0.0)
+    y_clean = np.where(valid, y, 0.0)
+    x_clean = np.where(valid, x, 0.0)
+
+    params = _initial_guess(x_clean, y_clean, valid)
+    damping = np.full(m, 1e-3)
+    model, jac = _jacobian(x_clean, params)
+    cost = np.sum(weights * (y_clean - model)**2, axis=1)
+    converged = np.zeros(m, dtype=bool)
+    #Amortiguamiento desbocado: ningún paso reduce el costo y el ajuste no llegó a un mínimo
+    failed = np.zeros(m, dtype=bool)
+
+    for _ in range(max_iter):
+        active = ~converged & ~failed
+        if not active.any():
+            break
+        residual = y_clean - model
+        jtw = jac * weights[..., None]
+        jtj = np.einsum('mnk,mnl->mkl', jtw, jac)
+        gradient = np.einsum('mnk,mn->mk', jtw, residual)
+
+        diagonal = np.einsum('mkk->mk', jtj)
+        system = jtj + (damping[:, None] * np.maximum(diagonal, 1e-30))[:, :, None] * np.eye(4)
+        try:
+            step = np.linalg.solve(system, gradient[..., None])[..., 0]
+        except np.linalg.LinAlgError:
+            step = np.einsum('mkl,ml->mk', np.linalg.pinv(system), gradient)
+        step[~active] = 0.0
+
+        trial = params + step
+        #El ancho no puede cruzar por cero
+        trial[:, WIDTH] = np.where(np.sign(trial[:, WIDTH]) == np.sign(params[:, WIDTH]),
+                                   trial[:, WIDTH], params[:, WIDTH] / 2)
+        trial_model, trial_jac = _jacobian(x_clean, trial)
+        trial_cost = np.sum(weights * (y_clean - trial_model)**2, axis=1)
+
+        improved = active & np.isfinite(trial_cost) & (trial_cost <= cost)
+        relative_change = np.abs(cost - trial_cost) / np.maximum(cost, 1e-300)
+        params[improved] = trial[improved]
+        model[improved] = trial_model[improved]
+        jac[improved] = trial_jac[improved]
+        converged |= improved & (relative_change < tolerance)
+        cost[improved] = trial_cost[improved]
+        damping = np.where(improved, damping / 10, damping * 10)
+        failed |= active & ~improved & (damping > 1e12)
+        damping = np.clip(damping, 1e-12, 1e13)
+
+    #Covarianza en el mínimo
+    jtw = jac * weights[..., None]
+    jtj = np.einsum('mnk,mnl->mkl', jtw, jac)
+    covariance = np.linalg.pinv(jtj)
+    dof = np.maximum(valid.sum(axis=1) - 4, 1)
+    chi2_red = cost / dof
+    if not absolute_sigma:
+        covariance = covariance * chi2_red[:, None, None]
+
+    #Threshold óptimo: entrada a la meseta, con propagación de errores
+    logit = np.log(plateau_fraction / (1.0 - plateau_fraction))
+    threshold = params[:, CENTER] + params[:, WIDTH] * logit
+    grad_threshold = np.zeros((m, 4))
+    grad_threshold[:, CENTER] = 1.0
+    grad_threshold[:, WIDTH] = logit
+    threshold_var = np.einsum('mk,mkl,ml->m', grad_threshold, covariance, grad_threshold)
+
+    #Un mínimo solo es un ajuste válido si la transición está dentro del rango medido y
+    #los cuatro parámetros quedan determinados (matriz de información no singular)
+    x_min = np.nanmin(np.where(valid, x, np.nan), axis=1)
+    x_max = np.nanmax(np.where(valid, x, np.nan), axis=1)
+    inside = ((params[:, CENTER] >= x_min) & (params[:, CENTER] <= x_max)
+              & (threshold >= x_min) & (threshold <= x_max))
+    scale = np.sqrt(np.maximum(np.einsum('mkk->mk', jtj), 1e-300))
+    with np.errstate(all='ignore'):
+        correlation = jtj / (scale[:, :, None] * scale[:, None, :])
+    regular = np.all(np.isfinite(correlation), axis=(1, 2))
+    regular[regular] = np.linalg.eigvalsh(correlation[regular])[:, 0] > 1e-10
+    #Sin escalón significativo (curva plana) el centro solo sigue al ruido
+    with np.errstate(all='ignore'):
+        step = np.abs(params[:, AMPLITUDE]) >= MIN_STEP_SIGNIFICANCE * np.sqrt(covariance[:, AMPLITUDE, AMPLITUDE])
+    converged = converged & ~failed & inside & regular & step
+
+    plateau = params[:, BACKGROUND] + params[:, AMPLITUDE]
+    plateau_var = (covariance[:, BACKGROUND, BACKGROUND] + covariance[:, AMPLITUDE, AMPLITUDE]
+                   + 2 * covariance[:, BACKGROUND, AMPLITUDE])
+
+    return SCurveFit(
+        background=params[:, BACKGROUND],
+        amplitude=params[:, AMPLITUDE],
+        center=params[:, CENTER],
+        width=params[:, WIDTH],
+        covariance=covariance,
+        threshold=threshold,
+        threshold_err=np.sqrt(np.maximum(threshold_var, 0.0)),
+        plateau=plateau,
+        plateau_err=np.sqrt(np.maximum(plateau_var, 0.0)),
+        chi2_red=chi2_red,
+        converged=converged,
+    )
+
+def optimal_threshold(thresholds: np.ndarray, count_rates: np.ndarray, plateau_fraction: float = 0.95) -> float:
+    """
+    Threshold óptimo de una sola curva, limitado al rango medido.
+    Con datos insuficientes o un ajuste que no convergió usa la estimación empírica.
+    """
+    thresholds = np.asarray(thresholds, dtype=float)
+    count_rates = np.asarray(count_rates, dtype=float)
+    if not np.any(np.isfinite(count_rates)):
+        return 0.0
+    if np.count_nonzero(np.isfinite(count_rates)) >= 5 and np.nanmax(count_rates) > np.nanmin(count_rates):
+        fit = fit_s_curves(thresholds, count_rates, plateau_fraction=plateau_fraction)
+        if fit.converged[0] and np.isfinite(fit.threshold[0]):
+            return float(np.clip(fit.threshold[0], np.min(thresholds), np.max(thresholds)))
+    return empirical_threshold(thresholds, count_rates, plateau_fraction)
+
+def empirical_threshold(thresholds: np.ndarray, count_rates: np.ndarray, plateau_fraction: float = 0.95) -> float:
+    """
+    Entrada a la meseta sin ajuste: el punto medido que alcanza plateau_fraction del
+    escalón más cerca del flanco. Sin escalón, el punto de tasa máxima.
+    """
+    thresholds = np.asarray(thresholds, dtype=float)
+    count_rates = np.asarray(count_rates, dtype=float)
+    valid = np.isfinite(thresholds) & np.isfinite(count_rates)
+    #Los barridos adaptativos entregan los puntos fuera de orden
+    order = np.argsort(thresholds[valid])
+    x, y = thresholds[valid][order], count_rates[valid][order]
+    background, amplitude, _, width = _initial_guess(x[None, :], y[None, :], np.ones((1, len(y)), dtype=bool))[0]
+    reached = np.flatnonzero(y >= background + plateau_fraction * amplitude)
+    if len(reached) == 0 or amplitude <= 1e-12:
+        return float(x[np.argmax(y)])
+    #Curva de subida: primer punto en la meseta; de bajada, el último
+    return float(x[reached[0]] if width > 0 else x[reached[-1]])
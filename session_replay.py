@@ -0,0 +1,280 @@
+# session_replay.py
+"""
+Reproducción de sesiones grabadas por la misma tubería que una adquisición real
+(no importa Qt).
+
+Dos fuentes, según lo que se quiera ejercitar:
+
+    ReplaySR400     SR400 cuyo puerto serial es la transcripción de la sesión: la
+                    clase real envía sus comandos y procesa las respuestas grabadas
+                    (queries, stream_counts, estadísticas del enlace, CLI).
+    SessionReplay   las muestras del almacén de la sesión en bloques, al ritmo de la
+                    grabación; ReplayWorker (acquisition_worker) las publica en la
+                    interfaz como si vinieran del hilo de adquisición.
+
+speed=1.0 reproduce en tiempo real, speed=N N veces más rápido y speed=None sin
+esperas (velocidad máxima).
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from typing import Iterator, List, Optional
+
+import numpy as np
+
+from sr400_controller import SR400, ReconnectPolicy
+from session_store import SessionReader, TranscriptEntry, read_transcript
+
+class ReplayClock:
+    """Tiempo de la grabación en función del tiempo real transcurrido"""
+
+    def __init__(self, t0: float, speed: Optional[float]=1.0):
+        if speed is not None and speed <= 0:
+            raise ValueError("La velocidad debe ser positiva (None para la máxima)")
+        self.t0 = t0
+        self.speed = speed
+        self._start = time.monotonic()
+
+    def now(self) -> float:
+        """Instante de la grabación que corresponde a este momento"""
+        if self.speed is None:
+            return float('inf')
+        return self.t0 + (time.monotonic() - self._start) * self.speed
+
+    def wall_until(self, t: float) -> float:
+        """Segundos reales hasta el instante t de la grabación"""
+        if self.speed is None:
+            return 0.0
+        return max(0.0, (t - self.t0) / self.speed - (time.monotonic() - self._start))
+
+#-----Transcripción serial ------
+class _Reply:
+    """Líneas recibidas tras un comando grabado, pendientes de entregar"""
+    __slots__ = ('index', 'end', 't0', 'wall0')
+
+    def __init__(self, index: int, end: int, t0: float, wall0: float):
+        self.index = index
+        self.end = end
+        self.t0 = t0
+        self.wall0 = wall0
+
+class ReplaySerial:
+    """
+    Puerto serial (interfaz de pyserial que usa SR400) alimentado por una transcripción.
+
+    Cada línea escrita se busca entre los siguientes resync_window comandos grabados;
+    si aparece, las líneas que el SR400 respondió a ese comando se entregan con sus
+    tiempos originales divididos por speed. Un comando fuera de la ventana recibe la
+    respuesta de su primera aparición en la grabación (p.ej. una consulta repetida
+    fuera de orden) o ninguna si no se grabó.
+    """
+
+    def __init__(self, entries: List[TranscriptEntry], speed: Optional[float]=1.0, timeout: float=0.02,
+                 resync_window: int=32):
+        self.entries = entries
+        self.speed = speed
+        self.timeout = timeout
+        self.resync_window = resync_window
+        self.is_open = True
+        #Posición en la lista de comandos enviados de la grabación
+        self._tx = [i for i, entry in enumerate(entries) if entry.direction == 'tx']
+        self._first = {}
+        for position, i in enumerate(self._tx):
+            self._first.setdefault(entries[i].data, position)
+        self._cursor = 0
+        self._replies: deque = deque()
+        self._buffer = bytearray()
+        self._condition = threading.Condition()
+        self.matched = 0
+        self.unmatched = 0
+
+    @property
+    def in_waiting(self) -> int:
+        with self._condition:
+            self._collect()
+            return len(self._buffer)
+
+    def write(self, data: bytes) -> int:
+        with self._condition:
+            if not self.is_open:
+                raise OSError("Puerto de reproducción cerrado")
+            for command in data.decode('ascii', errors='ignore').split('\r'):
+                if command.strip():
+                    self._answer(command.strip())
+            self._condition.notify_all()
+        return len(data)
+
+    def read(self, size: int=1) -> bytes:
+        deadline = time.monotonic() + self.timeout
+        with self._condition:
+            while self.is_open:
+                self._collect()
+                if self._buffer:
+                    break
+                wait = min(deadline, self._next_due()) - time.monotonic()
+                if wait <= 0:
+                    break
+                self._condition.wait(wait)
+            data = bytes(self._buffer[:size])
+            del self._buffer[:size]
+            return data
+
+    def reset_input_buffer(self):
+        with self._condition:
+            self._collect()
+            self._buffer.clear()
+
+    def close(self):
+        with self._condition:
+            self.is_open = False
+            self._condition.notify_all()
+
+    @property
+    def finished(self) -> bool:
+        """Se recorrieron todos los comandos grabados y no queda nada por entregar"""
+        with self._condition:
+            return self._cursor >= len(self._tx) and not self._replies and not self._buffer
+
+    def _answer(self, command: str):
+        position = self._match(command)
+        if position is not None:
+            self._cursor = position + 1
+            self.matched += 1
+        else:
+            position = self._first.get(command)
+            self.unmatched += 1
+            if position is None:
+                return
+        start = self._tx[position]
+        end = self._tx[position + 1] if position + 1 < len(self._tx) else len(self.entries)
+        if end > start + 1:
+            self._replies.append(_Reply(start + 1, end, self.entries[start].t, time.monotonic()))
+
+    def _match(self, command: str) -> Optional[int]:
+        for position in range(self._cursor, min(len(self._tx), self._cursor + self.resync_window)):
+            if self.entries[self._tx[position]].data == command:
+                return position
+        return None
+
+    def _due(self, reply: _Reply, entry: TranscriptEntry) -> float:
+        if self.speed is None:
+            return reply.wall0
+        return reply.wall0 + (entry.t - reply.t0) / self.speed
+
+    def _collect(self):
+        #Pasa al buffer de entrada las líneas cuyo tiempo ya llegó, en orden
+        now = time.monotonic()
+        while self._replies:
+            reply = self._replies[0]
+            while reply.index < reply.end:
+                entry = self.entries[reply.index]
+                if self._due(reply, entry) > now:
+                    return
+                if entry.direction == 'rx':
+                    self._buffer += entry.data.encode('ascii', errors='ignore') + b'\r\n'
+                reply.index += 1
+            self._replies.popleft()
+
+    def _next_due(self) -> float:
+        if not self._replies:
+            return float('inf')
+        reply = self._replies[0]
+        return self._due(reply, self.entries[reply.index])
+
+class ReplaySR400(SR400):
+    """
+    SR400 que reproduce la transcripción de una sesión grabada. Sirve donde sirva un
+    SR400 real (AcquisitionWorker, stream_counts, sr400_cli); el orden de los comandos
+    debe coincidir con el de la grabación para obtener sus respuestas.
+    """
+    SETTLE_TIME = 0.0
+
+    def __init__(self, path: str, speed: Optional[float]=1.0, timeout: float=1.0):
+        self.session_path = path
+        self.entries = read_transcript(path)
+        if not self.entries:
+            raise ValueError(f"La sesión no tiene transcripción serial: {path}")
+        self.speed = speed
+        super().__init__(f"replay:{os.path.basename(os.path.normpath(path))}", timeout=timeout)
+        #Una transcripción agotada no es un enlace caído
+        self.reconnect_policy = ReconnectPolicy(enabled=False)
+
+    def connect(self) -> bool:
+        """
+        Abre la reproducción. La grabación empieza con la adquisición, sin la prueba
+        de identificación de SR400.connect, así que no se consulta al "equipo"
+        """
+        self._stop_reconnect.clear()
+        self.ser = self._open_port()
+        self.scheduler.start()
+        self.is_connected = True
+        self.invalidate_settings()
+        self._trigger_event(self.on_status_changed, "Conectado")
+        print(f"▶️ Reproduciendo {self.session_path} ({len(self.entries)} líneas grabadas)")
+        return True
+
+    def _open_port(self) -> ReplaySerial:
+        return ReplaySerial(self.entries, self.speed, timeout=min(self.timeout, self.READ_POLL_INTERVAL))
+
+    @property
+    def replay_finished(self) -> bool:
+        return self.ser is not None and self.ser.finished
+
+#-----Almacén de muestras ------
+class SessionReplay:
+    """
+    Muestras de una sesión en bloques (vistas del memmap) al ritmo de la grabación.
+    Con velocidad máxima los bloques son de block_size muestras sin esperas.
+    """
+
+    def __init__(self, session, speed: Optional[float]=1.0, block_size: int=65536):
+        self.reader = session if isinstance(session, SessionReader) else SessionReader(session)
+        if 'timestamp' not in self.reader.fields:
+            raise ValueError("La sesión no tiene campo timestamp")
+        if speed is not None and speed <= 0:
+            raise ValueError("La velocidad debe ser positiva (None para la máxima)")
+        self.speed = speed
+        self.block_size = block_size
+        self.position = 0
+        self._stop = threading.Event()
+
+    def __len__(self) -> int:
+        return len(self.reader)
+
+    @property
+    def progress(self) -> float:
+        return self.position / len(self.reader) if len(self.reader) else 1.0
+
+    def settings(self) -> dict:
+        """Ajustes del instrumento registrados para la última muestra entregada"""
+        return self.reader.settings_at(max(0, self.position - 1)) if len(self.reader) else {}
+
+    def stop(self):
+        """Termina blocks() en su siguiente espera"""
+        self._stop.set()
+
+    def blocks(self, tick: float=0.05) -> Iterator[np.ndarray]:
+        """
+        Entrega las muestras conforme les llega su turno: a lo sumo un bloque cada
+        tick segundos reales, con todo lo que venció en ese intervalo
+        """
+        times = self.reader.window()['timestamp']
+        total = len(times)
+        if total == 0:
+            return
+        clock = ReplayClock(float(times[self.position]), self.speed)
+        while self.position < total and not self._stop.is_set():
+            if self.speed is None:
+                due = min(total, self.position + self.block_size)
+            else:
+                due = int(np.searchsorted(times, clock.now(), side='right'))
+                if due <= self.position:
+                    self._stop.wait(min(tick, clock.wall_until(float(times[self.position]))))
+                    continue
+            block = self.reader.window(self.position, due)
+            self.position = due
+            yield block
+            if self.speed is not None:
+                self._stop.wait(tick)
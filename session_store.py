@@ -0,0 +1,349 @@
+# session_store.py
+"""
+Almacenamiento de sesiones de adquisición en bloques binarios.
+
+Una sesión es un directorio con:
+    session.json    campos y tipo de dato de cada muestra
+    samples.bin     muestras consecutivas (registros float64 little-endian)
+    chunks.jsonl    un índice por bloque: posición, número de muestras,
+                    timestamps y ajustes del instrumento al escribirlo
+    transcript.jsonl (opcional) la comunicación serial durante la sesión, una
+                    línea enviada o recibida por registro (ver TranscriptWriter)
+
+Los bloques se escriben conforme se adquieren; si el programa se cae solo se pierde
+el bloque en curso. La lectura usa np.memmap y no carga el archivo completo.
+"""
+
+import os
+import csv
+import json
+import time
+import threading
+from dataclasses import dataclass, field, asdict
+from typing import Callable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+SAMPLES_FILE = "samples.bin"
+INDEX_FILE = "chunks.jsonl"
+HEADER_FILE = "session.json"
+TRANSCRIPT_FILE = "transcript.jsonl"
+
+#Campos de una sesión de conteo en tiempo real
+COUNT_FIELDS = ("timestamp", "count_a", "count_b")
+
+def _record_dtype(fields: Sequence[str]) -> np.dtype:
+    return np.dtype([(name, '<f8') for name in fields])
+
+@dataclass
+class ChunkInfo:
+    """Entrada del índice de bloques"""
+    index: int
+    start: int
+    count: int
+    t_start: Optional[float]
+    t_end: Optional[float]
+    written_at: float
+    settings: dict = field(default_factory=dict)
+
+class SessionWriter:
+    """
+    Escribe muestras en bloques de tamaño fijo.
+
+    Un bloque se vuelca a disco al llenarse o, si flush_interval no es None, cuando
+    su primera muestra tiene más de flush_interval segundos. Los datos se escriben
+    antes que su entrada de índice, así el índice nunca apunta a datos incompletos.
+    """
+
+    def __init__(self, path: str, fields: Sequence[str]=COUNT_FIELDS, chunk_size: int=4096,
+                 flush_interval: Optional[float]=10.0, settings_provider: Optional[Callable[[], dict]]=None,
+                 metadata: Optional[dict]=None):
+        if os.path.exists(os.path.join(path, HEADER_FILE)):
+            raise FileExistsError(f"Ya existe una sesión en {path}")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.fields = tuple(fields)
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+        self.settings_provider = settings_provider
+
+        self._dtype = _record_dtype(self.fields)
+        self._chunk = np.zeros(chunk_size, dtype=self._dtype)
+        self._pending = 0
+        self._pending_since = None
+        self._written = 0
+        self._chunks = 0
+        self._lock = threading.Lock()
+
+        header = {
+            'fields': list(self.fields),
+            'dtype': '<f8',
+            'chunk_size': chunk_size,
+            'created': time.time(),
+            'metadata': metadata or {},
+        }
+        with open(os.path.join(path, HEADER_FILE), 'w', encoding='utf-8') as f:
+            json.dump(header, f, indent=2)
+        self._samples = open(os.path.join(path, SAMPLES_FILE), 'ab')
+        self._index = open(os.path.join(path, INDEX_FILE), 'a', encoding='utf-8')
+
+    @property
+    def samples_written(self) -> int:
+        """Muestras ya guardadas en disco"""
+        return self._written
+
+    def append(self, *values: float):
+        """Agrega una muestra (un valor por campo); una sesión cerrada la ignora"""
+        with self._lock:
+            if self._samples.closed:
+                return
+            self._chunk[self._pending] = values
+            if self._pending == 0:
+                self._pending_since = time.monotonic()
+            self._pending += 1
+            if self._pending == self.chunk_size or self._expired():
+                self._flush_locked()
+
+    def extend(self, *columns):
+        """Agrega un bloque de muestras (una columna por campo)"""
+        columns = [np.asarray(c, dtype=float) for c in columns]
+        n = len(columns[0])
+        done = 0
+        with self._lock:
+            if self._samples.closed:
+                return
+            while done < n:
+                take = min(n - done, self.chunk_size - self._pending)
+                if self._pending == 0:
+                    self._pending_since = time.monotonic()
+                for name, column in zip(self.fields, columns):
+                    self._chunk[name][self._pending:self._pending + take] = column[done:done + take]
+                self._pending += take
+                done += take
+                if self._pending == self.chunk_size:
+                    self._flush_locked()
+            if self._expired():
+                self._flush_locked()
+
+    def flush(self):
+        """Vuelca el bloque en curso aunque no esté lleno"""
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        """Vuelca lo pendiente y cierra los archivos"""
+        with self._lock:
+            if self._samples.closed:
+                return
+            self._flush_locked()
+            self._samples.close()
+            self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self.close()
+
+    def _expired(self) -> bool:
+        return (self.flush_interval is not None and self._pending_since is not None
+                and time.monotonic() - self._pending_since >= self.flush_interval)
+
+    def _flush_locked(self):
+        if self._pending == 0:
+            return
+        block = self._chunk[:self._pending]
+        self._samples.write(block.tobytes())
+        self._samples.flush()
+        os.fsync(self._samples.fileno())
+
+        times = block['timestamp'] if 'timestamp' in self.fields else None
+        try:
+            settings = self.settings_provider() if self.settings_provider else {}
+        except Exception as e:
+            print(f"Error leyendo ajustes para la sesión: {e}")
+            settings = {}
+        info = ChunkInfo(
+            index=self._chunks,
+            start=self._written,
+            count=self._pending,
+            t_start=float(times[0]) if times is not None else None,
+            t_end=float(times[-1]) if times is not None else None,
+            written_at=time.time(),
+            settings=settings,
+        )
+        self._index.write(json.dumps(asdict(info)) + "\n")
+        self._index.flush()
+
+        self._written += self._pending
+        self._chunks += 1
+        self._pending = 0
+        self._pending_since = None
+
+@dataclass
+class TranscriptEntry:
+    """Una línea de la comunicación serial: 'tx' enviada al SR400, 'rx' recibida"""
+    t: float
+    direction: str
+    data: str
+
+class TranscriptWriter:
+    """
+    Registra la comunicación serial de una sesión (se asigna a SR400.transcript).
+    Las líneas se escriben con búfer y se vuelcan cada flush_interval segundos.
+    """
+
+    def __init__(self, path: str, flush_interval: float=10.0):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.flush_interval = flush_interval
+        self.entries = 0
+        self._file = open(os.path.join(path, TRANSCRIPT_FILE), 'a', encoding='utf-8')
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, direction: str, data: str):
+        """Agrega una línea enviada ('tx') o recibida ('rx'); un registro cerrado la ignora"""
+        line = json.dumps({'t': time.time(), 'dir': direction, 'data': data}) + "\n"
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(line)
+            self.entries += 1
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                self._file.flush()
+                self._last_flush = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self.close()
+
+def read_transcript(path: str) -> List[TranscriptEntry]:
+    """Transcripción de una sesión (vacía si no se grabó); una última línea truncada se ignora"""
+    entries = []
+    transcript_path = os.path.join(path, TRANSCRIPT_FILE)
+    if not os.path.exists(transcript_path):
+        return entries
+    with open(transcript_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                entries.append(TranscriptEntry(record['t'], record['dir'], record['data']))
+            except (ValueError, KeyError):
+                break
+    return entries
+
+class SessionReader:
+    """
+    Lectura de una sesión guardada; las ventanas son vistas de np.memmap
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, HEADER_FILE), encoding='utf-8') as f:
+            self.header = json.load(f)
+        self.fields = tuple(self.header['fields'])
+        self.metadata = self.header.get('metadata', {})
+        self._dtype = _record_dtype(self.fields)
+        self.chunks = self._read_index()
+
+        #Solo cuentan las muestras indexadas (un bloque a medio escribir se ignora)
+        self.samples = sum(chunk.count for chunk in self.chunks)
+        if self.samples:
+            self._data = np.memmap(os.path.join(path, SAMPLES_FILE), dtype=self._dtype,
+                                   mode='r', shape=(self.samples,))
+        else:
+            self._data = np.zeros(0, dtype=self._dtype)
+
+    def _read_index(self) -> List[ChunkInfo]:
+        chunks = []
+        index_path = os.path.join(self.path, INDEX_FILE)
+        if not os.path.exists(index_path):
+            return chunks
+        size = os.path.getsize(os.path.join(self.path, SAMPLES_FILE))
+        with open(index_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    chunk = ChunkInfo(**json.loads(line))
+                except (ValueError, TypeError):
+                    #Última línea truncada por una caída
+                    break
+                if (chunk.start + chunk.count) * self._dtype.itemsize > size:
+                    break
+                chunks.append(chunk)
+        return chunks
+
+    def __len__(self) -> int:
+        return self.samples
+
+    def window(self, start: int=0, stop: Optional[int]=None) -> np.ndarray:
+        """Muestras [start, stop) como arreglo estructurado (vista del memmap)"""
+        return self._data[start:stop]
+
+    def time_window(self, t_start: float, t_end: float) -> np.ndarray:
+        """Muestras con t_start <= timestamp < t_end, localizadas con el índice de bloques"""
+        if 'timestamp' not in self.fields:
+            raise ValueError("La sesión no tiene campo timestamp")
+        selected = [c for c in self.chunks
+                    if c.t_end is not None and c.t_end >= t_start and c.t_start < t_end]
+        if not selected:
+            return self._data[0:0]
+        first, last = selected[0], selected[-1]
+        block = self._data[first.start:last.start + last.count]
+        times = block['timestamp']
+        return block[np.searchsorted(times, t_start):np.searchsorted(times, t_end)]
+
+    def transcript(self) -> List[TranscriptEntry]:
+        """Comunicación serial grabada con la sesión"""
+        return read_transcript(self.path)
+
+    def settings_at(self, sample: int) -> dict:
+        """Ajustes del instrumento registrados en el bloque que contiene la muestra"""
+        for chunk in self.chunks:
+            if chunk.start <= sample < chunk.start + chunk.count:
+                return chunk.settings
+        raise IndexError(f"Muestra fuera de la sesión: {sample}")
+
+    def iter_chunks(self) -> Iterator[np.ndarray]:
+        """Recorre la sesión bloque por bloque"""
+        for chunk in self.chunks:
+            yield self._data[chunk.start:chunk.start + chunk.count]
+
+    def to_csv(self, filename: str, start: int=0, stop: Optional[int]=None, block_size: int=65536,
+               header: Optional[Sequence[str]]=None):
+        """
+        Exporta (parte de) la sesión a CSV por bloques, sin cargarla completa.
+        header reemplaza los nombres de los campos en la primera fila
+        """
+        stop = self.samples if stop is None else min(stop, self.samples)
+        with open(filename, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(header or self.fields)
+            for offset in range(start, stop, block_size):
+                block = self._data[offset:min(offset + block_size, stop)]
+                writer.writerows(block.tolist())
+
+def list_sessions(root: str) -> List[str]:
+    """Directorios de sesión dentro de root, del más reciente al más antiguo"""
+    if not os.path.isdir(root):
+        return []
+    sessions = [os.path.join(root, name) for name in os.listdir(root)
+                if os.path.exists(os.path.join(root, name, HEADER_FILE))]
+    return sorted(sessions, key=os.path.getmtime, reverse=True)
+
+def new_session_path(root: str, prefix: str="sesion") -> str:
+    """Ruta para una sesión nueva con marca de tiempo"""
+    stamp = time.strftime("%Y%m%d_%H%M%S")
+    path = os.path.join(root, f"{prefix}_{stamp}")
+    suffix = 1
+    while os.path.exists(path):
+        path = os.path.join(root, f"{prefix}_{stamp}_{suffix}")
+        suffix += 1
+    return path
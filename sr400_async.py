@@ -0,0 +1,573 @@
+# sr400_async.py
+"""
+Cliente asyncio del SR400: misma superficie de comandos que SR400, sin hilos ni sleeps bloqueantes
+"""
+
+import asyncio
+import contextvars
+import re
+import sys
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+
+import numpy as np
+import serial
+
+from sr400_controller import (SR400, CountMode, DiscriminatorChannel, DiscriminatorMode,
+                              DiscriminatorSlope, GateChannel, GateMode, InputSource,
+                              RemoteMode, SR400Status, _TERMINATOR, _default_configuration,
+                              _preset_digits, preset_commands, scan_step, SCAN_STEP_LIMIT)
+
+try:
+    import serial_asyncio
+except ImportError:
+    serial_asyncio = None
+
+class _FdSerialWriter:
+    """Escritor mínimo sobre un puerto pyserial no bloqueante"""
+    def __init__(self, ser: serial.Serial):
+        self.ser = ser
+
+    def write(self, data: bytes):
+        self.ser.write(data)
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        self.ser.close()
+
+class AsyncSR400:
+    #Mismos límites que el cliente síncrono
+    MAX_COMMAND_LINE = SR400.MAX_COMMAND_LINE
+    STATUS_ERROR_MASK = SR400.STATUS_ERROR_MASK
+    CLOCK_FREQUENCY = SR400.CLOCK_FREQUENCY
+    SCAN_DWELL_TIME = SR400.SCAN_DWELL_TIME
+    SETTLE_TIME = SR400.SETTLE_TIME
+
+    def __init__(self, port: str, baudrate: int=9600, timeout: float=1):
+        """
+        Inicializa el cliente; la conexión se abre con await connect()
+        """
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.is_connected = False
+        self.is_counting = False
+        self.count_period = None
+        self.identification = None
+
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer = None
+        self._serial: Optional[serial.Serial] = None
+        self._rx_buffer = bytearray()
+        self._lock: Optional[asyncio.Lock] = None
+        #Lote activo de cada tarea: cada tarea de asyncio tiene su propio contexto
+        self._batch_var: contextvars.ContextVar = contextvars.ContextVar(f"sr400_batch_{id(self)}", default=None)
+
+        #Eventos para UI
+        self.on_data_received = None
+        self.on_error = None
+        self.on_status_changed = None
+        self.on_counting_changed = None
+
+    async def connect(self, reader: Optional[asyncio.StreamReader]=None, writer=None,
+                      settle_time: Optional[float]=None) -> bool:
+        """
+        Abre el puerto con un transporte no bloqueante (o usa los streams dados) y
+        confirma, igual que SR400.connect, que el instrumento responde
+        """
+        try:
+            if reader is not None and writer is not None:
+                self._reader, self._writer = reader, writer
+            elif serial_asyncio is not None:
+                self._reader, self._writer = await serial_asyncio.open_serial_connection(
+                    url=self.port, baudrate=self.baudrate,
+                    bytesize=serial.EIGHTBITS, parity=serial.PARITY_NONE, stopbits=serial.STOPBITS_ONE)
+            else:
+                self._reader, self._writer = self._open_fd_transport()
+            self._lock = asyncio.Lock()
+            await asyncio.sleep(self.SETTLE_TIME if settle_time is None else settle_time)
+            self.is_connected = True
+
+            #SS (que además limpia los bits de error) y el nivel del discriminador A
+            status = await self.query("SS")
+            level = await self.get_discriminator_level(DiscriminatorChannel.A) if status else None
+            if level is None:
+                self._close_transport()
+                self.is_connected = False
+                error_msg = f"El SR400 no respondió en {self.port}"
+                self._trigger_event(self.on_error, error_msg)
+                print(f"❌ {error_msg}")
+                return False
+            self.identification = f"{status} | {level:.4f}"
+            self._trigger_event(self.on_status_changed, "Conectado")
+            print(f"✅ Conectado (asyncio) al SR400 en {self.port}")
+            return True
+        except (serial.SerialException, OSError, RuntimeError) as e:
+            error_msg = f"No se pudo conectar al SR400 en {self.port}: {str(e)}"
+            self._trigger_event(self.on_error, error_msg)
+            print(f"❌ {error_msg}")
+            return False
+
+    def _open_fd_transport(self):
+        """
+        Transporte sin pyserial-asyncio: lectura del descriptor integrada al event loop (POSIX)
+        """
+        if sys.platform == "win32":
+            raise RuntimeError("En Windows se requiere el paquete pyserial-asyncio")
+        self._serial = serial.Serial(port=self.port, baudrate=self.baudrate,
+                                     bytesize=serial.EIGHTBITS, parity=serial.PARITY_NONE,
+                                     stopbits=serial.STOPBITS_ONE, timeout=0)
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+
+        def on_readable():
+            try:
+                data = self._serial.read(self._serial.in_waiting or 1)
+            except (serial.SerialException, OSError) as e:
+                loop.remove_reader(self._serial.fileno())
+                reader.set_exception(e)
+                return
+            if data:
+                reader.feed_data(data)
+
+        loop.add_reader(self._serial.fileno(), on_readable)
+        return reader, _FdSerialWriter(self._serial)
+
+    async def disconnect(self):
+        """
+        Cierra la conexión
+        """
+        if self.is_connected:
+            await self.set_remote_mode(RemoteMode.LOCAL)
+        self._close_transport()
+        self.is_connected = False
+        self._trigger_event(self.on_status_changed, "Desconectado")
+
+    def _close_transport(self):
+        if self._serial is not None:
+            asyncio.get_running_loop().remove_reader(self._serial.fileno())
+            self._serial = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    #-----E/S ------
+    @property
+    def _batch(self) -> Optional[List[str]]:
+        return self._batch_var.get()
+
+    @_batch.setter
+    def _batch(self, batch: Optional[List[str]]):
+        self._batch_var.set(batch)
+
+    async def send_command(self, command: str) -> bool:
+        """
+        Envía comando al instrumento (o lo encola si hay un lote activo)
+        """
+        if self._batch is not None:
+            self._batch.append(command.strip().rstrip(';'))
+            return True
+        if not self.is_connected:
+            self._trigger_event(self.on_error, "No conectado al SR400")
+            return False
+        async with self._lock:
+            return await self._write(command)
+
+    async def _write(self, command: str) -> bool:
+        try:
+            if not command.endswith('\r'):
+                command += '\r'
+            self._writer.write(command.encode('ascii'))
+            await self._writer.drain()
+            return True
+        except Exception as e:
+            self._trigger_event(self.on_error, f"Error enviando comando: {str(e)}")
+            return False
+
+    async def query(self, command: str, timeout: Optional[float]=None) -> Optional[str]:
+        """
+        Envía comando y espera la respuesta hasta el terminador CR/LF o el deadline
+        """
+        if not self.is_connected:
+            self._trigger_event(self.on_error, "No conectado al SR400")
+            return None
+        if self._batch:
+            #La respuesta debe reflejar los comandos del lote, que aún no se enviaron
+            await self._flush_batch()
+        async with self._lock:
+            self._rx_buffer.clear()
+            if not await self._write(command):
+                return None
+            try:
+                response = await asyncio.wait_for(self._read_line(), self.timeout if timeout is None else timeout)
+            except asyncio.TimeoutError:
+                return None
+            except Exception as e:
+                self._trigger_event(self.on_error, f"Error leyendo respuesta: {str(e)}")
+                return None
+        self._trigger_event(self.on_data_received, response)
+        return response
+
+    async def _read_line(self) -> str:
+        while True:
+            match = _TERMINATOR.search(self._rx_buffer)
+            if match:
+                line = bytes(self._rx_buffer[:match.start()])
+                del self._rx_buffer[:match.end()]
+                line = line.decode('ascii', errors='ignore').strip()
+                if line:
+                    return line
+                continue
+            chunk = await self._reader.read(256)
+            if not chunk:
+                raise ConnectionError("Puerto cerrado")
+            self._rx_buffer.extend(chunk)
+
+    @asynccontextmanager
+    async def batch(self):
+        """
+        Agrupa los comandos del bloque en líneas unidas por ';' y verifica una sola vez
+        """
+        outer = self._batch
+        if outer is not None:
+            yield
+            return
+        self._batch = []
+        try:
+            yield
+            commands = self._batch
+        finally:
+            self._batch = None
+        if not await self.send_commands(commands):
+            raise RuntimeError("El SR400 rechazó el lote de comandos")
+
+    async def _flush_batch(self):
+        """Envía lo acumulado en el lote de esta tarea; el lote sigue activo"""
+        batch = self._batch
+        commands = list(batch)
+        batch.clear()
+        self._batch = None
+        try:
+            if not await self.send_commands(commands):
+                raise RuntimeError("El SR400 rechazó el lote de comandos")
+        finally:
+            self._batch = batch
+
+    async def send_commands(self, commands: List[str]) -> bool:
+        """
+        Envía varios comandos unidos por ';' y verifica el resultado una sola vez
+        """
+        if not commands:
+            return True
+        for line in SR400._pack_commands(commands, self.MAX_COMMAND_LINE):
+            if not await self.send_command(line):
+                return False
+        return await self.check_command_errors()
+
+    async def check_command_errors(self) -> bool:
+        """
+        Lee el status byte y reporta si algún comando anterior fue rechazado
+        """
+        response = await self.query("SS")
+        try:
+            status = int(float(response)) if response else None
+        except ValueError:
+            status = None
+        if status is None or status & self.STATUS_ERROR_MASK:
+            self._trigger_event(self.on_error, f"El SR400 rechazó un comando (status {status})")
+            return False
+        return True
+
+    #-----Comandos principales ------
+    async def set_count_mode(self, mode: CountMode) -> bool:
+        """Establece el modo de conteo"""
+        return await self.send_command(f"CM{mode.value}")
+
+    async def set_discriminator_level(self, channel: DiscriminatorChannel, voltage: float) -> bool:
+        """Configura el nivel del discriminador (-0.3V a +0.3V)"""
+        if -0.3 <= voltage <= 0.3:
+            return await self.send_command(f"DL{channel.value},{voltage:.4f}")
+        self._trigger_event(self.on_error, "Voltaje fuera de rango (-0.3V a +0.3V)")
+        return False
+
+    async def get_discriminator_level(self, channel: DiscriminatorChannel) -> Optional[float]:
+        """Lee nivel actual del discriminador"""
+        return _to_float(await self.query(f"DZ{channel.value}"))
+
+    async def set_discriminator_slope(self, channel: DiscriminatorChannel, slope: DiscriminatorSlope) -> bool:
+        """Configura la pendiente del discriminador"""
+        return await self.send_command(f"DS{channel.value},{slope.value}")
+
+    async def set_discriminator_mode(self, channel: DiscriminatorChannel, mode: DiscriminatorMode) -> bool:
+        """Configura el modo del discriminador"""
+        return await self.send_command(f"DM{channel.value},{mode.value}")
+
+    async def set_discriminator_scan_step(self, channel: DiscriminatorChannel, step_voltage: float) -> bool:
+        """Configura el incremento por periodo en modo SCAN (-0.02V a +0.02V)"""
+        if -0.02 <= step_voltage <= 0.02:
+            return await self.send_command(f"DY{channel.value},{step_voltage:.4f}")
+        self._trigger_event(self.on_error, "Paso de barrido fuera de rango (-0.02V a +0.02V)")
+        return False
+
+    async def set_gate_width(self, channel: GateChannel, width_seconds: float) -> bool:
+        """Configura el ancho de la puerta"""
+        return await self.send_command(f"GW{channel.value},{width_seconds}")
+
+    async def set_gate_delay(self, channel: GateChannel, delay_seconds: float) -> bool:
+        """Establece delay de la puerta"""
+        return await self.send_command(f"GD{channel.value},{delay_seconds}")
+
+    async def set_gate_mode(self, channel: GateChannel, mode: GateMode) -> bool:
+        """Establece modo de la puerta"""
+        return await self.send_command(f"GM{channel.value},{mode.value}")
+
+    async def set_input_source(self, counter: DiscriminatorChannel, source: InputSource) -> bool:
+        """Establece la fuente de entrada"""
+        return await self.send_command(f"CI{counter.value},{source.value}")
+
+    async def set_remote_mode(self, mode: RemoteMode) -> bool:
+        """Establece modo de control remoto"""
+        return await self.send_command(f"MI{mode.value}")
+
+    #-----Medición y control-------
+    async def get_count_rate(self, counter: str='A') -> Optional[float]:
+        """Obtiene tasa de conteo"""
+        response = await self.query('X' + counter.upper())
+        if not response:
+            return None
+        value = _to_float(response)
+        if value is None:
+            numbers = re.findall(r"[-+]?\d*\.\d+|\d+", response)
+            value = float(numbers[0]) if numbers else None
+        return value
+
+    async def start_count(self) -> bool:
+        """Inicia conteo"""
+        if await self.send_command("CS"):
+            self.is_counting = True
+            self._trigger_event(self.on_counting_changed, True)
+            return True
+        return False
+
+    async def stop_count(self) -> bool:
+        """Detiene conteo"""
+        if await self.send_command("CH"):
+            self.is_counting = False
+            self._trigger_event(self.on_counting_changed, False)
+            return True
+        return False
+
+    async def reset_count(self) -> bool:
+        """Resetea el contador"""
+        return await self.send_command("CR")
+
+    async def set_dwell_time(self, time_seconds: float) -> bool:
+        """Configura el tiempo de dwell"""
+        return await self.send_command(f"DT{time_seconds}")
+
+    async def set_scan_periods(self, periods: int) -> bool:
+        """Configura el número de periodos de scan"""
+        if 1 <= periods <= 2000:
+            return await self.send_command(f"NP{periods}")
+        return False
+
+    async def set_count_period(self, time_seconds: float) -> bool:
+        """Duración de cada periodo con el contador T sobre la base de 10 MHz"""
+        ticks = time_seconds * self.CLOCK_FREQUENCY
+        if not 1 <= ticks <= 9e11:
+            self._trigger_event(self.on_error, "Periodo de conteo fuera de rango")
+            return False
+        mantissa, exponent = _preset_digits(ticks)
+        if await self.send_command(f"CP{DiscriminatorChannel.T.value},{mantissa}E{exponent}"):
+            self.count_period = mantissa * 10**exponent / self.CLOCK_FREQUENCY
+            return True
+        return False
+
+    async def get_scan_positions(self) -> Optional[int]:
+        """Obtiene posición actual del scan"""
+        value = _to_float(await self.query("NN"))
+        return int(value) if value is not None else None
+
+    async def read_stored_counts(self, counter: str='A', periods: int=1) -> Optional[np.ndarray]:
+        """Lee en una sola transferencia (EA/EB) los conteos almacenados del scan"""
+        if not self.is_connected:
+            return None
+        deadline = self.timeout + periods * 12 * 10 / self.baudrate
+        counts = np.full(periods, np.nan)
+        received = 0
+
+        async def read_all():
+            nonlocal received
+            while received < periods:
+                value = _to_float(await self._read_line())
+                if value is not None:
+                    counts[received] = value
+                received += 1
+
+        async with self._lock:
+            self._rx_buffer.clear()
+            if not await self._write(f"E{counter.upper()}"):
+                return None
+            try:
+                await asyncio.wait_for(read_all(), deadline)
+            except asyncio.TimeoutError:
+                self._trigger_event(self.on_error, f"Lectura incompleta: {received}/{periods} puntos")
+                return counts[:received]
+        return counts
+
+    async def get_status(self) -> SR400Status:
+        """Obtiene el estado completo del equipo"""
+        return SR400Status(
+            discriminator_levels={
+                'A': await self.get_discriminator_level(DiscriminatorChannel.A),
+                'B': await self.get_discriminator_level(DiscriminatorChannel.B),
+                'T': await self.get_discriminator_level(DiscriminatorChannel.T),
+            },
+            count_rate={
+                'A': await self.get_count_rate('A'),
+                'B': await self.get_count_rate('B'),
+            },
+            gate_settings={},
+            scan_positions=await self.get_scan_positions(),
+            is_counting=self.is_counting,
+        )
+
+    async def set_default_configuration(self) -> bool:
+        """Configura valores por defecto (mismo preset que SR400)"""
+        return await self.send_commands(preset_commands(_default_configuration))
+
+    #-----Curva S ------
+    async def s_curve_points(self,
+                             channel: DiscriminatorChannel,
+                             start_v: float,
+                             end_v: float,
+                             steps: int,
+                             dwell_time: float=0.5) -> AsyncIterator[Tuple[int, float, float]]:
+        """
+        Curva S paso a paso como generador asíncrono: entrega (índice, threshold, tasa)
+        """
+        for i, threshold_v in enumerate(np.linspace(start_v, end_v, steps)):
+            await self.set_discriminator_level(channel, threshold_v)
+            await asyncio.sleep(0.05)
+            await self.reset_count()
+            await self.start_count()
+            await asyncio.sleep(dwell_time)
+            await self.stop_count()
+            counts = await self.get_count_rate('A')
+            yield i, float(threshold_v), counts / dwell_time if counts is not None else np.nan
+
+    async def measure_s_curve(self,
+                              channel: DiscriminatorChannel,
+                              start_v: float,
+                              end_v: float,
+                              steps: int,
+                              dwell_time: float=0.5,
+                              progress_callback: Optional[Callable]=None,
+                              use_scan: bool=True) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Curva S: barrido en el instrumento (modo SCAN) o paso a paso
+        """
+        if not self.is_connected:
+            raise RuntimeError("Dispositivo no conectado")
+        if not use_scan or steps > 2000:
+            thresholds, rates = [], []
+            async for i, threshold_v, rate in self.s_curve_points(channel, start_v, end_v, steps, dwell_time):
+                thresholds.append(threshold_v)
+                rates.append(rate)
+                if progress_callback:
+                    progress_callback((i + 1) / steps, f"Punto {i+1}/{steps}: {threshold_v:.3f}V")
+            return np.array(thresholds), np.array(rates)
+        return await self._measure_s_curve_scan(channel, start_v, end_v, steps, dwell_time, progress_callback)
+
+    async def _measure_s_curve_scan(self, channel, start_v, end_v, steps, dwell_time, progress_callback):
+        if not 2 <= steps <= 2000:
+            raise ValueError("El barrido por hardware admite de 2 a 2000 puntos")
+        step_v = scan_step(start_v, end_v, steps)
+        if step_v is None:
+            raise ValueError(f"El paso del barrido debe estar entre 0.1 mV y {SCAN_STEP_LIMIT} V")
+        thresholds = start_v + step_v * np.arange(steps)
+        original_threshold = await self.get_discriminator_level(channel)
+        #Ajustes que cambia el barrido (sin copia local: se leen del equipo)
+        original_source = _to_float(await self.query(f"CI{DiscriminatorChannel.T.value}"))
+        original_ticks = _to_float(await self.query(f"CP{DiscriminatorChannel.T.value}"))
+        original_dwell = _to_float(await self.query("DT"))
+        original_periods = _to_float(await self.query("NP"))
+        original_step = _to_float(await self.query(f"DY{channel.value}"))
+        try:
+            async with self.batch():
+                #Un setter que rechaza su parámetro no encola nada: el lote saldría sin él
+                accepted = all([
+                    await self.set_input_source(DiscriminatorChannel.T, InputSource.MHZ_10),
+                    await self.set_count_period(dwell_time),
+                    await self.set_dwell_time(self.SCAN_DWELL_TIME),
+                    await self.set_scan_periods(steps),
+                    await self.set_discriminator_mode(channel, DiscriminatorMode.SCAN),
+                    await self.set_discriminator_level(channel, start_v),
+                    await self.set_discriminator_scan_step(channel, step_v),
+                ])
+                if not accepted:
+                    raise RuntimeError("Parámetros del barrido fuera de rango")
+            await self.reset_count()
+            await self.start_count()
+
+            deadline = time.monotonic() + steps * (dwell_time + self.SCAN_DWELL_TIME) + self.timeout
+            poll_interval = min(max(dwell_time, 0.1), 1.0)
+            position = 0
+            while position < steps and time.monotonic() < deadline:
+                await asyncio.sleep(poll_interval)
+                position = await self.get_scan_positions() or position
+                if progress_callback:
+                    progress_callback(min(position, steps) / steps, f"Punto {position}/{steps}")
+
+            await self.stop_count()
+            #Solo los periodos completos (cancelado o sin terminar en el plazo)
+            measured = min(steps, await self.get_scan_positions() or position)
+            counts = await self.read_stored_counts('A', measured) if measured else None
+            if counts is None:
+                raise RuntimeError("No se pudieron leer los datos del barrido")
+            return thresholds[:len(counts)], counts / (self.count_period or dwell_time)
+        finally:
+            #Un lote rechazado aquí no debe ocultar la excepción del barrido
+            try:
+                async with self.batch():
+                    await self.set_discriminator_mode(channel, DiscriminatorMode.FIXED)
+                    if original_threshold is not None:
+                        await self.set_discriminator_level(channel, original_threshold)
+                    if original_step is not None:
+                        await self.set_discriminator_scan_step(channel, original_step)
+                    if original_source is not None:
+                        await self.set_input_source(DiscriminatorChannel.T, InputSource(int(original_source)))
+                    if original_ticks is not None:
+                        await self.set_count_period(original_ticks / self.CLOCK_FREQUENCY)
+                    if original_dwell is not None:
+                        await self.set_dwell_time(original_dwell)
+                    if original_periods is not None:
+                        await self.set_scan_periods(int(original_periods))
+            except RuntimeError as e:
+                self._trigger_event(self.on_error, f"No se pudo restaurar el discriminador: {str(e)}")
+
+    #-----Event Handling------
+    def _trigger_event(self, event_handler: Optional[Callable], data):
+        """Dispara evento si handler está definido"""
+        if event_handler:
+            try:
+                event_handler(data)
+            except Exception as e:
+                print(f"Error en evento: {str(e)}")
+
+    #-----Context Manager------
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, exc_tb):
+        await self.disconnect()
+
+def _to_float(response: Optional[str]) -> Optional[float]:
+    try:
+        return float(response) if response else None
+    except ValueError:
+        return None
@@ -0,0 +1,322 @@
+# sr400_cli.py
+"""
+Línea de comandos para adquisiciones sin interfaz gráfica (no importa Qt).
+
+Ejemplos:
+    python sr400_cli.py --port COM3 status
+    python sr400_cli.py --port COM3 --default-config scurve --start -0.1 --end 0.1 --steps 200 -o curva.csv
+    python sr400_cli.py --port /dev/ttyUSB0 count --duration 3600 --period 1 -o sesiones/noche --format session
+    python sr400_cli.py --virtual scurve --steps 50 --dwell 0.01
+    python sr400_cli.py --auto count --periods 10
+    python sr400_cli.py --replay sesiones/noche --speed 0 count --periods 500
+
+Los datos van a stdout (CSV) o al archivo indicado; los mensajes del controlador
+van a stderr, así la salida se puede encadenar en scripts y cron.
+
+Códigos de salida: 0 éxito, 1 sin conexión, 2 error en la medición.
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import contextlib
+from typing import Optional
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sr400_controller import SR400, DiscriminatorChannel, DwellControl
+from scurve_analysis import empirical_threshold, fit_s_curves
+from session_store import COUNT_FIELDS, SessionWriter, TranscriptWriter
+from session_replay import ReplaySR400
+from device_cache import find_sr400, remember_connection
+
+EXIT_OK = 0
+EXIT_NO_CONNECTION = 1
+EXIT_MEASUREMENT_ERROR = 2
+
+#Máximo de periodos por scan del SR400
+MAX_SCAN_PERIODS = 2000
+
+def _channel(name: str) -> DiscriminatorChannel:
+    try:
+        return DiscriminatorChannel[name.upper()]
+    except KeyError:
+        raise argparse.ArgumentTypeError(f"Canal inválido: {name} (A, B o T)")
+
+def _level(text: str):
+    """CANAL=VOLTAJE, p.ej. A=-0.012"""
+    try:
+        name, value = text.split("=", 1)
+        return _channel(name), float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Nivel inválido: {text} (use CANAL=VOLTAJE)")
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Adquisición con el SR400 sin interfaz gráfica")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--port", help="puerto serial del SR400 (COM3, /dev/ttyUSB0)")
+    target.add_argument("--virtual", action="store_true", help="usar un SR400 virtual (pruebas)")
+    target.add_argument("--auto", action="store_true",
+                        help="último SR400 confirmado (caché) o detección de todos los puertos")
+    target.add_argument("--replay", metavar="SESION",
+                        help="reproducir la transcripción serial de una sesión grabada con --format session")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="velocidad de --replay (1 tiempo real, N veces más rápido, 0 sin esperas)")
+    parser.add_argument("--baudrate", type=int, default=9600)
+    parser.add_argument("--timeout", type=float, default=1.0, help="timeout de respuesta (s)")
+    parser.add_argument("--seed", type=int, default=None, help="semilla del SR400 virtual")
+    parser.add_argument("--default-config", action="store_true", help="aplicar la configuración por defecto")
+    parser.add_argument("--level", type=_level, action="append", default=[],
+                        help="nivel de discriminador CANAL=VOLTAJE (repetible)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="sin mensajes en stderr")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("status", help="estado del equipo en JSON")
+    commands.add_parser("configure", help="solo aplicar configuración (--default-config / --level)")
+
+    scurve = commands.add_parser("scurve", help="medir una curva S")
+    scurve.add_argument("--channel", type=_channel, default=DiscriminatorChannel.A)
+    scurve.add_argument("--start", type=float, default=-0.1, help="threshold inicial (V)")
+    scurve.add_argument("--end", type=float, default=0.1, help="threshold final (V)")
+    scurve.add_argument("--steps", type=int, default=100)
+    scurve.add_argument("--dwell", type=float, default=0.5, help="tiempo por punto (s)")
+    scurve.add_argument("--host", action="store_true", help="barrido paso a paso desde el host")
+    scurve.add_argument("--adaptive", action="store_true", help="concentrar puntos en la transición")
+    scurve.add_argument("--target-error", type=float, default=None,
+                        help="error relativo objetivo por punto (activa la parada temprana)")
+    scurve.add_argument("--min-dwell", type=float, default=0.05)
+    scurve.add_argument("--max-dwell", type=float, default=2.0)
+    scurve.add_argument("-o", "--output", help="archivo CSV o directorio de sesión (por defecto stdout)")
+    scurve.add_argument("--format", choices=("csv", "session"), default="csv")
+
+    count = commands.add_parser("count", help="adquisición temporizada por periodos del instrumento")
+    count.add_argument("--duration", type=float, default=None, help="duración total (s)")
+    count.add_argument("--periods", type=int, default=None, help="número de periodos")
+    count.add_argument("--period", type=float, default=1.0, help="duración de cada periodo (s)")
+    count.add_argument("-o", "--output", help="archivo CSV o directorio de sesión (por defecto stdout)")
+    count.add_argument("--format", choices=("csv", "session"), default="csv")
+    return parser
+
+#-----Salida de datos ------
+class _Output:
+    """Destino de filas: CSV (archivo o stdout) o sesión binaria"""
+
+    def __init__(self, fields, path: Optional[str], fmt: str, stdout, settings_provider=None, metadata=None):
+        self.fields = fields
+        self._file = None
+        self._owns_file = bool(path)
+        self._csv = None
+        self._session = None
+        if fmt == "session":
+            if not path:
+                raise ValueError("El formato session necesita --output")
+            self._session = SessionWriter(path, fields=fields, settings_provider=settings_provider,
+                                          metadata=metadata)
+        else:
+            self._file = open(path, 'w', newline='', encoding='utf-8') if path else stdout
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(fields)
+
+    def write(self, *values):
+        if self._session is not None:
+            self._session.append(*values)
+        else:
+            self._csv.writerow(values)
+            #Fila por fila: un proceso que lee la tubería la ve de inmediato
+            self._file.flush()
+
+    def write_many(self, *columns):
+        if self._session is not None:
+            self._session.extend(*columns)
+        else:
+            self._csv.writerows(zip(*columns))
+            self._file.flush()
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+        elif self._owns_file:
+            self._file.close()
+
+#-----Comandos ------
+def run_status(sr400: SR400, args, stdout) -> int:
+    status = sr400.get_status()
+    if status is None:
+        return EXIT_MEASUREMENT_ERROR
+    report = {
+        'port': sr400.port,
+        'discriminator_levels': status.discriminator_levels,
+        'count_rate': status.count_rate,
+        'gate_settings': status.gate_settings,
+        'scan_positions': status.scan_positions,
+        'is_counting': status.is_counting,
+        'settings': sr400.get_cached_settings(),
+    }
+    json.dump(report, stdout, indent=2, default=str)
+    stdout.write("\n")
+    return EXIT_OK
+
+def run_scurve(sr400: SR400, args, stdout) -> int:
+    dwell_control = None
+    if args.target_error is not None:
+        dwell_control = DwellControl(target_error=args.target_error, min_dwell=args.min_dwell,
+                                     max_dwell=args.max_dwell)
+
+    def progress(fraction, message):
+        print(f"{fraction * 100:5.1f}% {message}")
+
+    thresholds, rates = sr400.measure_s_curve(args.channel, args.start, args.end, args.steps, args.dwell,
+                                              progress_callback=progress, use_scan=not args.host,
+                                              adaptive=args.adaptive, dwell_control=dwell_control)
+    if len(rates) == 0:
+        return EXIT_MEASUREMENT_ERROR
+
+    metadata = {'channel': args.channel.name, 'dwell_time': args.dwell, 'port': sr400.port}
+    output = _Output(("threshold", "count_rate"), args.output, args.format, stdout,
+                     sr400.get_cached_settings, metadata)
+    try:
+        output.write_many(thresholds, rates)
+    finally:
+        output.close()
+
+    missing = int(np.count_nonzero(np.isnan(rates)))
+    if missing:
+        #Se conservan en la salida para que cada fila corresponda a un threshold pedido
+        print(f"⚠️ {missing} punto(s) sin lectura quedaron como NaN")
+    fit = fit_s_curves(thresholds, rates)
+    if fit.converged[0]:
+        print(f"Threshold óptimo: {fit.threshold[0]:.4f} ± {fit.threshold_err[0]:.4f} V "
+              f"(meseta {fit.plateau[0]:.1f} ± {fit.plateau_err[0]:.1f} Hz)")
+    else:
+        print(f"⚠️ El ajuste no convergió; threshold empírico: {empirical_threshold(thresholds, rates):.4f} V")
+    return EXIT_OK
+
+def run_count(sr400: SR400, args, stdout) -> int:
+    if not sr400.set_count_period(args.period) or not sr400.set_dwell_time(sr400.SCAN_DWELL_TIME):
+        return EXIT_MEASUREMENT_ERROR
+    period = sr400.count_period
+    if args.periods is not None:
+        total = args.periods
+    elif args.duration is not None:
+        total = max(1, int(args.duration / (period + sr400.SCAN_DWELL_TIME)))
+    else:
+        print("Indique --duration o --periods")
+        return EXIT_MEASUREMENT_ERROR
+
+    metadata = {'count_period': period, 'port': sr400.port}
+    output = _Output(COUNT_FIELDS, args.output, args.format, stdout, sr400.get_cached_settings, metadata)
+    #Las sesiones guardan también la comunicación serial (se pueden reproducir con --replay)
+    if args.format == "session":
+        sr400.transcript = TranscriptWriter(args.output)
+    received = 0
+    try:
+        #Un scan admite hasta 2000 periodos: las adquisiciones largas se encadenan
+        while received < total:
+            block = min(MAX_SCAN_PERIODS, total - received)
+            timestamps, counts_a = [], []
+            try:
+                for record in sr400.stream_counts(block):
+                    timestamps.append(time.time())
+                    counts_a.append(record.count_a)
+                    received += 1
+            finally:
+                #También con Ctrl+C: los periodos recibidos del bloque se guardan
+                _write_block(sr400, output, timestamps, counts_a, period)
+            print(f"{received}/{total} periodos")
+            if not timestamps or not sr400.is_connected:
+                #El instrumento dejó de enviar datos o el enlace no se recuperó
+                break
+            #Un bloque cortado por una reconexión continúa con los periodos que faltan
+    except KeyboardInterrupt:
+        print("Adquisición interrumpida")
+    finally:
+        output.close()
+        if sr400.transcript is not None:
+            sr400.transcript.close()
+            sr400.transcript = None
+    return EXIT_OK if received == total else EXIT_MEASUREMENT_ERROR
+
+def _write_block(sr400: SR400, output: _Output, timestamps, counts_a, period: float):
+    """
+    Filas de un bloque del scan: FA solo envía el contador A; los conteos de B quedan
+    guardados en el instrumento y se leen con una transferencia al final del bloque
+    """
+    if not timestamps:
+        return
+    counts_b = sr400.read_stored_counts('B', len(timestamps)) if sr400.is_connected else None
+    if counts_b is None or len(counts_b) < len(timestamps):
+        counts_b = np.full(len(timestamps), np.nan)
+    output.write_many(timestamps, np.asarray(counts_a) / period, counts_b / period)
+
+COMMANDS = {
+    'status': run_status,
+    'configure': lambda sr400, args, stdout: EXIT_OK,
+    'scurve': run_scurve,
+    'count': run_count,
+}
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    stdout = sys.stdout
+    messages = open(os.devnull, 'w') if args.quiet else sys.stderr
+
+    device = None
+    #Los print del controlador van a stderr para no mezclarse con los datos
+    with contextlib.redirect_stdout(messages):
+        if args.virtual:
+            from sr400_virtual import VirtualSR400
+            device = VirtualSR400(baudrate=args.baudrate, seed=args.seed)
+            port = device.start()
+        elif args.auto:
+            found = find_sr400(args.baudrate)
+            if found is None:
+                print("❌ No se encontró ningún SR400")
+                return EXIT_NO_CONNECTION
+            port, args.baudrate = found.device, found.baudrate
+        elif args.replay:
+            port = None
+        else:
+            port = args.port
+
+        if args.replay:
+            try:
+                sr400 = ReplaySR400(args.replay, speed=args.speed or None, timeout=args.timeout)
+            except (OSError, ValueError) as e:
+                print(f"❌ No se puede reproducir la sesión: {e}")
+                return EXIT_NO_CONNECTION
+        else:
+            sr400 = SR400(port, baudrate=args.baudrate, timeout=args.timeout)
+        try:
+            if not sr400.connect():
+                return EXIT_NO_CONNECTION
+            if device is None and not args.replay:
+                remember_connection(sr400)
+            sr400.on_error = lambda message: print(f"❌ {message}")
+            if args.default_config and not sr400.set_default_configuration():
+                return EXIT_MEASUREMENT_ERROR
+            if args.level:
+                with sr400.batch() as batch:
+                    accepted = all([sr400.set_discriminator_level(channel, voltage)
+                                    for channel, voltage in args.level])
+                if not (accepted and batch.ok):
+                    return EXIT_MEASUREMENT_ERROR
+            return COMMANDS[args.command](sr400, args, stdout)
+        except BrokenPipeError:
+            #El proceso que leía la salida terminó (p.ej. "| head")
+            return EXIT_OK
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            return EXIT_MEASUREMENT_ERROR
+        finally:
+            if sr400.is_connected:
+                sr400.disconnect()
+            if device is not None:
+                device.stop()
+
+if __name__ == "__main__":
+    sys.exit(main())
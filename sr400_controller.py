@@ -3,20 +3,29 @@ import time
 import re
 import math
 import numpy as np
-from typing import Callable, List, Tuple, Optional
+from typing import Callable, Iterator, List, NamedTuple, Tuple, Optional
 import threading
-from dataclasses import dataclass
+import queue
+import itertools
+import bisect
+from concurrent.futures import Future
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from enum import Enum
 
+from scurve_analysis import optimal_threshold
+
 #-----Enumeraciones para mejor control ------
+#Índices de canal del protocolo del SR400 (0 = A, 1 = B, 2 = T), p.ej. "CP 2," y "DL 0,"
 class DiscriminatorChannel(Enum):
-    A=1
-    B=2
-    T=3
+    A=0
+    B=1
+    T=2
 
+#Las puertas usan los mismos índices (GM 0, = puerta A); el modo de puerta es GM, no CM
 class GateChannel(Enum):
-    A=1
-    B=2
+    A=0
+    B=1
 
 class CountMode(Enum):
     A_B=0
@@ -48,6 +57,24 @@ class RemoteMode(Enum):
     REMOTE=1
     LOCKED_OUT=2
 
+class CommandPriority(Enum):
+    USER=0
+    ACQUISITION=1
+    STATUS=2
+
+#Terminador de respuestas del SR400 (CR, LF o CR/LF)
+_TERMINATOR = re.compile(rb"[\r\n]+")
+
+def _preset_digits(value: float) -> Tuple[int, int]:
+    """
+    Redondea un preset a mantisa de un dígito y exponente (m x 10^n)
+    """
+    exponent = int(math.floor(math.log10(value)))
+    mantissa = int(round(value / 10**exponent))
+    if mantissa == 10:
+        mantissa, exponent = 1, exponent + 1
+    return mantissa, exponent
+
 #-----Data Classes para estado del equipo ------
 @dataclass
 class SR400Status:
@@ -57,8 +84,309 @@ class SR400Status:
     scan_positions: int
     is_counting: bool
 
+@dataclass
+class CachedSetting:
+    """Último valor escrito de un ajuste y el comando que lo produjo"""
+    value: float
+    command: str
+    timestamp: float
+
+class CountRecord(NamedTuple):
+    """Conteos de un periodo del scan enviados por el instrumento"""
+    period: int
+    count_a: float
+    count_b: float
+
+@dataclass
+class DwellControl:
+    """
+    Dwell por punto con parada temprana: se cuenta en rebanadas de slice_time hasta que
+    el error relativo Poisson (1/sqrt(N)) llega a target_error, entre min_dwell y max_dwell
+    """
+    target_error: float = 0.02
+    min_dwell: float = 0.05
+    max_dwell: float = 2.0
+    slice_time: float = 0.02
+
+    @property
+    def target_counts(self) -> float:
+        return 1.0 / self.target_error**2
+
+    def finished(self, counts: float, elapsed: float) -> bool:
+        if elapsed >= self.max_dwell:
+            return True
+        return elapsed >= self.min_dwell and counts >= self.target_counts
+
+    def uncertainty(self, rate: float) -> float:
+        """Error esperado de una tasa medida con este control"""
+        rate = max(rate, 1.0)
+        return max(math.sqrt(rate / self.max_dwell), min(self.target_error * rate, math.sqrt(rate / self.min_dwell)))
+
+@dataclass
+class ReconnectPolicy:
+    """
+    Supervisión del enlace serial: tras un error de E/S o timeout_limit queries seguidos
+    sin respuesta se reabre el puerto con espera exponencial entre intentos
+    """
+    enabled: bool = True
+    max_attempts: int = 8
+    initial_delay: float = 0.25
+    max_delay: float = 8.0
+    factor: float = 2.0
+    timeout_limit: int = 3
+
+    def delays(self) -> Iterator[float]:
+        delay = self.initial_delay
+        for _ in range(self.max_attempts):
+            yield delay
+            delay = min(delay * self.factor, self.max_delay)
+
+#-----Estadísticas por comando ------
+#Mnemónico de un comando: dos letras (DL0,0.1 -> DL) o comando IEEE (*IDN?)
+_MNEMONIC = re.compile(r"\s*(\*[A-Za-z]+|[A-Za-z]{1,2})")
+
+def command_mnemonic(command: str) -> str:
+    match = _MNEMONIC.match(command)
+    return match.group(1).upper() if match else "?"
+
+@dataclass
+class CommandStat:
+    """Uso acumulado del enlace serial por un mnemónico"""
+    count: int = 0
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    wait_time: float = 0.0
+    sleep_time: float = 0.0
+    timeouts: int = 0
+    latency_total: float = 0.0
+    max_latency: float = 0.0
+    histogram: List[int] = field(default_factory=lambda: [0] * (len(CommandStats.LATENCY_BUCKETS) + 1))
+
+class CommandStats:
+    """
+    Contadores por mnemónico: llamadas, bytes enviados/recibidos, tiempo esperando
+    respuesta, tiempo dormido tras el comando e histograma de latencias
+    """
+    #Límites superiores (s) de los intervalos del histograma; el último intervalo es abierto
+    LATENCY_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._stats: dict = {}
+            self.started = time.monotonic()
+
+    def _get(self, mnemonic: str) -> CommandStat:
+        stat = self._stats.get(mnemonic)
+        if stat is None:
+            stat = self._stats[mnemonic] = CommandStat()
+        return stat
+
+    def record_sent(self, command: str, sleep_time: float=0.0):
+        """
+        Una línea enviada; los comandos unidos por ';' se cuentan por separado y la
+        espera tras la línea se reparte en partes iguales entre ellos
+        """
+        with self._lock:
+            parts = command.rstrip('\r').split(';')
+            for part in parts:
+                stat = self._get(command_mnemonic(part))
+                stat.count += 1
+                #Separador o terminador de cada comando
+                stat.bytes_sent += len(part) + 1
+                stat.sleep_time += sleep_time / len(parts)
+
+    def record_reply(self, command: str, bytes_received: int, wait_time: float, latency: Optional[float]=None):
+        """Respuesta recibida (o deadline vencido) para un query"""
+        with self._lock:
+            stat = self._get(command_mnemonic(command))
+            stat.bytes_received += bytes_received
+            stat.wait_time += wait_time
+            if latency is None:
+                if not bytes_received:
+                    stat.timeouts += 1
+            else:
+                stat.latency_total += latency
+                stat.max_latency = max(stat.max_latency, latency)
+                stat.histogram[bisect.bisect_left(self.LATENCY_BUCKETS, latency)] += 1
+
+    def snapshot(self) -> dict:
+        """
+        {mnemónico: {count, bytes_sent, bytes_received, wait_time, sleep_time, timeouts,
+        mean_latency, p95_latency, max_latency, histogram}}
+        """
+        with self._lock:
+            result = {}
+            for mnemonic, stat in self._stats.items():
+                replies = sum(stat.histogram)
+                result[mnemonic] = {
+                    'count': stat.count,
+                    'bytes_sent': stat.bytes_sent,
+                    'bytes_received': stat.bytes_received,
+                    'wait_time': stat.wait_time,
+                    'sleep_time': stat.sleep_time,
+                    'timeouts': stat.timeouts,
+                    'mean_latency': stat.latency_total / replies if replies else None,
+                    'p95_latency': self._percentile(stat.histogram, 0.95),
+                    'max_latency': stat.max_latency if replies else None,
+                    'histogram': list(stat.histogram),
+                }
+            return result
+
+    def _percentile(self, histogram: List[int], fraction: float) -> Optional[float]:
+        """Límite superior del intervalo que contiene el percentil"""
+        total = sum(histogram)
+        if not total:
+            return None
+        accumulated = 0
+        for i, count in enumerate(histogram):
+            accumulated += count
+            if accumulated >= fraction * total:
+                return self.LATENCY_BUCKETS[i] if i < len(self.LATENCY_BUCKETS) else math.inf
+        return math.inf
+
+    def link_usage(self, baudrate: int) -> float:
+        """Fracción del ancho de banda serial usada desde el último reset (10 bits por byte)"""
+        with self._lock:
+            total_bytes = sum(s.bytes_sent + s.bytes_received for s in self._stats.values())
+            elapsed = time.monotonic() - self.started
+        return total_bytes * 10 / baudrate / elapsed if elapsed > 0 and baudrate else 0.0
+
+#-----Scheduler de comandos ------
+class CommandScheduler:
+    """
+    Ejecuta todas las operaciones sobre el puerto serial en un solo hilo, por prioridad
+    """
+    #Prioridad de la marca de fin: se procesa después de lo pendiente
+    _STOP = 1 << 30
+
+    def __init__(self, name: str="SR400"):
+        self.name = name
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def in_worker_thread(self) -> bool:
+        """Indica si el llamador ya es el hilo del scheduler"""
+        return threading.current_thread() is self._thread
+
+    def start(self):
+        """Inicia el hilo del scheduler"""
+        if not self.is_running:
+            self._thread = threading.Thread(target=self._run, name=f"{self.name}-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float=2.0):
+        """Procesa lo pendiente y detiene el hilo"""
+        if self.is_running:
+            self._queue.put((self._STOP, next(self._sequence), None, None, None, None))
+            if not self.in_worker_thread():
+                self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def submit(self, function: Callable, *args, priority: CommandPriority=CommandPriority.USER, **kwargs) -> Future:
+        """Encola una operación y devuelve un Future con su resultado"""
+        future: Future = Future()
+        self._queue.put((priority.value, next(self._sequence), function, args, kwargs, future))
+        return future
+
+    def _run(self):
+        while True:
+            _, _, function, args, kwargs, future = self._queue.get()
+            if function is None:
+                break
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(function(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+        #Lo que llegue después de detener se cancela
+        while True:
+            try:
+                _, _, function, _, _, future = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if future is not None and future.set_running_or_notify_cancel():
+                future.set_exception(RuntimeError("Scheduler detenido"))
+
+class CommandBatch:
+    """
+    Lote de comandos que se envían unidos por ';' al salir del bloque
+    """
+    def __init__(self, sr400: 'SR400'):
+        self.sr400 = sr400
+        self.commands: List[str] = []
+        #Claves de la copia local escritas dentro del lote
+        self.settings: List[Tuple] = []
+        self.ok = True
+        self._outer = None
+
+    def add(self, command: str):
+        """Encola un comando del lote"""
+        command = command.strip().rstrip(';')
+        if command:
+            self.commands.append(command)
+
+    def flush(self) -> bool:
+        """
+        Envía lo acumulado hasta ahora (p.ej. antes de un query, que debe ver los
+        ajustes del lote); el lote sigue activo para los comandos siguientes
+        """
+        commands, self.commands = self.commands, []
+        settings, self.settings = self.settings, []
+        self.sr400._batch = None
+        try:
+            sent = self.sr400.send_commands(commands)
+        finally:
+            self.sr400._batch = self
+        if not sent:
+            self.ok = False
+            self.sr400.invalidate_settings(settings)
+        return sent
+
+    def __enter__(self):
+        #Un lote anidado se fusiona con el lote exterior
+        self._outer = self.sr400._batch
+        if self._outer is None:
+            self.sr400._batch = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        if self._outer is not None:
+            return False
+        self.sr400._batch = None
+        if exc_type is None:
+            self.ok = self.sr400.send_commands(self.commands)
+        else:
+            self.ok = False
+        if not self.ok:
+            #No se sabe qué comando falló: los ajustes del lote dejan de ser confiables
+            self.sr400.invalidate_settings(self.settings)
+        return False
+
 class SR400:
-    def __init__(self, port: str, baudrate: int=9600, timeout: int = 1):
+    #Intervalo máximo de bloqueo por lectura; el deadline real lo fija query
+    READ_POLL_INTERVAL = 0.02
+    #Longitud máxima de una línea de comandos (buffer de entrada del SR400)
+    MAX_COMMAND_LINE = 128
+    #Bits del status byte (SS) que indican comando no reconocido o parámetro inválido
+    STATUS_ERROR_MASK = 0x30
+    #Frecuencia de la base de tiempo interna (entrada MHZ_10)
+    CLOCK_FREQUENCY = 10e6
+    #Dwell mínimo entre periodos de un scan
+    SCAN_DWELL_TIME = 2e-3
+    #Espera tras abrir el puerto antes del primer comando
+    SETTLE_TIME = 0.1
+
+    def __init__(self, port: str, baudrate: int=9600, timeout: float = 1):
         """
         Inicializa la comunicación con el SR400
         """
@@ -68,6 +396,34 @@ class SR400:
         self.ser = None
         self.is_connected = False
         self.is_counting = False
+        #Respuesta de la prueba de conexión (estado | nivel A)
+        self.identification = None
+        self._scurve_cancel = False
+        self.count_period = None
+        self._rx_buffer = bytearray()
+        self._streaming = False
+
+        #Copia local de los ajustes escritos (write-through)
+        self.cache_ttl: Optional[float] = None
+        self._settings: dict = {}
+        self._settings_lock = threading.Lock()
+
+        #Lotes y prioridad son propios de cada hilo llamador
+        self._local = threading.local()
+        self.scheduler = CommandScheduler(f"SR400-{port}")
+
+        #Uso del enlace serial por comando
+        self.stats = CommandStats()
+        #Registro opcional de la comunicación (TranscriptWriter de session_store)
+        self.transcript = None
+
+        #Supervisión del enlace: reconexión automática tras una caída del puerto
+        self.reconnect_policy = ReconnectPolicy()
+        self.reconnections = 0
+        self._supervised = False
+        self._recovering = False
+        self._missed_replies = 0
+        self._stop_reconnect = threading.Event()
 
         #Eventos para UI
         self.on_data_received = None
@@ -84,22 +440,29 @@ class SR400:
         Establece conexión con el SR400
         """
         try:
-            self.ser = serial.Serial(
-                port=self.port,
-                baudrate=self.baudrate,
-                bytesize=serial.EIGHTBITS,
-                parity=serial.PARITY_NONE,
-                stopbits=serial.STOPBITS_ONE,
-                timeout=self.timeout
-            )
-            time.sleep(2)
-            
-            test_response = self.query("*IDN?")
-            
-            if not test_response:
-                test_response = self.get_discriminator_level(DiscriminatorChannel.A)
-            
+            self._stop_reconnect.clear()
+            self.ser = self._open_port()
+            self.scheduler.start()
+            time.sleep(self.SETTLE_TIME)
             self.is_connected = True
+            #El estado del instrumento es desconocido hasta escribirlo o leerlo
+            self.invalidate_settings()
+
+            #El SR400 no tiene comando de identificación: SS (que además limpia los
+            #bits de error) y el nivel del discriminador A confirman que responde
+            status = self.query("SS")
+            level = self.get_discriminator_level(DiscriminatorChannel.A, refresh=True) if status else None
+            if level is None:
+                self._execute(self.ser.close)
+                self.scheduler.stop()
+                self.is_connected = False
+                error_msg = f"El SR400 no respondió en {self.port}"
+                self._trigger_event(self.on_error, error_msg)
+                print(f"❌ {error_msg}")
+                return False
+            self.identification = f"{status} | {level:.4f}"
+            self._supervised = True
+
             self._trigger_event(self.on_status_changed,"Conectado")
             print(f"✅ Conectado exitosamente al SR400 en {self.port}")
             return True
@@ -118,103 +481,491 @@ class SR400:
         """
         Cierra la conexión
         """
+        #Una reconexión en curso se abandona
+        self._supervised = False
+        self._stop_reconnect.set()
         self.stop_monitoring()
         if self.ser and self.ser.is_open:
             self.set_remote_mode(RemoteMode.LOCAL)
-            self.ser.close()
+            self._execute(self.ser.close)
+        self.scheduler.stop()
         self.is_connected = False
         self._trigger_event(self.on_status_changed,"Desconectado")
         
-    def send_command(self, command:str, wait_time: float=0.1) -> bool:
+    def send_command(self, command:str, wait_time: float=0.0) -> bool:
         """
-        Envía comando al instrumento
+        Envía comando al instrumento (o lo encola si hay un lote activo)
         """
+        if self._batch is not None:
+            self._batch.add(command)
+            return True
         if not self.is_connected:
             self._trigger_event(self.on_error, "No conectado al SR400")
             return False
+        return self._execute(self._write_command, command, wait_time)
+
+    def _write_command(self, command: str, wait_time: float=0.0, retry: bool=True) -> bool:
+        """
+        Escribe el comando en el puerto (se ejecuta en el hilo del scheduler);
+        si el enlace se cayó y se recupera, se reenvía una vez
+        """
         try:
             if not command.endswith('\r'):
                 command += '\r'
             self.ser.write(command.encode('ascii'))
-            time.sleep(wait_time)
+            self._record_transcript('tx', command[:-1])
+            if wait_time:
+                time.sleep(wait_time)
+            self.stats.record_sent(command, wait_time)
             return True
+        except (serial.SerialException, OSError) as e:
+            if self._recover_link(f"Error enviando comando: {str(e)}") and retry:
+                return self._write_command(command, wait_time, retry=False)
+            return False
         except Exception as e:
             self._trigger_event(self.on_error, f"Error enviando comando: {str(e)}")
             return False
         
-    def query(self, command: str, wait_time: float=0.2) -> Optional[str]:
+    def batch(self) -> CommandBatch:
+        """
+        Agrupa los comandos enviados dentro del bloque en el menor número de líneas
+        """
+        return CommandBatch(self)
+
+    def send_commands(self, commands: List[str]) -> bool:
+        """
+        Envía varios comandos unidos por ';' y verifica el resultado una sola vez
+        """
+        if not commands:
+            return True
+        for line in self._pack_commands(commands):
+            if not self.send_command(line):
+                return False
+        return self.check_command_errors()
+
+    @classmethod
+    def _pack_commands(cls, commands: List[str], max_line: Optional[int]=None) -> List[str]:
         """
-        Envía comando y espera respuesta
+        Une comandos en líneas que caben en el buffer de entrada del instrumento
         """
-        if self.send_command(command, wait_time):
+        max_line = max_line or cls.MAX_COMMAND_LINE
+        lines = []
+        current = ""
+        for command in commands:
+            candidate = f"{current};{command}" if current else command
+            #+1 por el terminador CR
+            if current and len(candidate) + 1 > max_line:
+                lines.append(current)
+                current = command
+            else:
+                current = candidate
+        if current:
+            lines.append(current)
+        return lines
+
+    def check_command_errors(self) -> bool:
+        """
+        Lee el status byte y reporta si algún comando anterior fue rechazado
+        """
+        response = self.query("SS")
+        try:
+            status = int(float(response)) if response else None
+        except ValueError:
+            status = None
+        if status is None:
+            self._trigger_event(self.on_error, "Sin confirmación del SR400 tras el lote de comandos")
+            return False
+        if status & self.STATUS_ERROR_MASK:
+            self._trigger_event(self.on_error, f"El SR400 rechazó un comando (status {status})")
+            return False
+        return True
+
+    def query(self, command: str, timeout: Optional[float]=None) -> Optional[str]:
+        """
+        Envía comando y espera respuesta hasta el terminador CR/LF o el deadline
+        """
+        if not self.is_connected:
+            self._trigger_event(self.on_error, "No conectado al SR400")
+            return None
+        if self._streaming:
+            #El hilo lector del streaming es el único dueño de la entrada serial
+            self._trigger_event(self.on_error, f"Consulta {command} rechazada: hay un streaming en curso")
+            return None
+        if self._batch is not None:
+            #La respuesta debe reflejar los comandos del lote, que aún no se enviaron
+            self._batch.flush()
+        return self._execute(self._query_now, command, timeout)
+
+    def _query_now(self, command: str, timeout: Optional[float], retry: bool=True) -> Optional[str]:
+        """
+        Escritura y lectura de un query como una sola operación del scheduler;
+        si el enlace se cayó y se recupera, el query se repite una vez
+        """
+        try:
+            self._discard_input()
+        except Exception as e:
+            #tcflush falla con termios.error cuando el adaptador desaparece
+            if self._recover_link(f"Error limpiando buffer: {str(e)}") and retry:
+                return self._query_now(command, timeout, retry=False)
+            return None
+        if self._write_command(command, retry=retry):
+            sent = time.monotonic()
+            deadline = sent + (self.timeout if timeout is None else timeout)
             try:
-                response = self.ser.readline().decode('ascii').strip()
-                self._trigger_event(self.on_data_received, response)
-                return response
+                response = self._read_line(deadline)
+            except (serial.SerialException, OSError) as e:
+                if self._recover_link(f"Error leyendo respuesta: {str(e)}") and retry:
+                    return self._query_now(command, timeout, retry=False)
+                return None
             except Exception as e:
                 self._trigger_event(self.on_error, f"Error leyendo respuesta: {str(e)}")
                 return None
+            waited = time.monotonic() - sent
+            if response is None:
+                self.stats.record_reply(command, 0, waited)
+                #Varios queries seguidos sin respuesta: el enlace está muerto aunque el puerto siga abierto
+                self._missed_replies += 1
+                if (self._supervised and self.reconnect_policy.enabled
+                        and self._missed_replies >= self.reconnect_policy.timeout_limit
+                        and self._recover_link(f"{self._missed_replies} consultas sin respuesta") and retry):
+                    return self._query_now(command, timeout, retry=False)
+            else:
+                self._missed_replies = 0
+                self.stats.record_reply(command, len(response) + 2, waited, waited)
+            if response is not None:
+                self._trigger_event(self.on_data_received, response)
+            return response
+        return None
+
+    #-----Supervisión del enlace ------
+    def _open_port(self) -> serial.Serial:
+        return serial.Serial(
+            port=self.port,
+            baudrate=self.baudrate,
+            bytesize=serial.EIGHTBITS,
+            parity=serial.PARITY_NONE,
+            stopbits=serial.STOPBITS_ONE,
+            timeout=min(self.timeout, self.READ_POLL_INTERVAL)
+        )
+
+    def _recover_link(self, reason: str) -> bool:
+        """
+        Reabre el puerto con espera exponencial y vuelve a aplicar los ajustes de la
+        copia local (se ejecuta en el hilo del scheduler, así nada más usa el puerto).
+        Si no lo logra, la conexión queda cerrada y se notifica por on_error.
+        """
+        if not (self._supervised and self.reconnect_policy.enabled) or self._recovering:
+            self._trigger_event(self.on_error, reason)
+            return False
+        self._recovering = True
+        try:
+            print(f"⚠️ Enlace perdido con {self.port}: {reason}")
+            self._trigger_event(self.on_status_changed, "Reconectando")
+            for attempt, delay in enumerate(self.reconnect_policy.delays(), 1):
+                if self._stop_reconnect.wait(delay):
+                    break
+                if self._reopen_port():
+                    self.reconnections += 1
+                    self._missed_replies = 0
+                    self._reapply_settings()
+                    print(f"✅ Reconectado a {self.port} (intento {attempt})")
+                    self._trigger_event(self.on_status_changed, "Reconectado")
+                    return True
+
+            self._supervised = False
+            self.is_connected = False
+            error_msg = f"Se perdió la conexión con el SR400 en {self.port}: {reason}"
+            self._trigger_event(self.on_error, error_msg)
+            print(f"❌ {error_msg}")
+            self._trigger_event(self.on_status_changed, "Desconectado")
+            return False
+        finally:
+            self._recovering = False
+
+    def _reopen_port(self) -> bool:
+        """Un intento de reconexión: abrir el puerto y recibir respuesta a SS"""
+        try:
+            if self.ser is not None:
+                self.ser.close()
+        except Exception:
+            pass
+        try:
+            self.ser = self._open_port()
+            time.sleep(self.SETTLE_TIME)
+            self._rx_buffer.clear()
+            self.ser.reset_input_buffer()
+            self.ser.write(b"SS\r")
+            return self._read_line(time.monotonic() + self.timeout) is not None
+        except (serial.SerialException, OSError):
+            return False
+
+    def _reapply_settings(self):
+        """
+        Compara la copia local con el equipo y reenvía los ajustes que difieren
+        (p.ej. si el SR400 se reinició durante la caída)
+        """
+        with self._settings_lock:
+            cached = dict(self._settings)
+        current = {key: self._query_setting(key) for key in cached}
+        #En modo SCAN el nivel avanza solo: no se compara con el nivel inicial guardado
+        scanning = {key[1] for key, setting in cached.items()
+                    if key[0] == 'DM' and setting.value == DiscriminatorMode.SCAN.value and current[key] == setting.value}
+        commands = [setting.command for key, setting in cached.items()
+                    if not (key[0] == 'DL' and key[1] in scanning)
+                    and (current[key] is None or not math.isclose(current[key], setting.value, rel_tol=1e-6, abs_tol=1e-9))]
+        if not commands:
+            return
+        print(f"🔧 Restaurando {len(commands)} ajuste(s) tras la reconexión")
+        for line in self._pack_commands(commands):
+            if not self._write_command(line, retry=False):
+                return
+        if not self.check_command_errors():
+            print("⚠️ Algunos ajustes no se pudieron restaurar tras la reconexión")
+
+    #-----Scheduler y prioridades ------
+    @property
+    def _batch(self) -> Optional[CommandBatch]:
+        return getattr(self._local, 'batch', None)
+
+    @_batch.setter
+    def _batch(self, batch: Optional[CommandBatch]):
+        self._local.batch = batch
+
+    def _current_priority(self) -> CommandPriority:
+        return getattr(self._local, 'priority', CommandPriority.USER)
+
+    @contextmanager
+    def priority(self, level: CommandPriority):
+        """
+        Prioridad con la que se encolan los comandos de este hilo dentro del bloque
+        """
+        previous = self._current_priority()
+        self._local.priority = level
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    def submit(self, function: Callable, *args, priority: Optional[CommandPriority]=None, **kwargs) -> Future:
+        """
+        Encola una operación completa (p.ej. get_status) y devuelve un Future con el resultado
+        """
+        level = priority or self._current_priority()
+        if not self.scheduler.is_running:
+            future: Future = Future()
+            try:
+                future.set_result(function(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        return self.scheduler.submit(function, *args, priority=level, **kwargs)
+
+    def _execute(self, function: Callable, *args):
+        """
+        Ejecuta una operación de E/S en el hilo del scheduler y espera su resultado
+        """
+        if not self.scheduler.is_running or self.scheduler.in_worker_thread():
+            return function(*args)
+        return self.scheduler.submit(function, *args, priority=self._current_priority()).result()
+
+    def _read_line(self, deadline: float) -> Optional[str]:
+        """
+        Lee una línea terminada en CR/LF; regresa en cuanto llega el terminador
+        """
+        while True:
+            line = self._pop_line()
+            if line is not None:
+                return line
+            if time.monotonic() >= deadline:
+                return None
+            chunk = self.ser.read(self.ser.in_waiting or 1)
+            if chunk:
+                self._rx_buffer.extend(chunk)
+
+    def _pop_line(self) -> Optional[str]:
+        """
+        Extrae la siguiente línea completa del buffer de recepción
+        """
+        while True:
+            match = _TERMINATOR.search(self._rx_buffer)
+            if not match:
+                return None
+            line = bytes(self._rx_buffer[:match.start()])
+            del self._rx_buffer[:match.end()]
+            line = line.decode('ascii', errors='ignore').strip()
+            if line:
+                self._record_transcript('rx', line)
+                return line
+
+    def _record_transcript(self, direction: str, data: str):
+        transcript = self.transcript
+        if transcript is not None:
+            transcript.record(direction, data)
+
+    def _discard_input(self):
+        """
+        Descarta respuestas atrasadas para no atribuirlas al siguiente query
+        """
+        self._rx_buffer.clear()
+        self.ser.reset_input_buffer()
+
+    #-----Copia local de ajustes ------
+    def _send_setting(self, key: Tuple, value: float, command: str) -> bool:
+        """
+        Envía un ajuste y, si se aceptó, actualiza la copia local
+        """
+        if not self.send_command(command):
+            return False
+        with self._settings_lock:
+            self._settings[key] = CachedSetting(value, command, time.monotonic())
+        if self._batch is not None:
+            self._batch.settings.append(key)
+        return True
+
+    def get_setting(self, key: Tuple, refresh: bool=False) -> Optional[float]:
+        """
+        Valor de un ajuste desde la copia local; se consulta al equipo si no hay copia,
+        si expiró cache_ttl o si refresh=True. El nivel de un discriminador en modo SCAN
+        cambia en cada periodo: siempre se lee del equipo y no se guarda.
+        """
+        with self._settings_lock:
+            cached = self._settings.get(key)
+            scanning = key[0] == 'DL' and self._is_scanning(key[1])
+        if scanning:
+            return self._query_setting(key)
+        if cached is not None and not refresh:
+            if self.cache_ttl is None or time.monotonic() - cached.timestamp < self.cache_ttl:
+                return cached.value
+        value = self._query_setting(key)
+        if value is not None:
+            command = cached.command if cached else self._setting_command(key, value)
+            with self._settings_lock:
+                self._settings[key] = CachedSetting(value, command, time.monotonic())
+        return value
+
+    def _is_scanning(self, channel: int) -> bool:
+        #Modo del discriminador según la copia local (se llama con _settings_lock tomado)
+        mode = self._settings.get(('DM', channel))
+        return mode is not None and mode.value == DiscriminatorMode.SCAN.value
+
+    def _query_setting(self, key: Tuple) -> Optional[float]:
+        """
+        Lee un ajuste del instrumento (el comando sin parámetro devuelve su valor)
+        """
+        mnemonic, *channel = key
+        if mnemonic == 'DL':
+            #DZ devuelve el nivel presente, también durante un barrido en modo SCAN
+            command = f"DZ{channel[0]}"
+        else:
+            command = mnemonic + ",".join(str(c) for c in channel)
+        response = self.query(command)
+        try:
+            return float(response) if response else None
+        except ValueError:
+            return None
+
+    def _setting_command(self, key: Tuple, value: float) -> str:
+        """
+        Comando que reproduce un ajuste leído del instrumento
+        """
+        mnemonic, *channel = key
+        arguments = [str(c) for c in channel] + [f"{value:g}"]
+        return mnemonic + ",".join(arguments)
+
+    def refresh_settings(self) -> dict:
+        """
+        Fuerza la relectura de todos los ajustes conocidos
+        """
+        with self._settings_lock:
+            keys = list(self._settings)
+        for key in keys:
+            self.get_setting(key, refresh=True)
+        return self.get_cached_settings()
+
+    def invalidate_settings(self, keys: Optional[List[Tuple]]=None):
+        """
+        Descarta la copia local (toda o solo las claves indicadas)
+        """
+        with self._settings_lock:
+            if keys is None:
+                self._settings.clear()
+            else:
+                for key in keys:
+                    self._settings.pop(key, None)
+
+    def get_cached_settings(self) -> dict:
+        """
+        Copia de los ajustes conocidos, p.ej. {'DL0': -0.01, 'CM': 0}
+        """
+        with self._settings_lock:
+            return {"".join(str(k) for k in key): setting.value for key, setting in self._settings.items()}
+
     #-----Comandos principales ------
     def set_count_mode(self, mode:CountMode) ->bool:
         """Establece el modo de conteo"""
-        return self.send_command(f"CM{mode.value}")
+        return self._send_setting(('CM',), mode.value, f"CM{mode.value}")
     
     def set_discriminator_level(self, channel: DiscriminatorChannel, voltage: float) -> bool:
         """
         Configura el nivel del discriminador (-0.3V a +0.3v)
         """
         if -0.3 <= voltage <= 0.3:
-            return self.send_command(f"DL{channel.value},{voltage:.4f}")
+            return self._send_setting(('DL', channel.value), round(voltage, 4), f"DL{channel.value},{voltage:.4f}")
         else:
             self._trigger_event(self.on_error, "Voltaje fuera de rango (-0.3V a +0.3V)")
             return False
             
-    def get_discriminator_level(self, channel: DiscriminatorChannel) -> Optional[float]:
+    def get_discriminator_level(self, channel: DiscriminatorChannel, refresh: bool=False) -> Optional[float]:
         """
-        Lee nivel actual del discriminador
+        Nivel del discriminador (desde la copia local salvo refresh=True)
         """
-        response = self.query(f"DZ{channel.value}?")
-        if response:
-            try:
-                return float(response) if response else None
-            except ValueError:
-                return None
+        return self.get_setting(('DL', channel.value), refresh)
             
     def set_discriminator_slope(self, channel: DiscriminatorChannel, slope: DiscriminatorSlope) -> bool:
         """
         Configura la pendiente del discriminador
         """
-        return self.send_command(f"DS{channel.value},{slope.value}")
+        return self._send_setting(('DS', channel.value), slope.value, f"DS{channel.value},{slope.value}")
         
     def set_discriminator_mode(self, channel: DiscriminatorChannel, mode: DiscriminatorMode) -> bool:
         """
         Configura el modo del discriminador
         """
-        return self.send_command(f"DM{channel.value},{mode.value}")
+        return self._send_setting(('DM', channel.value), mode.value, f"DM{channel.value},{mode.value}")
+
+    def set_discriminator_scan_step(self, channel: DiscriminatorChannel, step_voltage: float) -> bool:
+        """
+        Configura el incremento por periodo del discriminador en modo SCAN (-0.02V a +0.02V)
+        """
+        if -0.02 <= step_voltage <= 0.02:
+            return self._send_setting(('DY', channel.value), round(step_voltage, 4), f"DY{channel.value},{step_voltage:.4f}")
+        else:
+            self._trigger_event(self.on_error, "Paso de barrido fuera de rango (-0.02V a +0.02V)")
+            return False
 
     def set_gate_width(self, channel: GateChannel, width_seconds: float) -> bool:
         """
         Configura el ancho de la puerta 
         """
-        return self.send_command(f"GW{channel.value},{width_seconds}")
+        return self._send_setting(('GW', channel.value), width_seconds, f"GW{channel.value},{width_seconds}")
         
     def set_gate_delay(self, channel: GateChannel, delay_seconds: float) -> bool:
         """
         Establece delay de la puerta
         """
-        return self.send_command(f"GD{channel.value},{delay_seconds}")
+        return self._send_setting(('GD', channel.value), delay_seconds, f"GD{channel.value},{delay_seconds}")
         
     def set_gate_mode(self, channel: GateChannel, mode: GateMode) -> bool:
         """
-        Establce modo de conteo
+        Establece modo de la puerta (GM i,m; CM es el modo de conteo A/B)
         """
-        return self.send_command(f"CM{mode.value}")
+        return self._send_setting(('GM', channel.value), mode.value, f"GM{channel.value},{mode.value}")
         
     def set_input_source(self, counter:DiscriminatorChannel, source:InputSource)->bool:
         """
         Establece la fuente de entrada
         """
-        return self.send_command(f"CI{counter.value},{source.value}")
+        return self._send_setting(('CI', counter.value), source.value, f"CI{counter.value},{source.value}")
     
     #-----Medición y control-------
     def get_count_rate(self, counter: str='A') -> Optional[float]:
@@ -243,21 +994,23 @@ class SR400:
             return None
 
         
-    def start_count(self) -> bool:
+    def start_count(self, barrier: Optional[threading.Barrier]=None) -> bool:
         """
-        Inicia conteo
+        Inicia conteo (con barrier, cuando todos los equipos de la barrera están listos)
         """
-        if self.send_command("CS"):
+        started = self._execute(self._write_synchronized, "CS", barrier) if barrier else self.send_command("CS")
+        if started:
             self.is_counting = True
             self._trigger_event(self.on_counting_changed, True)
             return True
         return False
 
-    def stop_count(self) -> bool:
+    def stop_count(self, barrier: Optional[threading.Barrier]=None) -> bool:
         """
-        Detiene conteo
+        Detiene conteo (con barrier, cuando todos los equipos de la barrera están listos)
         """
-        if self.send_command("CH"):
+        stopped = self._execute(self._write_synchronized, "CH", barrier) if barrier else self.send_command("CH")
+        if stopped:
             self.is_counting = False
             self._trigger_event(self.on_counting_changed, False)
             return True
@@ -273,16 +1026,249 @@ class SR400:
         """
         Configura el tiempo de dwell
         """
-        return self.send_command(f"DT{time_seconds}")
+        return self._send_setting(('DT',), time_seconds, f"DT{time_seconds}")
         
     def set_scan_periods(self, periods: int) -> bool:
         """
         Configura el número de periodos de sscan
         """
         if 1 <= periods <= 2000:
-            return self.send_command(f"NP{periods}")
+            return self._send_setting(('NP',), periods, f"NP{periods}")
         return False
+
+    def set_counter_preset(self, counter: DiscriminatorChannel, value: float) -> bool:
+        """
+        Configura el preset del contador (fin de periodo); el SR400 usa mantisa de un dígito
+        """
+        mantissa, exponent = _preset_digits(value)
+        return self._send_setting(('CP', counter.value), mantissa * 10**exponent, f"CP{counter.value},{mantissa}E{exponent}")
+
+    def set_count_period(self, time_seconds: float) -> bool:
+        """
+        Configura la duración de cada periodo usando el contador T con la base de 10 MHz
+        """
+        ticks = time_seconds * self.CLOCK_FREQUENCY
+        if 1 <= ticks <= 9e11:
+            mantissa, exponent = _preset_digits(ticks)
+            if self.set_counter_preset(DiscriminatorChannel.T, ticks):
+                #Periodo efectivo tras redondear el preset
+                self.count_period = mantissa * 10**exponent / self.CLOCK_FREQUENCY
+                return True
+            return False
+        self._trigger_event(self.on_error, "Periodo de conteo fuera de rango")
+        return False
+
+    def read_stored_counts(self, counter: str='A', periods: int=1) -> Optional[np.ndarray]:
+        """
+        Lee en una sola transferencia (EA/EB) los conteos almacenados de los periodos del scan
+        """
+        if not self.is_connected:
+            return None
+        if self._streaming:
+            self._trigger_event(self.on_error, "Lectura de datos rechazada: hay un streaming en curso")
+            return None
+        return self._execute(self._read_stored_counts_now, counter, periods)
+
+    def _read_stored_counts_now(self, counter: str, periods: int) -> Optional[np.ndarray]:
+        try:
+            self._discard_input()
+            if not self._write_command(f"E{counter.upper()}"):
+                return None
+            #Deadline proporcional a los bytes esperados (~12 caracteres por punto)
+            transfer_time = periods * 12 * 10 / self.baudrate
+            deadline = time.monotonic() + self.timeout + transfer_time
+            counts = np.full(periods, np.nan)
+            sent = time.monotonic()
+            received = 0
+            try:
+                for i in range(periods):
+                    line = self._read_line(deadline)
+                    if line is None:
+                        self._trigger_event(self.on_error, f"Lectura incompleta: {i}/{periods} puntos")
+                        return counts[:i]
+                    received += len(line) + 2
+                    try:
+                        counts[i] = float(line)
+                    except ValueError:
+                        pass
+                return counts
+            finally:
+                waited = time.monotonic() - sent
+                self.stats.record_reply(f"E{counter.upper()}", received, waited, waited if received else None)
+        except (serial.SerialException, OSError) as e:
+            #Los datos siguen en el instrumento: el llamador puede repetir la lectura
+            self._recover_link(f"Error leyendo datos almacenados: {str(e)}")
+            return None
+        except Exception as e:
+            self._trigger_event(self.on_error, f"Error leyendo datos almacenados: {str(e)}")
+            return None
+
+    def measure_s_curve(self,
+                        channel: DiscriminatorChannel,
+                        start_v: float,
+                        end_v: float,
+                        steps: int,
+                        dwell_time: float = 0.5,
+                        progress_callback: Optional[Callable] = None,
+                        use_scan: bool = True,
+                        adaptive: bool = False,
+                        dwell_control: Optional[DwellControl] = None,
+                        point_callback: Optional[Callable[[float, float], None]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Curva S: barrido en el instrumento (modo SCAN) o paso a paso desde el host.
+        El modo adaptativo y el dwell por error objetivo deciden punto a punto, por eso
+        siempre se hacen desde el host. point_callback(threshold, tasa) recibe cada
+        punto al medirse (en el barrido por hardware, todos al leer los datos).
+        """
+        with self.priority(CommandPriority.ACQUISITION):
+            if use_scan and not adaptive and dwell_control is None and 2 <= steps <= 2000:
+                if scan_step(start_v, end_v, steps) is not None:
+                    return measure_s_curve_scan(self, channel, start_v, end_v, steps, dwell_time, progress_callback,
+                                                point_callback=point_callback)
+                print(f"⚠️ Paso de {(end_v - start_v) / (steps - 1):.4f} V fuera del rango del modo SCAN: "
+                      f"barrido desde el host")
+            return measure_s_curve(self, channel, start_v, end_v, steps, dwell_time, progress_callback,
+                                   adaptive, dwell_control, point_callback)
         
+    #-----Adquisición en streaming ------
+    def stream_counts(self, periods: int, command: str="FA", queue_size: int=1024,
+                      start_barrier: Optional[threading.Barrier]=None) -> Iterator[CountRecord]:
+        """
+        Inicia un scan de varios periodos y entrega los conteos conforme el SR400 los envía
+
+        command="FA" inicia el scan y envía el contador A al final de cada periodo; "FB"
+        hace lo mismo con el contador B (el otro campo del CountRecord queda en NaN; sus
+        conteos siguen guardados y se leen después con read_stored_counts).
+        Con start_barrier el comando de inicio se envía cuando todos los participantes
+        de la barrera están listos (arranque simultáneo de varios equipos).
+
+        Si un periodo no llega en su duración más timeout, o el scan completo no termina
+        en periods * (periodo + dwell) + timeout, el streaming termina con TimeoutError.
+        """
+        if command not in ("FA", "FB"):
+            raise ValueError("El streaming usa FA (contador A) o FB (contador B)")
+        if not self.is_connected:
+            raise RuntimeError("Dispositivo no conectado")
+        if not self.set_scan_periods(periods):
+            raise ValueError("Número de periodos fuera de rango (1 a 2000)")
+        interval = self._period_interval()
+
+        records: queue.Queue = queue.Queue(maxsize=queue_size)
+        stop_event = threading.Event()
+        reader = threading.Thread(target=self._stream_reader, args=(periods, records, stop_event, command), daemon=True)
+
+        self._execute(self._discard_input)
+        self._streaming = True
+        reader.start()
+        try:
+            if start_barrier is not None:
+                started = self._execute(self._write_synchronized, f"CR;{command}", start_barrier)
+            else:
+                started = self.send_command(f"CR;{command}")
+            if not started:
+                return
+            self.is_counting = True
+            self._trigger_event(self.on_counting_changed, True)
+
+            deadline = time.monotonic() + periods * interval + self.timeout
+            received = 0
+            while received < periods:
+                wait = min(interval + self.timeout, deadline - time.monotonic())
+                try:
+                    if wait <= 0:
+                        raise queue.Empty
+                    record = records.get(timeout=wait)
+                except queue.Empty:
+                    raise TimeoutError(f"El SR400 dejó de enviar datos (periodo {received + 1}/{periods})")
+                if record is None:
+                    break
+                received += 1
+                yield record
+        finally:
+            stop_event.set()
+            reader.join(timeout=2.0)
+            self._streaming = False
+            self.stop_count()
+
+    def _period_interval(self) -> float:
+        """
+        Segundos entre el inicio de dos periodos del scan: preset del contador T más el
+        dwell (de la copia local o leídos del instrumento)
+        """
+        period = self.count_period
+        if period is None:
+            preset = self.get_setting(('CP', DiscriminatorChannel.T.value))
+            if preset is None:
+                raise RuntimeError("Periodo de conteo desconocido: configúrelo con set_count_period")
+            period = preset / self.CLOCK_FREQUENCY
+        dwell = self.get_setting(('DT',))
+        return period + (dwell if dwell is not None else self.SCAN_DWELL_TIME)
+
+    def _write_synchronized(self, command: str, barrier: threading.Barrier) -> bool:
+        """
+        Espera en la barrera y escribe el comando (se ejecuta en el hilo del scheduler)
+        """
+        if not self.is_connected:
+            #Sin este equipo el arranque ya no es simultáneo: se libera a los demás
+            barrier.abort()
+            self._trigger_event(self.on_error, "No conectado al SR400")
+            return False
+        try:
+            barrier.wait()
+        except threading.BrokenBarrierError:
+            self._trigger_event(self.on_error, "Arranque sincronizado cancelado")
+            return False
+        return self._write_command(command)
+
+    def _stream_reader(self, periods: int, records: queue.Queue, stop_event: threading.Event, command: str="FA"):
+        """
+        Hilo lector: convierte cada línea recibida en un CountRecord y la encola
+        """
+        period = 0
+        try:
+            while period < periods and not stop_event.is_set():
+                line = self._read_line(time.monotonic() + 0.1)
+                if line is None:
+                    continue
+                self.stats.record_reply(command, len(line) + 2, 0.0)
+                values = [float(v) for v in re.findall(r"[-+]?\d*\.?\d+(?:[eE][-+]?\d+)?", line)]
+                if not values:
+                    continue
+                if command == "FB":
+                    record = CountRecord(period, math.nan, values[0])
+                else:
+                    record = CountRecord(period, values[0], math.nan)
+                period += 1
+                #Cola acotada: si el consumidor se atrasa se espera sin perder datos
+                while not stop_event.is_set():
+                    try:
+                        records.put(record, timeout=0.1)
+                        break
+                    except queue.Full:
+                        pass
+        except Exception as e:
+            self._trigger_event(self.on_error, f"Error en streaming: {str(e)}")
+        finally:
+            #Marca de fin para el consumidor
+            while not stop_event.is_set():
+                try:
+                    records.put(None, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+
+    #-----Estadísticas ------
+    def get_command_stats(self) -> dict:
+        """Uso del enlace por mnemónico (ver CommandStats.snapshot)"""
+        return self.stats.snapshot()
+
+    def get_link_usage(self) -> float:
+        """Fracción del ancho de banda serial usada desde el último reset de estadísticas"""
+        return self.stats.link_usage(self.baudrate)
+
+    def reset_command_stats(self):
+        self.stats.reset()
+
     #-----Monitoreo en segundo plano ------
     def start_monitoring(self, interval: float=1.0):
         """
@@ -290,7 +1276,7 @@ class SR400:
         """
         if not self.monitoring:
             self.monitoring = True
-            self.monitor_thread = threading.Thread(target=self._monitor_loop,args=(interval,),deamon=True)
+            self.monitor_thread = threading.Thread(target=self._monitor_loop,args=(interval,),daemon=True)
             self.monitor_thread.start()
             
     def stop_monitoring(self):
@@ -307,7 +1293,8 @@ class SR400:
         """
         while self.monitoring and self.is_connected:
             try:
-                status = self.get_status()
+                with self.priority(CommandPriority.STATUS):
+                    status = self.get_status()
                 self._trigger_event(self.on_status_changed, status)
             except Exception as e:
                 self._trigger_event(self.on_error, f"Error en monitoreo: {str(e)}")
@@ -324,12 +1311,28 @@ class SR400:
             count_rate={
                 'A': self.get_count_rate('A'),
                 'B': self.get_count_rate('B'),},
-            gate_settings={},
+            gate_settings=self._cached_gate_settings(),
             scan_positions=self.get_scan_positions(),
             is_counting=self.is_counting
             )
         return status
     
+    def _cached_gate_settings(self) -> dict:
+        """
+        Ajustes de las puertas según la copia local
+        """
+        with self._settings_lock:
+            settings = dict(self._settings)
+        gates = {}
+        for channel in GateChannel:
+            gate = {}
+            for mnemonic, name in (('GM', 'mode'), ('GW', 'width'), ('GD', 'delay')):
+                cached = settings.get((mnemonic, channel.value))
+                if cached is not None:
+                    gate[name] = cached.value
+            gates[channel.name] = gate
+        return gates
+
     def get_scan_positions(self) -> Optional[int]:
         """
         Obtiene poisción actual del scan
@@ -341,37 +1344,23 @@ class SR400:
             return None
         
     #-----Configuarción por defecto------
-    def set_default_configuration(self) -> bool:
+    def apply_configuration(self, configure: Callable[['SR400'], None], name: str="configuración") -> bool:
         """
-        Configura valores por defecto según manual
+        Aplica un preset: los setters llamados por configure se envían en un solo lote
         """
         try:
-            #Configurar discriminadores
-            for channel in [DiscriminatorChannel.A, DiscriminatorChannel.B, DiscriminatorChannel.T]:
-                self.set_discriminator_slope(channel, DiscriminatorSlope.FALL)
-                self.set_discriminator_mode(channel, DiscriminatorMode.FIXED)
-                self.set_discriminator_level(channel, -0.010) # -10mV
-
-            #Configurar puertas
-            for channel in [GateChannel.A, GateChannel.B]:
-                self.set_gate_mode(channel, GateMode.CW)
-                self.set_gate_width(channel, 0.000) 
-                self.set_gate_delay(channel, 5e-9) # 5 ns
-                
-            #configurar contadores
-            self.set_count_mode(CountMode.A_B)
-            self.set_input_source(DiscriminatorChannel.A, InputSource.INP1)
-            self.set_input_source(DiscriminatorChannel.B, InputSource.INP2)
-            self.set_input_source(DiscriminatorChannel.T, InputSource.MHZ_10)
-
-            #Tiempos de medición
-            self.set_dwell_time(1.0)
-            self.set_scan_periods(1)
-
-            return True
+            with self.batch() as batch:
+                configure(self)
+            return batch.ok
         except Exception as e:
-            self._trigger_event(self.on_error, f"Error configurando por defecto: {str(e)}")
+            self._trigger_event(self.on_error, f"Error aplicando {name}: {str(e)}")
             return False
+
+    def set_default_configuration(self) -> bool:
+        """
+        Configura valores por defecto según manual
+        """
+        return self.apply_configuration(_default_configuration, "configuración por defecto")
             
     def set_remote_mode(self, mode: RemoteMode) -> bool:
         """
@@ -383,6 +1372,7 @@ class SR400:
         """
         Resetea intrumento a configuración por defecto
         """
+        self.invalidate_settings()
         return self.send_command("RC 0")
     
     #-----Event Handling------
@@ -407,7 +1397,7 @@ class SR400:
 class SR400Simulator:
     """Simulador del SR400 para desarrollo sin hardware"""
 
-    def __init__(self):
+    def __init__(self, seed: Optional[int]=None):
         self.is_connected = True
         self.is_counting = False
         self.port = "SIMULADOR"
@@ -419,6 +1409,12 @@ class SR400Simulator:
         }
         self.count_rates = {'A': 1250.5, 'B': 980.3}
 
+        #Modelo de la curva S simulada (sigmoide + ruido Poisson)
+        self.rng = np.random.default_rng(seed)
+        self.scurve_center = 0.0
+        self.scurve_width = 0.05
+        self.scurve_max_rate = 1500.0
+
         self.on_data_received = None
         self.on_error = None
         self.on_status_changed = None
@@ -446,8 +1442,13 @@ class SR400Simulator:
     def send_command(self, command: str, wait_time=0.1):
         print(f"Simulador comando enviado: {command}")
         return True
+
+    @contextmanager
+    def priority(self, level: CommandPriority):
+        #Sin puerto compartido no hay nada que priorizar
+        yield
     
-    def query(self, command: str, wait_time=0.2):
+    def query(self, command: str, timeout=None):
         response = "SIMULATED_RESPONSE"
         if self.on_data_received:
             self.on_data_received(response)
@@ -458,7 +1459,7 @@ class SR400Simulator:
         print(f"Simulador: Nivel del discriminador {channel.name} establecido a {voltage} V")
         return True
     
-    def get_discriminator_level(self, channel: DiscriminatorChannel):
+    def get_discriminator_level(self, channel: DiscriminatorChannel, refresh=False):
         return self.discriminator_levels[channel]
     
     def get_count_rate(self, counter='A'):
@@ -506,6 +1507,16 @@ class SR400Simulator:
         print("Simulador: Configuración por defecto aplicada")
         return True
     
+    def get_command_stats(self):
+        #Sin enlace serial no hay estadísticas de comandos
+        return {}
+
+    def get_link_usage(self):
+        return 0.0
+
+    def reset_command_stats(self):
+        pass
+
     def stop_monitoring(self):
         pass
 
@@ -527,131 +1538,559 @@ class SR400Simulator:
 
         return SimulatedStatus()
     
-    def measure_s_curve(self, channel, start_v, end_v, steps, dwell_time=0.5, progress_callback=None):
+    def expected_rates(self, thresholds, center=None, width=None, max_rate=None) -> np.ndarray:
+        """Tasas sin ruido del modelo de curva S; forma (curvas, puntos)"""
+        thresholds = np.asarray(thresholds, dtype=float)
+        center = np.reshape(self.scurve_center if center is None else center, (-1, 1))
+        width = np.reshape(self.scurve_width if width is None else width, (-1, 1))
+        max_rate = np.reshape(self.scurve_max_rate if max_rate is None else max_rate, (-1, 1))
+
+        #Sigmoide estable numéricamente: 1/(1+e^-x) = (1+tanh(x/2))/2
+        return max_rate * 0.5 * (1.0 + np.tanh((thresholds - center) / (2.0 * width)))
+
+    def simulate_s_curves(self, thresholds, dwell_time=0.5, n_curves=None,
+                          center=None, width=None, max_rate=None) -> np.ndarray:
         """
-        Simular medición de curva S - genera datos realistas
+        Genera n_curves curvas S en una sola pasada de NumPy (sigmoide + ruido Poisson).
+        center, width y max_rate aceptan escalares o arreglos; sin n_curves, el número
+        de curvas sale de la forma de esos parámetros.
+        Devuelve un arreglo (n_curves, len(thresholds)) de tasas en Hz.
+        """
+        thresholds = np.asarray(thresholds, dtype=float)
+        rates = self.expected_rates(thresholds, center, width, max_rate)
+        if n_curves is None:
+            n_curves = rates.shape[0]
+        rates = np.broadcast_to(rates, (n_curves, thresholds.size))
+        counts = self.rng.poisson(rates * dwell_time)
+        return counts / dwell_time
+
+    def simulate_early_stop(self, thresholds, control: DwellControl) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Dwell con parada temprana para todos los puntos a la vez: conteos Poisson por
+        rebanada, acumulados hasta cumplir el criterio de control.
+        Devuelve (tasas en Hz, dwell de cada punto).
+        """
+        thresholds = np.asarray(thresholds, dtype=float)
+        rates = self.expected_rates(thresholds)[0]
+        n_slices = max(1, int(math.ceil(control.max_dwell / control.slice_time)))
+        elapsed = control.slice_time * np.arange(1, n_slices + 1)
+        elapsed[-1] = control.max_dwell
+        counts = np.cumsum(self.rng.poisson(rates[:, None] * np.diff(elapsed, prepend=0.0)), axis=1)
+
+        done = (elapsed >= control.min_dwell) & (counts >= control.target_counts)
+        done[:, -1] = True
+        stop = np.argmax(done, axis=1)
+        dwells = elapsed[stop]
+        return counts[np.arange(len(thresholds)), stop] / dwells, dwells
+
+    def measure_s_curve(self, channel, start_v, end_v, steps, dwell_time=0.5, progress_callback=None,
+                        fast=False, progress_every=None, adaptive=False, dwell_control=None, point_callback=None):
+        """
+        Simular medición de curva S - genera datos realistas.
+        Con fast=True la curva completa se calcula de una vez, sin esperas, y el progreso
+        se reporta cada progress_every puntos. adaptive=True usa adaptive_s_curve y
+        dwell_control simula la parada temprana por error objetivo.
         """
         print(f"📊 SIMULADOR: Iniciando curva S en {channel}")
         print(f"   - Rango: {start_v}V a {end_v}V")
         print(f"   - Puntos: {steps}, Tiempo: {dwell_time}s")
     
-        import numpy as np
-        import time
-    
-        # Generar thresholds
         thresholds = np.linspace(start_v, end_v, steps)
+        self._scurve_cancel = False
+
+        def sample(points):
+            #Tasas y dwell usado por punto (fijo o con parada temprana)
+            if dwell_control is not None:
+                return self.simulate_early_stop(points, dwell_control)
+            return self.simulate_s_curves(points, dwell_time)[0], np.full(len(points), dwell_time)
+
+        def measure_point(threshold):
+            rates, dwells = sample([threshold])
+            if not fast:
+                time.sleep(dwells[0] * 0.1)  # Más rápido en simulación
+            return rates[0]
+
+        if adaptive:
+            if dwell_control is not None:
+                uncertainty = dwell_control.uncertainty
+            else:
+                uncertainty = lambda rate: math.sqrt(max(rate, 1.0) / dwell_time)
+            result = adaptive_s_curve(measure_point, start_v, end_v, steps,
+                                      uncertainty=uncertainty,
+                                      progress_callback=progress_callback,
+                                      should_cancel=lambda: self._scurve_cancel,
+                                      point_callback=point_callback)
+            print("✅ SIMULADOR: Curva S completada")
+            return result
+
+        if fast:
+            count_rates, dwells = sample(thresholds)
+            if point_callback:
+                for threshold, count_rate in zip(thresholds, count_rates):
+                    point_callback(threshold, count_rate)
+            if progress_callback:
+                every = progress_every or max(1, steps // 20)
+                for i in range(every - 1, steps, every):
+                    progress_callback((i + 1) / steps, f"Punto {i+1}/{steps}: {thresholds[i]:.3f}V")
+                if steps % every:
+                    progress_callback(1.0, f"Punto {steps}/{steps}: {thresholds[-1]:.3f}V")
+            print(f"✅ SIMULADOR: Curva S completada (tiempo de conteo {np.sum(dwells):.1f}s)")
+            return thresholds, count_rates
+
         count_rates = []
-    
-        # Simular curva S típica (función sigmoide)
         for i, threshold in enumerate(thresholds):
-            # Simular tiempo de medición
-            time.sleep(dwell_time * 0.1)  # Más rápido en simulación
-        
-            # Generar curva S realista
-            # Centro de la curva alrededor de 0V
-            center = 0.0
-            # Ancho de la transición
-            width = 0.05
-            # Tasa máxima de conteo
-            max_rate = 1500
-        
-            # Función sigmoide para curva S
-            rate = max_rate / (1 + np.exp(-(threshold - center) / width))
-        
-            # Agregar algo de ruido
-            noise = np.random.normal(0, 50)
-            rate = max(0, rate + noise)
-        
-            count_rates.append(rate)
+            # Punto de la curva S con ruido Poisson (incluye el tiempo de medición simulado)
+            count_rates.append(measure_point(threshold))
+            if point_callback:
+                point_callback(threshold, count_rates[-1])
         
             # Callback de progreso
-            if progress_callback:
+            if progress_callback and (progress_every is None or (i + 1) % progress_every == 0 or i + 1 == steps):
                 progress = (i + 1) / steps
                 progress_callback(progress, f"Punto {i+1}/{steps}: {threshold:.3f}V")
         
             # Simular cancelación
-            if hasattr(self, '_scurve_cancel') and self._scurve_cancel:
+            if self._scurve_cancel:
                 break
     
         print("✅ SIMULADOR: Curva S completada")
-        return np.array(thresholds), np.array(count_rates)
+        return thresholds[:len(count_rates)], np.array(count_rates)
+
+#------Presets de configuración ------
+def _default_configuration(sr400: SR400):
+    """
+    Valores por defecto según manual
+    """
+    #Configurar discriminadores
+    for channel in [DiscriminatorChannel.A, DiscriminatorChannel.B, DiscriminatorChannel.T]:
+        sr400.set_discriminator_slope(channel, DiscriminatorSlope.FALL)
+        sr400.set_discriminator_mode(channel, DiscriminatorMode.FIXED)
+        sr400.set_discriminator_level(channel, -0.010) # -10mV
+
+    #Configurar puertas
+    for channel in [GateChannel.A, GateChannel.B]:
+        sr400.set_gate_mode(channel, GateMode.CW)
+        sr400.set_gate_width(channel, 0.000) 
+        sr400.set_gate_delay(channel, 5e-9) # 5 ns
+        
+    #configurar contadores
+    sr400.set_count_mode(CountMode.A_B)
+    sr400.set_input_source(DiscriminatorChannel.A, InputSource.INP1)
+    sr400.set_input_source(DiscriminatorChannel.B, InputSource.INP2)
+    sr400.set_input_source(DiscriminatorChannel.T, InputSource.MHZ_10)
+
+    #Tiempos de medición
+    sr400.set_dwell_time(1.0)
+    sr400.set_scan_periods(1)
+
+class _CommandRecorder:
+    """
+    Ejecuta los setters de SR400 sin puerto ni scheduler y guarda los comandos que
+    producen (mismas validaciones y formato que el cliente real)
+    """
+    def __init__(self):
+        self.commands: List[str] = []
+        self.count_period = None
+        self.on_error = None
+
+    def send_command(self, command: str, wait_time: float=0.0) -> bool:
+        self.commands.append(command)
+        return True
+
+    def _send_setting(self, key: Tuple, value: float, command: str) -> bool:
+        return self.send_command(command)
+
+    def __getattr__(self, name: str):
+        #Métodos y constantes de SR400 aplicados a este objeto
+        attribute = getattr(SR400, name)
+        return attribute.__get__(self) if callable(attribute) else attribute
+
+def preset_commands(configure: Callable[[SR400], None]) -> List[str]:
+    """
+    Comandos que produce un preset, sin enviarlos (útil para otros transportes)
+    """
+    recorder = _CommandRecorder()
+    configure(recorder)
+    return recorder.commands
 
 #------Funciones de alto nivel ------
+#Resolución del nivel del discriminador (0.1 mV)
+LEVEL_RESOLUTION = 1e-4
+#Paso máximo por periodo del discriminador en modo SCAN (DY)
+SCAN_STEP_LIMIT = 0.02
+
+def adaptive_s_curve(measure_point: Callable[[float], float],
+                     start_v: float,
+                     end_v: float,
+                     steps: int,
+                     coarse_steps: Optional[int] = None,
+                     uncertainty: Optional[Callable[[float], float]] = None,
+                     progress_callback: Optional[Callable] = None,
+                     should_cancel: Optional[Callable[[], bool]] = None,
+                     point_callback: Optional[Callable[[float, float], None]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Barrido adaptativo: mide una malla gruesa y reparte el resto de los steps puntos
+    en los intervalos donde la curva cambia más (pendiente y curvatura).
+
+    measure_point(threshold) devuelve la tasa medida; uncertainty(rate) su error
+    estadístico, que se descuenta para no perseguir ruido en las mesetas.
+    """
+    coarse_steps = coarse_steps or max(5, steps // 4)
+    coarse_steps = min(coarse_steps, steps)
+    thresholds: List[float] = []
+    rates: List[float] = []
+
+    def measure(threshold: float) -> bool:
+        rate = measure_point(threshold)
+        thresholds.append(threshold)
+        rates.append(rate if rate is not None else np.nan)
+        if point_callback:
+            point_callback(threshold, rates[-1])
+        if progress_callback:
+            progress_callback(len(thresholds) / steps, f"Punto {len(thresholds)}/{steps}: {threshold:.3f}V")
+        return not (should_cancel and should_cancel())
+
+    for threshold in np.round(np.linspace(start_v, end_v, coarse_steps) / LEVEL_RESOLUTION) * LEVEL_RESOLUTION:
+        if not measure(float(threshold)):
+            return _sorted_curve(thresholds, rates)
+
+    while len(thresholds) < steps:
+        x, y = _sorted_curve(thresholds, rates)
+        y = np.nan_to_num(y)
+        span_y = max(np.ptp(y), 1e-12)
+        span_x = max(abs(end_v - start_v), 1e-12)
+
+        #Cambio en cada intervalo y curvatura en sus extremos, descontando el ruido esperado
+        sigma = np.array([uncertainty(v) for v in y]) if uncertainty is not None else np.zeros(len(y))
+        dy = np.maximum(0.0, np.abs(np.diff(y)) - np.hypot(sigma[:-1], sigma[1:]))
+        curvature = np.zeros(len(y))
+        if len(y) > 2:
+            curvature[1:-1] = np.maximum(0.0, np.abs(np.diff(y, 2)) - 2 * sigma[1:-1])
+        bend = np.maximum(curvature[:-1], curvature[1:]) / span_y
+        widths = np.diff(x)
+        #Longitud de arco normalizada (el eje x pesa menos): los intervalos planos o ya divididos pierden peso
+        score = np.hypot(0.3 * widths / span_x, dy / span_y) * (1.0 + bend)
+        #No se pueden partir intervalos por debajo de la resolución del instrumento
+        score[widths < 2 * LEVEL_RESOLUTION] = -1.0
+        best = int(np.argmax(score))
+        if score[best] < 0:
+            break
+        midpoint = round((x[best] + x[best + 1]) / 2 / LEVEL_RESOLUTION) * LEVEL_RESOLUTION
+        if not measure(midpoint):
+            break
+
+    return _sorted_curve(thresholds, rates)
+
+def _sorted_curve(thresholds: List[float], rates: List[float]) -> Tuple[np.ndarray, np.ndarray]:
+    order = np.argsort(thresholds, kind='stable')
+    return np.asarray(thresholds)[order], np.asarray(rates, dtype=float)[order]
+
+def count_until(self, control: DwellControl, counter: str='A') -> Tuple[float, float, float]:
+    """
+    Cuenta hasta alcanzar el error relativo objetivo; devuelve (tasa en Hz, conteos, dwell real)
+    """
+    self.reset_count()
+    self.start_count()
+    start = time.monotonic()
+    counts, elapsed = 0.0, 0.0
+    try:
+        while True:
+            time.sleep(max(0.0, min(control.slice_time, start + control.max_dwell - time.monotonic())))
+            #Lectura del conteo en curso sin detener el contador; el instante de la lectura
+            #se toma a mitad del query para descontar la latencia del enlace
+            sent = time.monotonic()
+            reading = self.get_count_rate(counter)
+            elapsed = (sent + time.monotonic()) / 2 - start
+            if reading is not None:
+                counts = reading
+            if control.finished(counts, elapsed):
+                break
+    finally:
+        self.stop_count()
+    return counts / elapsed if elapsed > 0 else 0.0, counts, elapsed
+
+def scan_step(start_v: float, end_v: float, steps: int) -> Optional[float]:
+    """
+    Paso por periodo del barrido en modo SCAN, con la resolución de 0.1 mV del SR400;
+    None si el instrumento no puede hacer ese barrido (paso nulo o mayor a 0.02 V)
+    """
+    if steps < 2:
+        return None
+    step_v = round((end_v - start_v) / (steps - 1), 4)
+    if step_v == 0 or abs(step_v) > SCAN_STEP_LIMIT:
+        return None
+    return step_v
+
+def _ensure_count_period(self, seconds: float) -> Optional[float]:
+    """
+    El periodo del contador T debe cubrir el dwell máximo para que el conteo no se detenga antes.
+    Se pide el doble del dwell: el CH llega tarde por la latencia del enlace y, con NP > 1,
+    un periodo que ya terminó empieza otro y XA leería ese conteo parcial.
+    Devuelve el periodo anterior si hubo que cambiarlo (para _restore_count_period)
+    """
+    if not hasattr(self, 'set_count_period') or (self.count_period is not None and self.count_period >= 2 * seconds):
+        return None
+    previous = self.count_period
+    if previous is None:
+        #Periodo desconocido: se lee el preset de T para poder restaurarlo
+        ticks = self.get_setting(('CP', DiscriminatorChannel.T.value))
+        previous = ticks / self.CLOCK_FREQUENCY if ticks else None
+    self.set_count_period(2 * seconds)
+    return previous
+
+def _restore_count_period(self, previous: Optional[float]):
+    """Vuelve al periodo que había antes de _ensure_count_period"""
+    if previous is not None and self.is_connected:
+        self.set_count_period(previous)
+
+def _measure_point(self, channel: DiscriminatorChannel, threshold_v: float, dwell_time: float,
+                   dwell_control: Optional[DwellControl]=None) -> Optional[float]:
+    """
+    Un punto del barrido desde el host: fijar threshold, contar dwell_time y leer A.
+    Devuelve la tasa en Hz, igual que el barrido por hardware (con dwell_control se
+    cuenta hasta el error objetivo)
+    """
+    self.set_discriminator_level(channel, threshold_v)
+    time.sleep(0.05)  # Tiempo de espera para estabilización
+
+    if dwell_control is not None:
+        return count_until(self, dwell_control)[0]
+
+    self.reset_count()
+    self.start_count()
+    time.sleep(dwell_time)
+    self.stop_count()
+
+    counts = self.get_count_rate('A')  # Asumiendo canal A
+    return counts / dwell_time if counts is not None else None
+
+#Intentos de un punto de la curva S interrumpido por una reconexión
+POINT_ATTEMPTS = 3
+
+def _measure_point_supervised(self, channel: DiscriminatorChannel, threshold_v: float, dwell_time: float,
+                              dwell_control: Optional[DwellControl]=None) -> Optional[float]:
+    """
+    _measure_point que se repite si falló la lectura o hubo una reconexión durante el
+    punto (su dwell ya no es confiable); None si el enlace no se recuperó
+    """
+    for _ in range(POINT_ATTEMPTS):
+        reconnections = self.reconnections
+        rate = _measure_point(self, channel, threshold_v, dwell_time, dwell_control)
+        if not self.is_connected:
+            return None
+        if rate is not None and self.reconnections == reconnections:
+            return rate
+    return None
+
 def measure_s_curve(self,
                     channel: DiscriminatorChannel,
                     start_v: float,
                     end_v: float,
                     steps: int,
                     dwell_time: float = 0.5,
-                    progress_callback: Optional[Callable] = None) -> Tuple[np.ndarray, np.ndarray]:
+                    progress_callback: Optional[Callable] = None,
+                    adaptive: bool = False,
+                    dwell_control: Optional[DwellControl] = None,
+                    point_callback: Optional[Callable[[float, float], None]] = None) -> Tuple[np.ndarray, np.ndarray]:
     """
     Realiza una medición de S-Curve variando el nivel del discriminador
+    (adaptive=True concentra los puntos en la transición; dwell_control fija el
+    error relativo de cada punto en lugar de un dwell_time fijo).
+    Un punto que sigue sin lectura tras POINT_ATTEMPTS intentos, con el enlace activo,
+    queda como NaN; si se pierde el enlace la curva termina en el último punto bueno.
     """
     if not self.is_connected:
         raise RuntimeError("Dispositivo no conectado")
     
-    thresholds = np.linspace(start_v, end_v, steps)
-    count_rates = []
-    
     print(f"Iniciando medición de curva S: {start_v}V a {end_v}V, {steps} puntos ")
 
     #Guardar configuración actual
     original_threshold = self.get_discriminator_level(channel)
+    self._scurve_cancel = False
+    #El conteo de cada punto termina con CH, no con el fin del periodo del contador T
+    original_period = _ensure_count_period(self, dwell_control.max_dwell if dwell_control is not None else dwell_time)
 
     try: 
+        if adaptive:
+            if dwell_control is not None:
+                uncertainty = dwell_control.uncertainty
+            else:
+                #Error Poisson de una tasa medida durante dwell_time
+                uncertainty = lambda rate: math.sqrt(max(rate, 1.0) / dwell_time)
+            #Sin enlace el barrido se detiene; el punto fallido queda como NaN
+            return adaptive_s_curve(
+                lambda threshold_v: _measure_point_supervised(self, channel, threshold_v, dwell_time, dwell_control),
+                start_v, end_v, steps,
+                uncertainty=uncertainty,
+                progress_callback=progress_callback,
+                should_cancel=lambda: self._scurve_cancel or not self.is_connected,
+                point_callback=point_callback)
+
+        thresholds = np.linspace(start_v, end_v, steps)
+        count_rates = []
         for i, threshold_v in enumerate(thresholds):
-            #Establecer threshold
-            self.set_dicriminator_level(channel, threshold_v)
-            time.sleep(0.05)  # Tiempo de espera para estabilización
-
-            #Realizar medición
-            self.reset_count()
-            self.start_count()
-            time.sleep(dwell_time)
-            self.stop_count()
-            
-            #Leer resultado
-            count_rate = self.get_count_rate('A')  # Asumiendo canal A
-            count_rates.append(count_rate if count_rate is not None else 0.0)
+            count_rate = _measure_point_supervised(self, channel, threshold_v, dwell_time, dwell_control)
+            if count_rate is None and not self.is_connected:
+                #Se conservan los puntos buenos en lugar de llenar el resto con ceros
+                self._trigger_event(self.on_error, f"Curva S interrumpida en el punto {i+1}/{steps}: enlace perdido")
+                break
+            #Un punto sin lectura queda como NaN (el ajuste lo ignora)
+            count_rates.append(count_rate if count_rate is not None else np.nan)
+            if point_callback:
+                point_callback(threshold_v, count_rates[-1])
             
             print(f"Punto {i+1}/{steps}: Threshold={threshold_v:.4f}V -> {count_rates[-1]:.1f} Hz")
+            if progress_callback:
+                progress_callback((i + 1) / steps, f"Punto {i+1}/{steps}: {threshold_v:.3f}V")
+            if self._scurve_cancel:
+                break
 
-            #Restaurar threshold original
+        return np.array(thresholds[:len(count_rates)]), np.array(count_rates)
+    
+    finally:
+        #Restaurar threshold y periodo originales
+        if original_threshold is not None:
             self.set_discriminator_level(channel, original_threshold)
+        _restore_count_period(self, original_period)
 
-            return np.array(thresholds), np.array(count_rates)
-    
-    except Exception as e:
-        #Restaurar threshold original en caso de error
-        self.set_discriminator_level(channel, original_threshold)
-        raise e
+def measure_s_curve_scan(self,
+                         channel: DiscriminatorChannel,
+                         start_v: float,
+                         end_v: float,
+                         steps: int,
+                         dwell_time: float = 0.5,
+                         progress_callback: Optional[Callable] = None,
+                         counter: str = 'A',
+                         point_callback: Optional[Callable[[float, float], None]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Curva S con el discriminador en modo SCAN: el SR400 avanza el threshold en cada
+    periodo y todos los puntos se leen en una sola transferencia al final
+    """
+    if not self.is_connected:
+        raise RuntimeError("Dispositivo no conectado")
+    if not 2 <= steps <= 2000:
+        raise ValueError("El barrido por hardware admite de 2 a 2000 puntos")
+
+    #El instrumento solo acepta pasos con resolución de 0.1 mV y de a lo sumo 0.02 V
+    step_v = scan_step(start_v, end_v, steps)
+    if step_v is None:
+        raise ValueError(f"El paso del barrido debe estar entre 0.1 mV y {SCAN_STEP_LIMIT} V "
+                         f"(use el barrido desde el host)")
+    thresholds = start_v + step_v * np.arange(steps)
+
+    print(f"Iniciando curva S por hardware: {start_v}V a {end_v}V, {steps} puntos ")
+
+    original_threshold = self.get_discriminator_level(channel)
+    #Ajustes que cambia el barrido, para dejarlos como estaban (en el equipo y en la copia local)
+    original_source = self.get_setting(('CI', DiscriminatorChannel.T.value))
+    original_ticks = self.get_setting(('CP', DiscriminatorChannel.T.value))
+    original_dwell = self.get_setting(('DT',))
+    original_periods = self.get_setting(('NP',))
+    original_step = self.get_setting(('DY', channel.value))
+    self._scurve_cancel = False
+
+    try:
+        with self.batch() as batch:
+            #Un setter que rechaza su parámetro no encola nada: el lote saldría sin él
+            accepted = all([
+                self.set_input_source(DiscriminatorChannel.T, InputSource.MHZ_10),
+                self.set_count_period(dwell_time),
+                self.set_dwell_time(self.SCAN_DWELL_TIME),
+                self.set_scan_periods(steps),
+                self.set_discriminator_mode(channel, DiscriminatorMode.SCAN),
+                self.set_discriminator_level(channel, start_v),
+                self.set_discriminator_scan_step(channel, step_v),
+            ])
+            if not accepted:
+                raise RuntimeError("Parámetros del barrido fuera de rango")
+        if not batch.ok:
+            raise RuntimeError("No se pudo programar el barrido del discriminador")
+
+        self.reset_count()
+        self.start_count()
+
+        #Solo se consulta la posición del scan para reportar progreso
+        total_time = steps * (dwell_time + self.SCAN_DWELL_TIME)
+        deadline = time.monotonic() + total_time + self.timeout
+        poll_interval = min(max(dwell_time, 0.1), 1.0)
+        position = 0
+        reconnections = self.reconnections
+        while position < steps and time.monotonic() < deadline and self.is_connected:
+            time.sleep(poll_interval)
+            position = self.get_scan_positions() or position
+            if progress_callback:
+                progress_callback(min(position, steps) / steps, f"Punto {position}/{steps}")
+            if self._scurve_cancel:
+                break
+            if self.reconnections != reconnections:
+                #El scan siguió en el instrumento durante la caída: el plazo cuenta desde ahora
+                reconnections = self.reconnections
+                remaining = (steps - position) * (dwell_time + self.SCAN_DWELL_TIME)
+                deadline = max(deadline, time.monotonic() + remaining + self.timeout)
+        if not self.is_connected:
+            raise RuntimeError("Se perdió la conexión durante el barrido")
 
-def quick_measure(self, dewel_time: float=0.1)-> float:
-    """Medición rápida para actualizaciones en tiempo real"""
+        self.stop_count()
+        if position < steps:
+            #Cancelado o sin terminar en el plazo: solo se leen los periodos completos
+            position = self.get_scan_positions() or position
+            if not self._scurve_cancel and position < steps:
+                self._trigger_event(self.on_error, f"El barrido no terminó a tiempo ({position}/{steps} puntos)")
+        measured = min(position, steps)
+        if measured == 0:
+            raise RuntimeError("El barrido no completó ningún punto")
+        counts = self.read_stored_counts(counter, measured)
+        if (counts is None or len(counts) < measured) and self.is_connected:
+            #Lectura cortada por una reconexión: los datos siguen guardados en el instrumento
+            counts = self.read_stored_counts(counter, measured)
+        if counts is None:
+            raise RuntimeError("No se pudieron leer los datos del barrido")
+
+        count_rates = counts / (self.count_period or dwell_time)
+        if point_callback:
+            for threshold_v, count_rate in zip(thresholds, count_rates):
+                point_callback(threshold_v, count_rate)
+        print(f"✅ Curva S por hardware completada: {len(count_rates)} puntos")
+        return thresholds[:len(count_rates)], count_rates
+
+    finally:
+        #Restaurar discriminador en modo fijo, threshold original y ajustes del barrido
+        with self.batch():
+            self.set_discriminator_mode(channel, DiscriminatorMode.FIXED)
+            if original_threshold is not None:
+                self.set_discriminator_level(channel, original_threshold)
+            if original_step is not None:
+                self.set_discriminator_scan_step(channel, original_step)
+            if original_source is not None:
+                self.set_input_source(DiscriminatorChannel.T, InputSource(int(original_source)))
+            if original_ticks is not None:
+                self.set_count_period(original_ticks / self.CLOCK_FREQUENCY)
+            if original_dwell is not None:
+                self.set_dwell_time(original_dwell)
+            if original_periods is not None:
+                self.set_scan_periods(int(original_periods))
+
+def quick_measure(self, dewel_time: float=0.1, dwell_control: Optional[DwellControl]=None)-> float:
+    """Medición rápida en Hz para actualizaciones en tiempo real (dwell_control: parada por error objetivo)"""
 
     try:
+        if dwell_control is not None:
+            original_period = _ensure_count_period(self, dwell_control.max_dwell)
+            try:
+                return count_until(self, dwell_control)[0]
+            finally:
+                _restore_count_period(self, original_period)
         self.reset_count()
         self.start_count()
         time.sleep(dewel_time)
         self.stop_count()
-        return self.get_count_rate('A') or 0.0
+        return (self.get_count_rate('A') or 0.0) / dewel_time
     except:
         return 0.0
 
 def find_optimal_threshold(thresholds: np.ndarray, count_rates: np.ndarray) -> float:
     """
-    Encuentra el nivel de discriminador óptimo a partir de la S-Curve """
-    smoothed = np.convolve(count_rates, np.ones(3)/3, mode='valid')
-    derivative = np.gradient(smoothed)
-
-    #Encontar meseta (donde la derivada es cercana a cero)
-    plateau_mask = np.abs(derivative) < np.std(derivative) * 0.5
-    plateau_indices = np.where(plateau_mask)[0]
-
-    if len(plateau_indices) > 0:
-        #Ajustar índices por el suavizado
-        optimal_idx = plateau_indices[len(plateau_indices)//2] + 1
-        return thresholds[optimal_idx]
-    else:
-        #Fallback: máximo de la curva 
-        return thresholds[np.argmax(count_rates)]
\ No newline at end of file
+    Encuentra el nivel de discriminador óptimo a partir de la S-Curve
+    (ajuste sigmoide + fondo de scurve_analysis; la entrada a la meseta)
+    """
+    return optimal_threshold(thresholds, count_rates)
\ No newline at end of file
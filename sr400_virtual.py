@@ -0,0 +1,545 @@
+# sr400_virtual.py
+"""
+SR400 virtual sobre un pseudo-terminal: habla el protocolo ASCII del equipo
+para que la clase SR400 real se pueda probar y medir sin hardware
+"""
+
+import os
+import re
+import math
+import time
+import select
+import threading
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+
+#Bits del status byte (mismos que SR400.STATUS_ERROR_MASK)
+STATUS_COMMAND_ERROR = 0x10
+STATUS_PARAMETER_ERROR = 0x20
+
+#Frecuencia de la base de tiempo interna
+CLOCK_FREQUENCY = 10e6
+
+@dataclass
+class PulseSource:
+    """
+    Entrada de pulsos: tasa de conteo en función del nivel del discriminador
+    (sigmoide centrada en la altura de los pulsos + fondo constante)
+    """
+    max_rate: float = 1500.0
+    center: float = 0.0
+    width: float = 0.05
+    background: float = 0.0
+
+    def rate(self, level: float, slope: int=1) -> float:
+        #Con pendiente de bajada (FALL) la tasa crece con el nivel; con subida, al revés
+        x = (level - self.center) / self.width
+        if slope == 0:
+            x = -x
+        return self.background + self.max_rate * 0.5 * (1.0 + math.tanh(x / 2.0))
+
+class VirtualSR400:
+    """
+    Instrumento simulado detrás de un pty. El puerto de port se abre con SR400(port)
+    como si fuera el equipo real.
+
+    - Estadística de conteo Poisson con semilla (seed) reproducible
+    - response_latency: tiempo de proceso antes de cada respuesta
+    - baudrate: limita la velocidad de entrada y salida (10 bits por carácter)
+    - link: enlace simbólico estable al pty (como /dev/serial/by-id); con él, el
+      puerto sobrevive a drop_link() igual que un adaptador USB que se reconecta
+
+    Subconjunto modelado del juego de comandos del manual, con los índices desde 0
+    del equipo (0 = A, 1 = B, 2 = T; "CP 2," y "DL 0," como en el cliente C#):
+    - DL/DS/DM/DY i: nivel, pendiente (0 RISE, 1 FALL), modo (0 FIXED, 1 SCAN) y paso
+      del scan; DZ i devuelve el nivel presente. CI i: entrada de cada contador;
+      CP i (1 = B, 2 = T): preset; GM/GW/GD i (0 = A, 1 = B): puertas
+    - CM, NP, DT, NE, MI: ajustes globales. Un comando sin su valor es una consulta
+    - CS/CH/CR: iniciar, detener y resetear el conteo; NN: posición del scan;
+      XA/XB: conteo en curso; SS: status byte (se borra al leerlo); RC: reset
+    - QA/QB j: conteo almacenado del periodo j (sin j, el último completo);
+      EA/EB: todos los puntos almacenados, uno por línea, y los siguientes a medida
+      que se completan; FA/FB: inician el scan y envían A (o B) al final de cada periodo
+    """
+    #Mínimo dwell entre periodos de un scan
+    MIN_DWELL_TIME = 2e-3
+
+    def __init__(self, baudrate: int=9600, seed: Optional[int]=None, response_latency: float=0.0,
+                 inputs: Optional[dict]=None, link: Optional[str]=None):
+        self.baudrate = baudrate
+        self.link = link
+        self.seed = seed
+        self.response_latency = response_latency
+        #Fuentes por número de entrada de CI (1 = INPUT 1, 2 = INPUT 2)
+        self.inputs = inputs or {
+            1: PulseSource(max_rate=1500.0),
+            2: PulseSource(max_rate=1000.0, center=0.02),
+        }
+
+        #Conteos por periodo (deterministas con seed) y progreso dentro del periodo
+        self.rng = np.random.default_rng(seed)
+        self._thinning_rng = np.random.default_rng(None if seed is None else seed + 1)
+
+        self.port: Optional[str] = None
+        self.received: List[str] = []
+        self._master = None
+        self._slave = None
+        self._thread = None
+        self._running = False
+        self._lock = threading.RLock()
+        self._restore_timer = None
+
+        self.reset()
+
+    #-----Pseudo-terminal ------
+    def start(self) -> str:
+        """
+        Crea el pty y arranca el hilo del instrumento; devuelve el nombre del puerto
+        """
+        self._open_pty()
+        print(f"🧪 SR400 virtual en {self.port} ({self.baudrate} baud)")
+        return self.port
+
+    def stop(self):
+        """
+        Detiene el hilo y cierra el pty
+        """
+        if self._restore_timer is not None:
+            self._restore_timer.cancel()
+            self._restore_timer = None
+        self._close_pty()
+        if self.link and os.path.islink(self.link):
+            os.remove(self.link)
+
+    def drop_link(self, duration: float=1.0):
+        """
+        Simula la caída del enlace serial: el pty se cierra (el SR400 conectado recibe
+        errores de E/S) y reaparece tras duration segundos. El estado del instrumento,
+        incluido un scan en curso, se conserva.
+        """
+        self._close_pty()
+        print(f"🔌 SR400 virtual desconectado por {duration} s")
+        self._restore_timer = threading.Timer(duration, self._restore_link)
+        self._restore_timer.daemon = True
+        self._restore_timer.start()
+
+    def _restore_link(self):
+        self._restore_timer = None
+        self._open_pty()
+        print(f"🔌 SR400 virtual de nuevo en {self.port}")
+
+    def _open_pty(self):
+        import tty
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        if self.link:
+            #Reemplazo atómico del enlace para que siempre apunte al pty vigente
+            temporary = f"{self.link}.tmp"
+            if os.path.lexists(temporary):
+                os.remove(temporary)
+            os.symlink(self.port, temporary)
+            os.replace(temporary, self.link)
+            self.port = self.link
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="VirtualSR400", daemon=True)
+        self._thread.start()
+
+    def _close_pty(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self._master = self._slave = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self.stop()
+
+    def _char_time(self, n: int) -> float:
+        return n * 10 / self.baudrate if self.baudrate else 0.0
+
+    def _run(self):
+        buffer = b""
+        while self._running:
+            with self._lock:
+                self._advance()
+                timeout = self._time_to_next_event()
+            try:
+                ready, _, _ = select.select([self._master], [], [], min(timeout, 0.05))
+            except (OSError, ValueError):
+                break
+            if not ready:
+                continue
+            try:
+                chunk = os.read(self._master, 4096)
+            except OSError:
+                break
+            if not chunk:
+                continue
+            #El equipo no puede recibir más rápido que la línea serial
+            time.sleep(self._char_time(len(chunk)))
+            buffer += chunk
+            while True:
+                match = re.search(rb"[\r\n]", buffer)
+                if not match:
+                    break
+                line, buffer = buffer[:match.start()], buffer[match.end():]
+                line = line.decode('ascii', errors='ignore').strip()
+                if line:
+                    self._process_line(line)
+
+    def _write(self, text: str):
+        data = (text + "\r\n").encode('ascii')
+        if self.response_latency:
+            time.sleep(self.response_latency)
+        time.sleep(self._char_time(len(data)))
+        try:
+            os.write(self._master, data)
+        except OSError:
+            pass
+
+    #-----Estado del instrumento ------
+    def reset(self):
+        """
+        Valores de encendido del SR400
+        """
+        with self._lock:
+            self.settings = {
+                'CM': 0, 'NP': 1, 'DT': self.MIN_DWELL_TIME, 'NE': 0, 'MI': 0,
+                'CI0': 1, 'CI1': 2, 'CI2': 0,
+                'CP1': 1e7, 'CP2': 1e7,
+            }
+            for channel in (0, 1, 2):
+                self.settings.update({f'DL{channel}': 0.0, f'DY{channel}': 0.0,
+                                      f'DM{channel}': 0, f'DS{channel}': 1})
+            for channel in (0, 1):
+                self.settings.update({f'GM{channel}': 0, f'GW{channel}': 0.0, f'GD{channel}': 0.0})
+            self.status = 0
+            self._stream = None
+            self._clear_scan()
+
+    def _clear_scan(self):
+        self.counting = False
+        self.position = 0
+        #Contadores A (0) y B (1)
+        self.data = {0: [], 1: []}
+        self.current = {0: 0, 1: 0}
+        self._period_totals = None
+        self._period_start = None
+        self._period_elapsed = 0.0
+        self._next_period_at = None
+        self._last_update = None
+
+    @property
+    def count_period(self) -> float:
+        """
+        Duración de un periodo: preset del contador T con la base de 10 MHz
+        """
+        return self.settings['CP2'] / CLOCK_FREQUENCY
+
+    def level(self, channel: int) -> float:
+        """
+        Nivel efectivo del discriminador (en modo SCAN avanza DY por periodo)
+        """
+        level = self.settings[f'DL{channel}']
+        if self.settings[f'DM{channel}'] == 1:
+            level += self.settings[f'DY{channel}'] * self.position
+        return max(-0.3, min(0.3, level))
+
+    def _counter_rate(self, counter: int) -> float:
+        source = self.settings[f'CI{counter}']
+        if source == 0:
+            return CLOCK_FREQUENCY
+        if source not in self.inputs:
+            return 0.0
+        #Cada entrada se compara con el discriminador del contador que la usa
+        return self.inputs[source].rate(self.level(counter), self.settings[f'DS{counter}'])
+
+    def _start_period(self, now: float):
+        period = self.count_period
+        totals = {}
+        for counter in (0, 1):
+            rate = self._counter_rate(counter)
+            #La base de tiempo no tiene ruido de conteo
+            if self.settings[f'CI{counter}'] == 0:
+                totals[counter] = int(round(rate * period))
+            else:
+                totals[counter] = int(self.rng.poisson(rate * period))
+        self._period_totals = totals
+        self._period_start = now
+        self._period_elapsed = 0.0
+        self._last_update = now
+        self.current = {0: 0, 1: 0}
+
+    def _advance(self, now: Optional[float]=None):
+        """
+        Avanza el reloj del instrumento: completa periodos y actualiza los conteos en curso
+        """
+        if not self.counting:
+            return
+        now = time.monotonic() if now is None else now
+        period = self.count_period
+        while self.counting:
+            if self._period_totals is None:
+                #Dwell entre periodos
+                if now < self._next_period_at:
+                    return
+                self._start_period(self._next_period_at)
+            end = self._last_update + (period - self._period_elapsed)
+            if now < end:
+                self._accumulate(now, period)
+                return
+            self._finish_period(end)
+
+    def _accumulate(self, now: float, period: float):
+        """
+        Conteo parcial: los pulsos pendientes del periodo se reparten uniformemente en el tiempo
+        """
+        remaining_time = period - self._period_elapsed
+        dt = now - self._last_update
+        if remaining_time > 0 and dt > 0:
+            fraction = min(1.0, dt / remaining_time)
+            for counter in (0, 1):
+                pending = self._period_totals[counter] - self.current[counter]
+                self.current[counter] += int(self._thinning_rng.binomial(pending, fraction))
+        self._period_elapsed += max(0.0, dt)
+        self._last_update = now
+
+    def _finish_period(self, end: float):
+        for counter in (0, 1):
+            self.current[counter] = self._period_totals[counter]
+            self.data[counter].append(self._period_totals[counter])
+        self.position += 1
+        self._period_totals = None
+        if self._stream is not None:
+            self._write(str(self.current[self._stream]))
+        if self.position >= self.settings['NP']:
+            self.counting = False
+            self._stream = None
+        else:
+            self._next_period_at = end + self.settings['DT']
+
+    def _time_to_next_event(self) -> float:
+        if not self.counting:
+            return 0.05
+        if self._period_totals is None:
+            return max(0.0, self._next_period_at - time.monotonic())
+        end = self._last_update + (self.count_period - self._period_elapsed)
+        return max(0.0, end - time.monotonic())
+
+    def _start_count(self):
+        now = time.monotonic()
+        if self.position >= self.settings['NP']:
+            self._clear_scan()
+        if self.counting:
+            return
+        self.counting = True
+        if self._period_totals is None:
+            self._start_period(now)
+        else:
+            #Reanuda el periodo detenido con CH
+            self._last_update = now
+
+    def _stop_count(self):
+        if self.counting:
+            self._advance()
+            self.counting = False
+
+    #-----Intérprete de comandos ------
+    def _process_line(self, line: str):
+        for command in line.split(';'):
+            command = command.strip()
+            if not command:
+                continue
+            self.received.append(command)
+            with self._lock:
+                self._advance()
+                reply = self._process_command(command)
+            if reply is not None:
+                self._write(reply)
+
+    def _process_command(self, command: str) -> Optional[str]:
+        mnemonic = command[:2].upper()
+        text = command[2:].strip().rstrip('?')
+        arguments = [a.strip() for a in text.split(',')] if text else []
+        try:
+            values = [float(a) for a in arguments]
+        except ValueError:
+            self.status |= STATUS_PARAMETER_ERROR
+            return None
+
+        handler = getattr(self, f"_cmd_{mnemonic}", None)
+        if handler is not None:
+            return handler(values)
+        if mnemonic in self._CHANNEL_SETTINGS:
+            return self._channel_setting(mnemonic, values)
+        if mnemonic in self._GLOBAL_SETTINGS:
+            return self._global_setting(mnemonic, values)
+        self.status |= STATUS_COMMAND_ERROR
+        return None
+
+    #Ajustes por canal: rango válido de canales (desde 0) y de valores
+    _CHANNEL_SETTINGS = {
+        'DL': ((0, 1, 2), (-0.3, 0.3)),
+        'DS': ((0, 1, 2), (0, 1)),
+        'DM': ((0, 1, 2), (0, 1)),
+        'DY': ((0, 1, 2), (-0.02, 0.02)),
+        'CI': ((0, 1, 2), (0, 3)),
+        'CP': ((1, 2), (1, 9e11)),
+        'GM': ((0, 1), (0, 2)),
+        'GW': ((0, 1), (0, 999.2e-3)),
+        'GD': ((0, 1), (0, 999.2e-3)),
+    }
+    _GLOBAL_SETTINGS = {
+        'CM': (0, 3),
+        'NP': (1, 2000),
+        'DT': (0, 60),
+        'NE': (0, 1),
+        'MI': (0, 2),
+    }
+
+    #Ajustes que solo admiten un índice entero (pendiente, modo, entrada, ...)
+    _INTEGER_SETTINGS = {'DS', 'DM', 'CI', 'GM', 'CM', 'NP', 'NE', 'MI'}
+
+    def _check(self, mnemonic: str, value: float, limits) -> bool:
+        low, high = limits
+        if low <= value <= high and (mnemonic not in self._INTEGER_SETTINGS or float(value).is_integer()):
+            return True
+        self.status |= STATUS_PARAMETER_ERROR
+        return False
+
+    def _channel_setting(self, mnemonic: str, values: List[float]) -> Optional[str]:
+        channels, limits = self._CHANNEL_SETTINGS[mnemonic]
+        if not values or int(values[0]) not in channels:
+            self.status |= STATUS_PARAMETER_ERROR
+            return None
+        key = f"{mnemonic}{int(values[0])}"
+        if len(values) == 1:
+            return self._format(mnemonic, self.settings[key])
+        if self._check(mnemonic, values[1], limits):
+            value = values[1]
+            self.settings[key] = int(value) if mnemonic in self._INTEGER_SETTINGS else value
+        return None
+
+    def _global_setting(self, mnemonic: str, values: List[float]) -> Optional[str]:
+        if not values:
+            return self._format(mnemonic, self.settings[mnemonic])
+        if not self._check(mnemonic, values[0], self._GLOBAL_SETTINGS[mnemonic]):
+            return None
+        value = values[0]
+        if mnemonic == 'DT':
+            value = max(value, self.MIN_DWELL_TIME)
+        elif mnemonic in self._INTEGER_SETTINGS:
+            value = int(value)
+        self.settings[mnemonic] = value
+        return None
+
+    def _format(self, mnemonic: str, value: float) -> str:
+        if mnemonic in ('DL', 'DY'):
+            return f"{value:.4f}"
+        if float(value).is_integer() and mnemonic != 'CP':
+            return str(int(value))
+        return f"{value:g}"
+
+    def _cmd_DZ(self, values: List[float]) -> Optional[str]:
+        """Nivel actual del discriminador (incluye el avance del scan)"""
+        if not values or int(values[0]) not in (0, 1, 2):
+            self.status |= STATUS_PARAMETER_ERROR
+            return None
+        return f"{self.level(int(values[0])):.4f}"
+
+    def _cmd_CS(self, values):
+        self._start_count()
+
+    def _cmd_CH(self, values):
+        self._stop_count()
+        self._stream = None
+
+    def _cmd_CR(self, values):
+        self._stream = None
+        self._clear_scan()
+
+    def _send_all(self, counter: int):
+        """Puntos almacenados, uno por línea; con un scan en curso, los que faltan se envían al completarse"""
+        for value in self.data[counter]:
+            self._write(str(value))
+        if self.counting:
+            self._stream = counter
+
+    def _cmd_EA(self, values):
+        self._send_all(0)
+
+    def _cmd_EB(self, values):
+        self._send_all(1)
+
+    def _cmd_FA(self, values):
+        self._stream = 0
+        self._start_count()
+
+    def _cmd_FB(self, values):
+        self._stream = 1
+        self._start_count()
+
+    def _cmd_XA(self, values):
+        return str(self.current[0])
+
+    def _cmd_XB(self, values):
+        return str(self.current[1])
+
+    def _cmd_NN(self, values):
+        return str(self.position)
+
+    def _read_point(self, counter: int, values: List[float]) -> Optional[str]:
+        """Conteo del periodo j (desde 1); sin j, el del último periodo completo"""
+        data = self.data[counter]
+        index = int(values[0]) if values else len(data)
+        if not 1 <= index <= len(data):
+            self.status |= STATUS_PARAMETER_ERROR
+            return None
+        return str(data[index - 1])
+
+    def _cmd_QA(self, values):
+        return self._read_point(0, values)
+
+    def _cmd_QB(self, values):
+        return self._read_point(1, values)
+
+    def _cmd_SS(self, values):
+        status = self.status
+        if values:
+            bit = int(values[0])
+            self.status &= ~(1 << bit)
+            return str((status >> bit) & 1)
+        self.status = 0
+        return str(status)
+
+    def _cmd_RC(self, values):
+        self.reset()
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="SR400 virtual en un pseudo-terminal")
+    parser.add_argument("--baudrate", type=int, default=9600)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--latency", type=float, default=0.0, help="latencia de respuesta (s)")
+    args = parser.parse_args()
+
+    with VirtualSR400(args.baudrate, args.seed, args.latency) as device:
+        print("Ctrl+C para terminar")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,186 @@
+# test_acquisition_worker.py
+"""
+Pruebas del hilo de adquisición y de la entrega de eventos del SR400 en el hilo de la UI
+"""
+
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication
+
+from acquisition_worker import AcquisitionWorker
+from count_history import CountHistory
+from sr400_controller import SR400Simulator
+
+def _app():
+    return QApplication.instance() or QApplication([])
+
+def _process_until(app, condition, timeout=3.0):
+    #Procesa eventos de Qt hasta que se cumple la condición o vence el plazo
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.01)
+    return condition()
+
+def _simulator():
+    simulator = SR400Simulator(seed=1)
+    simulator.is_connected = True
+    return simulator
+
+def test_worker_publishes_snapshots_and_history():
+    app = _app()
+    history = CountHistory(capacity=100)
+    worker = AcquisitionWorker(_simulator(), interval=0.05, history=history)
+    snapshots = []
+    worker.snapshot_ready.connect(snapshots.append)
+    worker.start()
+    try:
+        assert _process_until(app, lambda: len(snapshots) >= 3)
+    finally:
+        worker.stop()
+    snapshot = snapshots[-1]
+    assert set(snapshot.count_rates) == {'A', 'B'}
+    assert set(snapshot.discriminator_levels) == {'A', 'B'}
+    assert len(history) >= 3
+
+def test_submit_delivers_result_in_ui_thread():
+    app = _app()
+    simulator = _simulator()
+    worker = AcquisitionWorker(simulator, interval=1.0)
+    results = []
+    worker.submit(lambda: threading.current_thread().name,
+                  callback=lambda result: results.append((result, threading.current_thread())))
+    worker.start()
+    try:
+        assert _process_until(app, lambda: results)
+    finally:
+        worker.stop()
+    executed_in, delivered_in = results[0]
+    #La acción corre en el hilo de adquisición y el resultado llega al hilo principal
+    assert executed_in != threading.main_thread().name
+    assert delivered_in is threading.main_thread()
+
+def _window(monkeypatch):
+    import device_cache
+    from detection_system import HardwareDetector
+    from main_window import MainWindow
+
+    #Sin puertos ni caché la ventana arranca en modo simulación, sin diálogo
+    monkeypatch.setattr(device_cache, "load_cached_device", lambda *args, **kwargs: None)
+    monkeypatch.setattr(HardwareDetector, "detect_sr400_ports", staticmethod(lambda: []))
+    return MainWindow()
+
+def test_cached_device_is_probed_off_the_ui_thread(monkeypatch):
+    import device_cache
+    from main_window import MainWindow
+
+    app = _app()
+    release = threading.Event()
+    probed_in = []
+
+    def blocking_probe(*args, **kwargs):
+        probed_in.append(threading.current_thread())
+        release.wait(3.0)
+        #El adaptador reapareció con otro nombre de puerto
+        return device_cache.DeviceFingerprint("/dev/ttyUSB1")
+
+    monkeypatch.setattr(device_cache, "load_cached_device", lambda *args, **kwargs: device_cache.DeviceFingerprint("/dev/ttyUSB0"))
+    monkeypatch.setattr(device_cache, "find_cached_sr400", blocking_probe)
+    #La ventana se construye mientras la prueba del puerto sigue bloqueada
+    window = MainWindow()
+    try:
+        assert window.sr400.port == "/dev/ttyUSB0"
+        release.set()
+        assert _process_until(app, lambda: window.sr400.port == "/dev/ttyUSB1")
+        assert probed_in and probed_in[0] is not threading.main_thread()
+    finally:
+        release.set()
+        window.close()
+
+def test_sr400_status_from_background_thread_reaches_ui(monkeypatch):
+    app = _app()
+    window = _window(monkeypatch)
+    try:
+        #El scheduler reporta la reconexión desde su propio hilo
+        thread = threading.Thread(target=window.sr400_status_changed.emit, args=("Reconectando",))
+        thread.start()
+        thread.join()
+        assert _process_until(app, lambda: window.statusBar().currentMessage() == "SR400: Reconectando")
+    finally:
+        window.close()
+
+def test_scurve_points_are_drawn_while_measuring(monkeypatch):
+    app = _app()
+    window = _window(monkeypatch)
+    window.sr400.is_connected = True
+    errors = []
+    window.show_error = errors.append
+    drawn = []
+    append = window._append_scurve
+    window._append_scurve = lambda previous, n: drawn.append(n) or append(previous, n)
+    try:
+        window.scurve_steps.setValue(40)
+        window.scurve_dwell.setValue(0.1)
+        window.start_scurve_measurement()
+        assert _process_until(app, lambda: not window.scurve_measuring, timeout=10.0)
+        #Repintados parciales a medida que llegan los puntos, no uno por punto
+        assert any(0 < n < 40 for n in drawn)
+        assert len(drawn) < 40
+        x, y = window.scurve_data_line.getData()
+        assert len(x) == 40 and list(x) == sorted(x)
+        assert window.apply_optimal_btn.isEnabled()
+        assert window.scurve_status.text() == "Medición completada correctamente"
+        assert errors == []
+    finally:
+        window.close()
+
+def test_scurve_frame_work_does_not_grow_with_points(monkeypatch):
+    app = _app()
+    window = _window(monkeypatch)
+    window._draw_scurve = lambda thresholds, rates: pytest.fail("barrido ordenado redibujado completo")
+    try:
+        window._reset_scurve_plot(2000)
+        sizes = []
+        for i in range(2000):
+            window._on_scurve_point(-0.1 + i * 1e-4, 100.0 + i)
+            if i % 3 == 2:
+                window._refresh_scurve_plot()
+                sizes.append(len(window._scurve_segments[-1].getData()[0]))
+        #Cada cuadro actualiza solo el último tramo, sin importar cuántos puntos van
+        assert max(sizes) <= window.SCURVE_SEGMENT_POINTS + 3
+        assert max(sizes[-50:]) <= max(sizes[:50])
+        points = np.concatenate([segment.getData()[0] for segment in window._scurve_segments])
+        assert np.array_equal(np.unique(points), window._scurve_x[:1998])
+        assert window.max_count_label.text() == "2097.0 Hz"
+    finally:
+        window.close()
+
+def test_scurve_error_keeps_measured_points(monkeypatch):
+    app = _app()
+    window = _window(monkeypatch)
+    window.sr400.is_connected = True
+    errors = []
+    window.show_error = errors.append
+
+    def failing_measurement(channel, start_v, end_v, steps, dwell_time, progress_callback=None,
+                            point_callback=None):
+        for threshold in (-0.1, -0.09, -0.08):
+            point_callback(threshold, 100.0)
+        raise RuntimeError("enlace perdido")
+
+    window.sr400.measure_s_curve = failing_measurement
+    try:
+        window.start_scurve_measurement()
+        assert _process_until(app, lambda: not window.scurve_measuring)
+        assert len(window.scurve_data_line.getData()[0]) == 3
+        assert window.scurve_status.text() == "Error: enlace perdido"
+        assert errors == ["Error en Curva S: enlace perdido"]
+    finally:
+        window.close()
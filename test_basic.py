@@ -21,9 +21,11 @@ def verify_complete_scurve():
         'stop_scurve_measurement',
         
         # Métodos de hilo y progreso
-        '_simple_scurve_measurement',
-        '_safe_progress_update', 
-        '_update_scurve_progress',
+        '_run_scurve_measurement',
+        '_on_scurve_point',
+        '_on_scurve_progress',
+        '_refresh_scurve_plot',
+        '_draw_scurve',
         '_finalize_scurve',
         '_handle_scurve_error',
         
@@ -51,6 +53,52 @@ def verify_complete_scurve():
             print(f"   - {method}")
         return False
 
+#-----Pruebas (pytest) ------
+def test_scurve_methods():
+    assert verify_complete_scurve()
+
+def test_simulator_point_callback():
+    from sr400_controller import SR400Simulator, DiscriminatorChannel
+
+    simulator = SR400Simulator()
+    for adaptive in (False, True):
+        points = []
+        thresholds, count_rates = simulator.measure_s_curve(
+            DiscriminatorChannel.A, -0.1, 0.1, 20, dwell_time=0.1, fast=True, adaptive=adaptive,
+            point_callback=lambda threshold, count_rate: points.append((threshold, count_rate)))
+        #Cada punto de la curva se entregó una vez, con su tasa
+        assert len(points) == len(thresholds) == 20
+        assert sorted(points) == sorted(zip(thresholds, count_rates))
+        if adaptive:
+            #El barrido adaptativo entrega los puntos fuera de orden
+            assert [p[0] for p in points] != sorted(p[0] for p in points)
+
+def test_scurve_plot_sorted_by_threshold(monkeypatch):
+    import numpy as np
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    import device_cache
+    from detection_system import HardwareDetector
+    from main_window import MainWindow
+
+    #Sin puertos ni caché la ventana arranca en modo simulación, sin diálogo
+    monkeypatch.setattr(device_cache, "load_cached_device", lambda *args, **kwargs: None)
+    monkeypatch.setattr(HardwareDetector, "detect_sr400_ports", staticmethod(lambda: []))
+    app = QApplication.instance() or QApplication([])
+    window = MainWindow()
+    try:
+        window._reset_scurve_plot(4)
+        for threshold, rate in zip([0.0, -0.1, 0.1, -0.05], [2.0, 1.0, 3.0, 1.5]):
+            window._on_scurve_point(threshold, rate)
+        window._refresh_scurve_plot()
+        x, y = window.scurve_data_line.getData()
+        assert list(x) == [-0.1, -0.05, 0.0, 0.1]
+        assert list(y) == [1.0, 1.5, 2.0, 3.0]
+        #Medida fuera de orden: se dibuja completa, sin los tramos del barrido ordenado
+        assert window._scurve_segments == []
+    finally:
+        window.close()
+
 if __name__ == "__main__":
     if verify_complete_scurve():
         print("\n🚀 Probando la curva S ahora...")
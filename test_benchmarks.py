@@ -0,0 +1,64 @@
+# test_benchmarks.py
+"""
+Pruebas del registro de benchmarks y de la comparación con la línea base
+"""
+
+import json
+import time
+
+import pytest
+
+import benchmarks
+
+@pytest.fixture
+def cases(monkeypatch):
+    """Registro vacío para casos de prueba"""
+    registry = {}
+    monkeypatch.setattr(benchmarks, "BENCHMARKS", registry)
+    return registry
+
+def _register(name, delay=0.0, error=None):
+    @benchmarks.benchmark(name, repeat=2)
+    def case():
+        def operation():
+            time.sleep(delay)
+            if error:
+                raise error
+        yield operation
+
+def test_list_shows_registered_cases(capsys):
+    assert benchmarks.main(["--list"]) == 0
+    listed = capsys.readouterr().out.split()
+    assert listed == list(benchmarks.BENCHMARKS)
+    assert "fit_1000_curves_x_200pts" in listed
+
+def test_real_case_runs():
+    results, failures = benchmarks.run_benchmarks("count_history_append", repeat=1)
+    assert failures == [] and list(results) == ["count_history_append_10k"]
+    assert results["count_history_append_10k"]['repeat'] == 1
+
+def test_save_then_compare(cases, tmp_path, capsys):
+    baseline = str(tmp_path / "baseline.json")
+    _register("fast")
+    assert benchmarks.main(["--save", "--baseline", baseline]) == 0
+    with open(baseline, encoding='utf-8') as f:
+        saved = json.load(f)
+    assert set(saved['results']) == {"fast"} and saved['results']["fast"]['repeat'] == 2
+    assert benchmarks.main(["--baseline", baseline, "--tolerance", "1000"]) == 0
+    assert "Sin regresiones" in capsys.readouterr().out
+
+def test_regression_fails(cases, tmp_path):
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({'results': {"slow": {'median': 1e-4, 'min': 1e-4, 'repeat': 2}}}))
+    _register("slow", delay=0.01)
+    assert benchmarks.main(["--baseline", str(baseline)]) == 1
+
+def test_broken_case_fails_the_run(cases, tmp_path, capsys):
+    _register("fast")
+    _register("broken", error=RuntimeError("sin equipo"))
+    results, failures = benchmarks.run_benchmarks()
+    assert list(results) == ["fast"] and failures == ["broken"]
+    #Sin línea base y con --save el caso roto también devuelve error
+    assert benchmarks.main(["--baseline", str(tmp_path / "none.json")]) == 1
+    assert benchmarks.main(["--save", "--baseline", str(tmp_path / "saved.json")]) == 1
+    assert "broken" in capsys.readouterr().out
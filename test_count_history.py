@@ -0,0 +1,52 @@
+# test_count_history.py
+"""
+Pruebas del historial circular de conteos
+"""
+
+from collections import deque
+
+import numpy as np
+import pytest
+
+from count_history import CountHistory
+
+def _as_rows(view):
+    return [tuple(row) for row in np.column_stack(view)]
+
+def test_append_keeps_last_capacity_samples():
+    history = CountHistory(capacity=4)
+    for i in range(10):
+        history.append(float(i), i * 10.0, i * 100.0)
+    assert len(history) == 4 and history.total == 10
+    times, counts_a, counts_b = history.view()
+    assert list(times) == [6.0, 7.0, 8.0, 9.0]
+    assert list(counts_a) == [60.0, 70.0, 80.0, 90.0]
+    assert list(history.view(2)[2]) == [800.0, 900.0]
+
+def test_extend_matches_reference_across_wraps():
+    rng = np.random.default_rng(1)
+    history = CountHistory(capacity=16)
+    reference = deque(maxlen=16)
+    t = 0
+    for size in rng.integers(1, 40, size=50):
+        block = np.arange(t, t + size, dtype=float)
+        t += size
+        if size % 3 == 0:
+            for value in block:
+                history.append(value, -value, 2 * value)
+        else:
+            history.extend(block, -block, 2 * block)
+        reference.extend((value, -value, 2 * value) for value in block)
+        assert _as_rows(history.view()) == list(reference)
+    assert history.total == t
+
+def test_since_and_clear():
+    history = CountHistory(capacity=8)
+    history.extend(np.arange(6.0), np.zeros(6), np.ones(6))
+    assert list(history.since(3.5)[0]) == [4.0, 5.0]
+    history.clear()
+    assert len(history) == 0 and len(history.view()[0]) == 0
+
+def test_capacity_must_be_positive():
+    with pytest.raises(ValueError):
+        CountHistory(capacity=0)
@@ -0,0 +1,124 @@
+# test_decimation.py
+"""
+Pruebas de la pirámide min/max para historiales largos
+"""
+
+import numpy as np
+import pytest
+
+from count_history import CountHistory
+from decimation import MinMaxPyramid, select_level
+from session_store import SessionWriter, SessionReader
+
+def _data(n, seed=1):
+    rng = np.random.default_rng(seed)
+    return np.arange(n, dtype=float), rng.poisson(100, n).astype(float), rng.poisson(50, n).astype(float)
+
+def test_levels_hold_bucket_envelope():
+    t, a, b = _data(4 ** 4)
+    pyramid = MinMaxPyramid(columns=2, factor=4, levels=3)
+    pyramid.extend(t, a, b)
+    x, y_a, y_b = pyramid.view(2, 0.0, 1e9)
+    #Nivel 2: cubetas de 16 muestras, dos puntos por cubeta
+    assert len(x) == 2 * 16
+    assert np.array_equal(x[0::2], t[::16]) and np.array_equal(x[1::2], t[15::16])
+    assert np.array_equal(y_a[0::2], a.reshape(-1, 16).min(axis=1))
+    assert np.array_equal(y_a[1::2], a.reshape(-1, 16).max(axis=1))
+    assert np.array_equal(y_b[1::2], b.reshape(-1, 16).max(axis=1))
+
+def test_incremental_blocks_match_single_extend():
+    t, a, b = _data(5000)
+    whole = MinMaxPyramid(factor=4, levels=4)
+    whole.extend(t, a, b)
+    pieces = MinMaxPyramid(factor=4, levels=4)
+    rng = np.random.default_rng(2)
+    start = 0
+    while start < len(t):
+        stop = start + int(rng.integers(1, 300))
+        if stop - start == 1:
+            pieces.append(t[start], a[start], b[start])
+        else:
+            pieces.extend(t[start:stop], a[start:stop], b[start:stop])
+        start = stop
+    assert pieces.total == whole.total == 5000
+    for level in range(1, 5):
+        for got, expected in zip(pieces.view(level, 0, 1e9), whole.view(level, 0, 1e9)):
+            assert np.array_equal(got, expected)
+
+def test_single_sample_spike_survives_top_level():
+    t, a, b = _data(4 ** 5)
+    a[777] = 1e6
+    b[100] = np.nan
+    pyramid = MinMaxPyramid(factor=4, levels=5)
+    pyramid.extend(t, a, b)
+    _, y_a, y_b = pyramid.view(5, 0, 1e9)
+    assert np.nanmax(y_a) == 1e6
+    #Una lectura perdida no borra la cubeta
+    assert np.all(np.isfinite(y_b))
+
+def test_level_for_respects_max_points():
+    t, a, b = _data(100_000)
+    pyramid = MinMaxPyramid(factor=4, levels=8)
+    pyramid.extend(t, a, b)
+    assert pyramid.level_for(0, 500, max_points=1000) == 0
+    level = pyramid.level_for(0, 100_000, max_points=1000)
+    assert level > 0 and len(pyramid.view(level, 0, 100_000)[0]) <= 1000
+    #Un nivel más fino ya no cabe
+    if level > 1:
+        assert len(pyramid.view(level - 1, 0, 100_000)[0]) > 1000
+    #Sin muestras originales para la ventana no se elige el nivel 0
+    assert pyramid.level_for(0, 500, max_points=1000, raw_from=50_000) > 0
+
+def test_select_level_uses_raw_samples_when_they_fit():
+    pyramid = MinMaxPyramid(factor=4, levels=6)
+    history = CountHistory(capacity=1000, decimator=pyramid)
+    history.extend(*_data(10_000))
+    raw = lambda t_start, t_end: history.since(t_start)
+    level, data = select_level(pyramid, 9_800, 10_000, 500, raw=raw, raw_from=history.view()[0][0])
+    assert level == 0 and len(data[0]) == 200
+    #El historial circular ya descartó el inicio: se dibuja desde la pirámide
+    level, data = select_level(pyramid, 0, 10_000, 500, raw=raw, raw_from=history.view()[0][0])
+    assert level > 0 and data[0][0] == 0.0
+
+def test_count_history_feeds_every_sample_to_decimator():
+    pyramid = MinMaxPyramid(factor=2, levels=3)
+    history = CountHistory(capacity=8, decimator=pyramid)
+    for i in range(20):
+        history.append(float(i), float(i), -float(i))
+    history.extend(np.arange(20.0, 32.0), np.arange(20.0, 32.0), -np.arange(20.0, 32.0))
+    assert len(history) == 8 and pyramid.total == 32
+    x, y_a, _ = pyramid.view(3, 0, 100)
+    assert list(x[0::2]) == [0.0, 8.0, 16.0, 24.0]
+    history.clear()
+    assert pyramid.total == 0
+
+def test_bounded_levels_drop_oldest_buckets():
+    t, a, b = _data(4096)
+    pyramid = MinMaxPyramid(factor=4, levels=2, capacity=64)
+    pyramid.extend(t, a, b)
+    x = pyramid.view(1, 0, 1e9)[0]
+    assert len(x) == 2 * 64 and x[-1] == 4095.0
+    #El nivel 1 ya no cubre el inicio: se usa el nivel 2
+    assert pyramid.level_for(0, 4096, max_points=10_000, raw_from=4000) == 2
+
+def test_from_session(tmp_path):
+    t, a, b = _data(3000)
+    path = str(tmp_path / "sesion")
+    with SessionWriter(path, chunk_size=512, flush_interval=None) as writer:
+        writer.extend(t, a, b)
+    pyramid = MinMaxPyramid.from_session(SessionReader(path), block_size=700, factor=4, levels=3)
+    reference = MinMaxPyramid(factor=4, levels=3)
+    reference.extend(t, a, b)
+    assert pyramid.total == 3000
+    assert all(np.array_equal(x, y) for x, y in zip(pyramid.view(3, 0, 1e9), reference.view(3, 0, 1e9)))
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        MinMaxPyramid(factor=1)
+    with pytest.raises(ValueError):
+        MinMaxPyramid(factor=8, capacity=4)
+    pyramid = MinMaxPyramid(columns=2)
+    with pytest.raises(ValueError):
+        pyramid.extend([0.0], [1.0])
+    with pytest.raises(ValueError):
+        pyramid.view(0, 0, 1)
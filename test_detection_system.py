@@ -0,0 +1,57 @@
+# test_detection_system.py
+"""
+Pruebas de la detección concurrente del SR400
+"""
+
+import os
+import time
+
+import pytest
+
+from detection_system import HardwareDetector
+
+@pytest.fixture
+def silent_port():
+    """Terminal serial abierta que no responde (otro equipo o adaptador sin nada conectado)"""
+    master, slave = os.openpty()
+    yield os.ttyname(slave)
+    os.close(master)
+    os.close(slave)
+
+def _port(device, likely=False):
+    return {'device': device, 'description': "prueba", 'likely_sr400': likely}
+
+def test_probe_confirms_virtual_sr400(device):
+    result = HardwareDetector.probe_port(device.port, device.baudrate, settle_time=0.0)
+    assert result['confirmed'] and result['responded']
+    assert "SR400 confirmado" in result['message']
+
+def test_probe_silent_port_stops_at_timeout(silent_port):
+    start = time.monotonic()
+    result = HardwareDetector.probe_port(silent_port, timeout=0.3, settle_time=0.0)
+    assert not result['confirmed'] and not result['responded']
+    assert time.monotonic() - start < 1.0
+
+def test_reply_format_check():
+    assert HardwareDetector._is_sr400_reply(["0", "-0.0100"])
+    #Eco del comando, nivel fuera de rango o una sola línea no confirman
+    assert not HardwareDetector._is_sr400_reply(["SS;DZ0"])
+    assert not HardwareDetector._is_sr400_reply(["0", "5.0"])
+    assert not HardwareDetector._is_sr400_reply(["300", "0.0"])
+
+def test_probe_ports_ranks_confirmed_first(device, silent_port, tmp_path):
+    ports = [_port(str(tmp_path / "no_existe")), _port(silent_port, likely=True), _port(device.port)]
+    results = HardwareDetector.probe_ports(ports, deadline=0.5, baudrate=device.baudrate, stop_on_first=False)
+    assert [result['device'] for result in results] == [device.port, silent_port, str(tmp_path / "no_existe")]
+    #Sin respuesta, el puerto con descripción de SR400 va antes
+    assert results[0]['confirmed'] and not results[1]['responded']
+    assert "Error de conexión" in results[2]['message']
+
+def test_probe_ports_stops_on_first_confirmed(device, silent_port):
+    ports = [_port(silent_port), _port(device.port)]
+    start = time.monotonic()
+    results = HardwareDetector.probe_ports(ports, deadline=3.0, baudrate=device.baudrate)
+    #La confirmación cancela el puerto que no responde sin esperar el límite
+    assert time.monotonic() - start < 1.5
+    assert results[0]['confirmed'] and len(results) == 2
+    assert HardwareDetector.probe_ports([]) == []
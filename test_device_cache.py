@@ -0,0 +1,74 @@
+# test_device_cache.py
+"""
+Pruebas de la caché del último SR400 confirmado
+"""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import device_cache
+from detection_system import HardwareDetector
+from device_cache import DeviceFingerprint
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "cache" / "dispositivo.json")
+
+def _comports(monkeypatch, *ports):
+    monkeypatch.setattr(device_cache.serial.tools.list_ports, "comports", lambda: list(ports))
+
+def _usb_port(device, serial_number="A1"):
+    return SimpleNamespace(device=device, vid=0x0403, pid=0x6001, serial_number=serial_number,
+                           description="USB Serial")
+
+def test_save_load_and_forget(cache_path):
+    assert device_cache.load_cached_device(cache_path) is None
+    saved = DeviceFingerprint("/dev/ttyUSB0", 19200, vid=1, pid=2, identification="0 | -0.0100")
+    device_cache.save_device(saved, cache_path)
+    assert device_cache.load_cached_device(cache_path) == saved
+    device_cache.forget_device(cache_path)
+    device_cache.forget_device(cache_path)
+    assert device_cache.load_cached_device(cache_path) is None
+
+def test_damaged_cache_is_ignored(cache_path):
+    device_cache.save_device(DeviceFingerprint("COM3"), cache_path)
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        f.write('{"device": "COM3", "otro": 1}')
+    assert device_cache.load_cached_device(cache_path) is None
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        f.write('{"device": ')
+    assert device_cache.load_cached_device(cache_path) is None
+
+def test_locate_follows_renamed_adapter(monkeypatch):
+    _comports(monkeypatch, _usb_port("/dev/ttyUSB3", serial_number="B2"), _usb_port("/dev/ttyUSB1"))
+    cached = DeviceFingerprint("/dev/ttyUSB0", vid=0x0403, pid=0x6001, serial_number="A1")
+    #El mismo adaptador con otro nombre primero; el nombre guardado al final
+    assert device_cache.locate_device(cached) == ["/dev/ttyUSB1", "/dev/ttyUSB0"]
+    assert device_cache.locate_device(DeviceFingerprint("COM3")) == ["COM3"]
+
+def test_remember_and_find_cached(sr400, device, cache_path):
+    stored = device_cache.remember_connection(sr400, cache_path)
+    assert stored.device == device.port and stored.identification == sr400.identification
+    found = device_cache.find_cached_sr400(cache_path)
+    assert found.device == device.port and found.baudrate == device.baudrate
+    with open(cache_path, encoding='utf-8') as f:
+        assert json.load(f)['confirmed_at'] >= stored.confirmed_at
+    #Sin conexión real no se guarda nada
+    assert device_cache.remember_connection(SimpleNamespace(is_connected=False), cache_path) is None
+
+def test_find_cached_device_that_does_not_answer(tmp_path, cache_path):
+    device_cache.save_device(DeviceFingerprint(str(tmp_path / "no_existe")), cache_path)
+    assert device_cache.find_cached_sr400(cache_path, timeout=0.2) is None
+
+def test_find_falls_back_to_full_detection(device, cache_path, monkeypatch):
+    probed = []
+    monkeypatch.setattr(HardwareDetector, "detect_sr400_ports", staticmethod(
+        lambda: probed.append(True) or [{'device': device.port, 'description': "pty", 'likely_sr400': False}]))
+    found = device_cache.find_sr400(device.baudrate, cache_path, deadline=1.0)
+    assert found.device == device.port and probed
+    #La segunda vez responde la caché y no se recorren los puertos
+    probed.clear()
+    assert device_cache.find_sr400(device.baudrate, cache_path).device == device.port
+    assert not probed
@@ -0,0 +1,87 @@
+# test_instrument_manager.py
+"""
+Pruebas del control simultáneo de varios SR400 virtuales
+"""
+
+import time
+
+import pytest
+
+from instrument_manager import InstrumentManager
+from sr400_controller import DiscriminatorChannel
+from sr400_virtual import VirtualSR400
+
+@pytest.fixture
+def devices(tmp_path):
+    pair = {name: VirtualSR400(baudrate=115200, seed=seed, link=str(tmp_path / name))
+            for seed, name in enumerate(("uno", "dos"), start=1)}
+    for device in pair.values():
+        device.start()
+    yield pair
+    for device in pair.values():
+        device.stop()
+
+def _sync(manager):
+    #Un query en cada equipo: los comandos anteriores ya fueron procesados
+    manager.map(lambda sr400: sr400.query("NN"))
+
+@pytest.fixture
+def manager(devices):
+    manager = InstrumentManager(sync_timeout=2.0)
+    manager.errors = []
+    manager.on_error = lambda name, message: manager.errors.append((name, message))
+    for name, device in devices.items():
+        manager.add(name, device.port, baudrate=device.baudrate, timeout=0.3)
+    assert manager.connect_all() == {"uno": True, "dos": True}
+    yield manager
+    manager.disconnect_all()
+
+def test_add_and_remove(manager, devices):
+    assert len(manager) == 2 and manager.connected == ["uno", "dos"]
+    with pytest.raises(ValueError):
+        manager.add("uno", devices["uno"].port)
+    sr400 = manager["dos"]
+    manager.remove("dos")
+    assert not sr400.is_connected and manager.connected == ["uno"]
+
+def test_map_runs_instruments_in_parallel(manager):
+    start = time.monotonic()
+    results = manager.map(lambda sr400, delay: time.sleep(delay) or sr400.port, 0.3)
+    #Cada equipo usa su propio hilo de E/S: el tiempo es el del más lento
+    assert time.monotonic() - start < 0.55
+    assert results == {name: manager[name].port for name in ("uno", "dos")}
+
+def test_map_reports_errors_by_name(manager):
+    def fail_on_dos(sr400):
+        if sr400 is manager["dos"]:
+            raise RuntimeError("fallo")
+        return True
+
+    assert manager.map(fail_on_dos) == {"uno": True, "dos": None}
+    assert manager.errors == [("dos", "fallo")]
+
+def test_configure_and_poll(manager, devices):
+    results = manager.configure_all(lambda sr400: sr400.set_discriminator_level(DiscriminatorChannel.A, 0.03))
+    assert results == {"uno": True, "dos": True}
+    _sync(manager)
+    assert all(device.settings['DL0'] == 0.03 for device in devices.values())
+    rates = manager.poll_rates()
+    assert set(rates) == {"uno", "dos"} and all(set(rate) == {'A', 'B'} for rate in rates.values())
+
+def test_start_and_stop_all_forward_events(manager, devices):
+    events = []
+    manager.on_counting_changed = lambda name, counting: events.append((name, counting))
+    assert manager.start_all()
+    assert manager.stop_all()
+    _sync(manager)
+    assert all(device.received.count("CS") == 1 and "CH" in device.received for device in devices.values())
+    assert sorted(events) == [("dos", False), ("dos", True), ("uno", False), ("uno", True)]
+
+def test_stream_merges_both_instruments(manager):
+    manager.map(lambda sr400: sr400.set_count_period(0.01))
+    samples = list(manager.stream(5))
+    assert len(samples) == 10
+    assert [s.timestamp for s in samples] == sorted(s.timestamp for s in samples)
+    for name in ("uno", "dos"):
+        assert [s.period for s in samples if s.instrument == name] == list(range(5))
+    assert manager.errors == []
@@ -0,0 +1,98 @@
+# test_scurve_analysis.py
+"""
+Pruebas del ajuste vectorizado de curvas S y del threshold óptimo
+"""
+
+import numpy as np
+import pytest
+
+import scurve_analysis
+from scurve_analysis import fit_s_curves, optimal_threshold, empirical_threshold, s_curve_model
+
+THRESHOLDS = np.linspace(-0.1, 0.1, 81)
+
+def _params(m, rng):
+    return np.column_stack([
+        rng.uniform(10, 50, m),          # fondo
+        rng.uniform(2000, 8000, m),      # amplitud
+        rng.uniform(-0.03, 0.03, m),     # centro
+        rng.choice([-1, 1], m) * rng.uniform(0.005, 0.015, m),   # ancho (sube o baja)
+    ])
+
+def test_batch_fit_recovers_noiseless_parameters():
+    params = _params(50, np.random.default_rng(1))
+    fit = fit_s_curves(THRESHOLDS, s_curve_model(THRESHOLDS, params))
+    assert len(fit) == 50 and fit.converged.all()
+    assert np.allclose(fit.center, params[:, 2], atol=1e-6)
+    assert np.allclose(fit.width, params[:, 3], rtol=1e-4)
+    assert np.allclose(fit.plateau, params[:, 0] + params[:, 1], rtol=1e-4)
+    #Threshold: entrada a la meseta al 95% del escalón
+    assert np.allclose(fit.threshold, params[:, 2] + params[:, 3] * np.log(19), atol=1e-6)
+
+def test_batch_fit_errors_cover_poisson_noise():
+    rng = np.random.default_rng(2)
+    params = np.tile([20.0, 5000.0, 0.01, 0.01], (400, 1))
+    rates = rng.poisson(s_curve_model(THRESHOLDS, params)).astype(float)
+    fit = fit_s_curves(THRESHOLDS, rates)
+    assert fit.converged.all()
+    pulls = (fit.threshold - (0.01 + 0.01 * np.log(19))) / fit.threshold_err
+    #Errores bien calibrados: los pulls tienen desviación cercana a 1
+    assert abs(np.mean(pulls)) < 0.3
+    assert 0.8 < np.std(pulls) < 1.2
+    assert np.all(fit.chi2_red < 2.0)
+
+def test_nan_points_are_ignored():
+    rates = s_curve_model(THRESHOLDS, [20.0, 5000.0, 0.0, 0.01])[0]
+    damaged = rates.copy()
+    damaged[::7] = np.nan
+    fit = fit_s_curves(THRESHOLDS, damaged)
+    assert fit.converged[0]
+    assert fit.center[0] == pytest.approx(0.0, abs=1e-6)
+
+def test_optimal_threshold_uses_converged_fit():
+    rates = s_curve_model(THRESHOLDS, [20.0, 5000.0, 0.0, 0.01])[0]
+    assert optimal_threshold(THRESHOLDS, rates) == pytest.approx(0.01 * np.log(19), abs=1e-6)
+    #Limitado al rango medido
+    assert optimal_threshold(THRESHOLDS[:30], rates[:30]) <= THRESHOLDS[29]
+
+def test_optimal_threshold_falls_back_when_fit_fails(monkeypatch):
+    rates = s_curve_model(THRESHOLDS, [20.0, 5000.0, 0.0, 0.01])[0]
+    fit_s_curves = scurve_analysis.fit_s_curves
+
+    def not_converged(*args, **kwargs):
+        fit = fit_s_curves(*args, **kwargs)
+        fit.converged[:] = False
+        fit.threshold[:] = 1e3
+        return fit
+
+    monkeypatch.setattr(scurve_analysis, "fit_s_curves", not_converged)
+    assert optimal_threshold(THRESHOLDS, rates) == empirical_threshold(THRESHOLDS, rates)
+    #Muy pocos puntos para ajustar
+    assert optimal_threshold([0.0, 0.1], [5.0, 10.0]) == 0.1
+    assert optimal_threshold([0.0, 0.1], [np.nan, np.nan]) == 0.0
+
+def test_empirical_threshold_handles_order_and_slope():
+    rising = s_curve_model(THRESHOLDS, [20.0, 5000.0, 0.0, 0.01])[0]
+    expected = THRESHOLDS[np.flatnonzero(rising >= 20.0 + 0.95 * 5000.0)[0]]
+    order = np.random.default_rng(3).permutation(len(THRESHOLDS))
+    #Los puntos de un barrido adaptativo llegan desordenados
+    assert empirical_threshold(THRESHOLDS[order], rising[order]) == pytest.approx(expected, abs=0.0025)
+    falling = rising[::-1]
+    assert empirical_threshold(THRESHOLDS, falling) == pytest.approx(-expected, abs=0.0025)
+
+def test_flat_curve_is_not_converged():
+    x = np.linspace(-0.3, 0.3, 50)
+    rates = np.random.default_rng(4).poisson(1000, 50).astype(float)
+    fit = fit_s_curves(x, rates)
+    #Sin escalón el ajuste no da un threshold válido y se usa la estimación empírica
+    assert not fit.converged[0]
+    assert optimal_threshold(x, rates) == empirical_threshold(x, rates)
+    flat = np.random.default_rng(5).poisson(1000, (200, 50)).astype(float)
+    #Una fluctuación de 3 sigma puede pasar como escalón en muy pocas curvas
+    assert fit_s_curves(x, flat).converged.mean() < 0.02
+
+def test_transition_outside_range_is_not_converged():
+    rates = s_curve_model(THRESHOLDS, [20.0, 5000.0, 0.0, 0.01])[0]
+    #Solo la parte baja de la curva: el threshold cae fuera de lo medido
+    fit = fit_s_curves(THRESHOLDS[:35], rates[:35])
+    assert not fit.converged[0]
@@ -0,0 +1,136 @@
+# test_session_replay.py
+"""
+Pruebas de la reproducción de sesiones grabadas
+"""
+
+import csv
+import io
+import os
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+import pytest
+
+import sr400_cli
+from count_history import CountHistory
+from session_replay import ReplayClock, ReplaySerial, ReplaySR400, SessionReplay
+from session_store import SessionWriter, TranscriptEntry
+
+def _entries(*lines):
+    return [TranscriptEntry(t, direction, data) for t, direction, data in lines]
+
+def _read_lines(port, n, timeout=1.0):
+    deadline = time.monotonic() + timeout
+    data = b""
+    while data.count(b"\n") < n and time.monotonic() < deadline:
+        data += port.read(64)
+    return data.decode('ascii').split()
+
+def _session(path, n=200, dt=0.01):
+    times = 1000.0 + np.arange(n) * dt
+    with SessionWriter(path, chunk_size=64, flush_interval=None,
+                       settings_provider=lambda: {'DL0': -0.01, 'DL1': 0.02}) as writer:
+        writer.extend(times, np.arange(n, dtype=float), -np.arange(n, dtype=float))
+    return times
+
+def test_clock():
+    with pytest.raises(ValueError):
+        ReplayClock(0.0, speed=0)
+    assert ReplayClock(5.0, speed=None).now() == float('inf')
+    clock = ReplayClock(5.0, speed=10.0)
+    assert 5.0 <= clock.now() < 5.5
+    assert clock.wall_until(6.0) == pytest.approx(0.1, abs=0.02)
+
+def test_serial_replays_recorded_replies():
+    port = ReplaySerial(_entries((0.0, 'tx', "SS"), (0.001, 'rx', "0"),
+                                 (0.01, 'tx', "XA"), (0.011, 'rx', "42"),
+                                 (0.02, 'tx', "CS"), (0.02, 'tx', "FA"), (0.1, 'rx', "7"), (0.2, 'rx', "8")),
+                        speed=None, timeout=0.05)
+    port.write(b"SS\r")
+    assert _read_lines(port, 1) == ["0"]
+    #Un comando que no se grabó no recibe respuesta
+    port.write(b"NN\r")
+    assert port.read(16) == b""
+    port.write(b"FA\r")
+    assert _read_lines(port, 2) == ["7", "8"]
+    assert port.finished
+    #Fuera de orden: la respuesta de su primera aparición
+    port.write(b"XA\r")
+    assert _read_lines(port, 1) == ["42"]
+    assert port.matched == 2 and port.unmatched == 2
+
+def test_serial_keeps_recorded_timing():
+    port = ReplaySerial(_entries((0.0, 'tx', "FA"), (0.1, 'rx', "1"), (0.3, 'rx', "2")), speed=2.0, timeout=0.5)
+    start = time.monotonic()
+    port.write(b"FA\r")
+    assert _read_lines(port, 1) == ["1"]
+    assert 0.04 <= time.monotonic() - start < 0.2
+    assert _read_lines(port, 1) == ["2"]
+    assert 0.14 <= time.monotonic() - start < 0.35
+
+def test_cli_session_replays_through_sr400(tmp_path, capsys):
+    path = str(tmp_path / "sesion")
+    assert sr400_cli.main(["-q", "--virtual", "--seed", "1", "--baudrate", "115200", "count",
+                           "--periods", "6", "--period", "0.01", "--format", "session", "-o", path]) == 0
+    recorded = SessionReplay(path).reader.window()
+    assert sr400_cli.main(["-q", "--replay", path, "--speed", "0", "count", "--periods", "6", "--period", "0.01"]) == 0
+    rows = list(csv.reader(io.StringIO(capsys.readouterr().out)))[1:]
+    assert [float(row[1]) for row in rows] == list(recorded['count_a'])
+    assert [float(row[2]) for row in rows] == list(recorded['count_b'])
+
+def test_replay_sr400_requires_transcript(tmp_path):
+    path = str(tmp_path / "sesion")
+    _session(path, n=4)
+    with pytest.raises(ValueError):
+        ReplaySR400(path)
+
+def test_session_blocks_at_max_speed(tmp_path):
+    path = str(tmp_path / "sesion")
+    times = _session(path)
+    replay = SessionReplay(path, speed=None, block_size=64)
+    blocks = list(replay.blocks())
+    assert [len(block) for block in blocks] == [64, 64, 64, 8]
+    assert np.array_equal(np.concatenate([block['timestamp'] for block in blocks]), times)
+    assert replay.progress == 1.0 and replay.settings() == {'DL0': -0.01, 'DL1': 0.02}
+
+def test_session_blocks_follow_recording_pace(tmp_path):
+    path = str(tmp_path / "sesion")
+    _session(path, n=100, dt=0.01)
+    replay = SessionReplay(path, speed=5.0)
+    start = time.monotonic()
+    received = sum(len(block) for block in replay.blocks(tick=0.02))
+    #0.99 s de grabación a velocidad 5
+    assert received == 100
+    assert 0.15 <= time.monotonic() - start < 0.8
+    replay = SessionReplay(path, speed=1.0)
+    blocks = replay.blocks(tick=0.02)
+    next(blocks)
+    replay.stop()
+    assert sum(len(block) for block in blocks) < 100 and replay.progress < 1.0
+
+def test_replay_worker_publishes_to_history(tmp_path):
+    from PyQt5.QtWidgets import QApplication
+    from acquisition_worker import ReplayWorker
+
+    app = QApplication.instance() or QApplication([])
+    path = str(tmp_path / "sesion")
+    times = _session(path)
+    history = CountHistory(capacity=1000)
+    worker = ReplayWorker(SessionReplay(path, speed=None, block_size=50), interval=0.01, history=history)
+    snapshots, finished = [], []
+    worker.snapshot_ready.connect(snapshots.append)
+    worker.replay_finished.connect(lambda: finished.append(True))
+    worker.start()
+    deadline = time.monotonic() + 3.0
+    while not finished and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.01)
+    worker.stop()
+    app.processEvents()
+    assert finished and len(history) == 200
+    assert np.array_equal(history.view()[0], times)
+    last = snapshots[-1]
+    assert last.timestamp == times[-1] and last.count_rates['A'] == 199.0
+    assert last.discriminator_levels == {'A': -0.01, 'B': 0.02}
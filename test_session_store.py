@@ -0,0 +1,91 @@
+# test_session_store.py
+"""
+Pruebas del almacenamiento de sesiones por bloques
+"""
+
+import csv
+import json
+import os
+
+import numpy as np
+import pytest
+
+from session_store import (SessionWriter, SessionReader, TranscriptWriter, INDEX_FILE, SAMPLES_FILE,
+                           list_sessions, new_session_path)
+
+def _write(path, n, chunk_size=4, **kwargs):
+    times = np.arange(n, dtype=float)
+    with SessionWriter(path, chunk_size=chunk_size, flush_interval=None, **kwargs) as writer:
+        writer.extend(times, times * 10, times * 100)
+    return times
+
+def test_chunks_and_windows(tmp_path):
+    path = str(tmp_path / "sesion")
+    _write(path, 10, settings_provider=lambda: {'CP2': 1e5})
+    reader = SessionReader(path)
+    assert len(reader) == 10
+    assert [chunk.count for chunk in reader.chunks] == [4, 4, 2]
+    assert list(reader.window(3, 6)['count_a']) == [30.0, 40.0, 50.0]
+    assert list(reader.time_window(2.5, 7.0)['timestamp']) == [3.0, 4.0, 5.0, 6.0]
+    assert sum(len(block) for block in reader.iter_chunks()) == 10
+    assert reader.settings_at(9) == {'CP2': 1e5}
+    with pytest.raises(IndexError):
+        reader.settings_at(10)
+
+def test_append_flushes_full_chunks_only(tmp_path):
+    path = str(tmp_path / "sesion")
+    writer = SessionWriter(path, chunk_size=3, flush_interval=None)
+    for i in range(5):
+        writer.append(float(i), 0.0, 0.0)
+    #El bloque incompleto sigue en memoria
+    assert writer.samples_written == 3 and len(SessionReader(path)) == 3
+    writer.close()
+    assert len(SessionReader(path)) == 5
+    #Una sesión cerrada ignora muestras nuevas
+    writer.append(9.0, 0.0, 0.0)
+    with pytest.raises(FileExistsError):
+        SessionWriter(path)
+
+def test_truncated_tail_is_ignored(tmp_path):
+    path = str(tmp_path / "sesion")
+    _write(path, 8)
+    #Simula una caída: bloque de datos a medias y línea de índice cortada
+    with open(os.path.join(path, SAMPLES_FILE), 'ab') as f:
+        f.write(b"\0" * 10)
+    with open(os.path.join(path, INDEX_FILE), 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'index': 2, 'start': 8, 'count': 4})[:20])
+    reader = SessionReader(path)
+    assert len(reader) == 8
+    assert list(reader.window()['timestamp']) == list(range(8))
+
+def test_index_past_data_is_ignored(tmp_path):
+    path = str(tmp_path / "sesion")
+    _write(path, 8)
+    data_file = os.path.join(path, SAMPLES_FILE)
+    #El último bloque quedó indexado pero sus datos no llegaron completos al disco
+    with open(data_file, 'r+b') as f:
+        f.truncate(os.path.getsize(data_file) - 8)
+    assert len(SessionReader(path)) == 4
+
+def test_to_csv_with_header(tmp_path):
+    path = str(tmp_path / "sesion")
+    _write(path, 6)
+    filename = str(tmp_path / "sesion.csv")
+    SessionReader(path).to_csv(filename, start=1, stop=4, block_size=2, header=("t", "A", "B"))
+    with open(filename, newline='', encoding='utf-8') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["t", "A", "B"]
+    assert [float(row[0]) for row in rows[1:]] == [1.0, 2.0, 3.0]
+
+def test_transcript_and_session_listing(tmp_path):
+    first = new_session_path(str(tmp_path))
+    _write(first, 2)
+    second = new_session_path(str(tmp_path))
+    assert second != first
+    with TranscriptWriter(second) as transcript:
+        transcript.record('tx', "NN")
+        transcript.record('rx', "3")
+    _write(second, 2)
+    assert list_sessions(str(tmp_path))[0] == second
+    assert [(e.direction, e.data) for e in SessionReader(second).transcript()] == [('tx', "NN"), ('rx', "3")]
+    assert list_sessions(str(tmp_path / "no_existe")) == []
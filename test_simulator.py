@@ -0,0 +1,52 @@
+# test_simulator.py
+"""
+Pruebas de la generación vectorizada de curvas S en SR400Simulator
+"""
+
+import numpy as np
+import pytest
+
+from sr400_controller import SR400Simulator, DiscriminatorChannel, DwellControl
+
+THRESHOLDS = np.linspace(-0.1, 0.1, 41)
+
+def test_curve_count_follows_parameter_shapes():
+    simulator = SR400Simulator(seed=1)
+    assert simulator.simulate_s_curves(THRESHOLDS, center=[0.0, 0.01, 0.02]).shape == (3, 41)
+    assert simulator.simulate_s_curves(THRESHOLDS, max_rate=np.full(5, 800.0)).shape == (5, 41)
+    assert simulator.simulate_s_curves(THRESHOLDS).shape == (1, 41)
+    #n_curves explícito replica parámetros escalares
+    assert simulator.simulate_s_curves(THRESHOLDS, n_curves=4).shape == (4, 41)
+    with pytest.raises(ValueError):
+        simulator.simulate_s_curves(THRESHOLDS, n_curves=2, center=[0.0, 0.01, 0.02])
+
+def test_curves_average_to_model():
+    simulator = SR400Simulator(seed=1)
+    curves = simulator.simulate_s_curves(THRESHOLDS, dwell_time=0.5, n_curves=2000)
+    expected = simulator.expected_rates(THRESHOLDS)[0]
+    #Error de la media de 2000 curvas Poisson: sqrt(tasa / dwell / 2000)
+    assert np.allclose(curves.mean(axis=0), expected, atol=5 * np.sqrt(np.maximum(expected, 1) / 0.5 / 2000))
+
+def test_seed_is_reproducible():
+    first = SR400Simulator(seed=7).simulate_s_curves(THRESHOLDS, n_curves=3)
+    second = SR400Simulator(seed=7).simulate_s_curves(THRESHOLDS, n_curves=3)
+    assert np.array_equal(first, second)
+
+def test_fast_measurement_reports_progress_in_blocks():
+    simulator = SR400Simulator(seed=1)
+    progress = []
+    thresholds, rates = simulator.measure_s_curve(
+        DiscriminatorChannel.A, -0.1, 0.1, 100, dwell_time=0.5, fast=True, progress_every=25,
+        progress_callback=lambda fraction, message: progress.append(fraction))
+    assert len(thresholds) == len(rates) == 100
+    assert progress == [0.25, 0.5, 0.75, 1.0]
+
+def test_early_stop_dwell_limits():
+    simulator = SR400Simulator(seed=1)
+    control = DwellControl(target_error=0.05, min_dwell=0.05, max_dwell=1.0, slice_time=0.01)
+    rates, dwells = simulator.simulate_early_stop(THRESHOLDS, control)
+    assert np.all((dwells >= control.min_dwell - 1e-12) & (dwells <= control.max_dwell + 1e-12))
+    #Con tasa alta se llega antes a las cuentas objetivo
+    high = rates > 1000
+    assert np.all(dwells[high] < control.max_dwell)
+    assert np.all(rates[high] * dwells[high] >= control.target_counts)
@@ -0,0 +1,118 @@
+# test_sr400_async.py
+"""
+Pruebas del cliente asyncio contra el SR400 virtual
+"""
+
+import asyncio
+
+import numpy as np
+import pytest
+
+import sr400_controller
+from sr400_async import AsyncSR400
+from sr400_controller import DiscriminatorChannel, preset_commands, _default_configuration
+
+def _run(device, scenario):
+    #Cada prueba abre y cierra su propio event loop
+    async def main():
+        sr400 = AsyncSR400(device.port, baudrate=device.baudrate, timeout=0.3)
+        assert await sr400.connect(settle_time=0.05)
+        try:
+            return await scenario(sr400)
+        finally:
+            await sr400.disconnect()
+    return asyncio.run(main())
+
+def test_concurrent_batches_stay_per_task(device):
+    async def scenario(sr400):
+        async def configure(channel, level):
+            async with sr400.batch():
+                await sr400.set_discriminator_level(channel, level)
+                #Cede el control a la otra tarea en medio del lote
+                await asyncio.sleep(0.01)
+                await sr400.set_discriminator_scan_step(channel, level / 10)
+        await asyncio.gather(configure(DiscriminatorChannel.A, 0.1), configure(DiscriminatorChannel.B, -0.1))
+
+    lines = []
+    process_line = device._process_line
+    device._process_line = lambda line: lines.append(line) or process_line(line)
+    _run(device, scenario)
+    #Cada lote se envió en su propia línea, sin comandos de la otra tarea
+    assert "DL0,0.1000;DY0,0.0100" in lines
+    assert "DL1,-0.1000;DY1,-0.0100" in lines
+    assert device.settings['DL0'] == 0.1 and device.settings['DY1'] == -0.01
+
+def test_query_inside_batch_sends_pending_commands(device):
+    async def scenario(sr400):
+        async with sr400.batch():
+            await sr400.set_discriminator_level(DiscriminatorChannel.A, 0.05)
+            return await sr400.get_discriminator_level(DiscriminatorChannel.A)
+
+    assert _run(device, scenario) == 0.05
+
+def test_scan_s_curve_in_hz(device):
+    async def scenario(sr400):
+        await sr400.set_default_configuration()
+        return await sr400.measure_s_curve(DiscriminatorChannel.A, -0.1, 0.1, 11, dwell_time=0.02)
+
+    thresholds, rates = _run(device, scenario)
+    assert np.allclose(thresholds, np.linspace(-0.1, 0.1, 11))
+    expected = [device.inputs[1].rate(t, slope=1) for t in thresholds]
+    assert np.allclose(rates, expected, rtol=0.5, atol=500)
+    assert device.received.count("EA") == 1
+
+def test_preset_commands_without_sr400(monkeypatch):
+    def no_client(*args, **kwargs):
+        raise AssertionError("preset_commands no debe crear un SR400")
+
+    monkeypatch.setattr(sr400_controller.SR400, "__init__", no_client)
+    commands = preset_commands(_default_configuration)
+    assert commands[:3] == ["DS0,1", "DM0,0", "DL0,-0.0100"]
+    assert "CI2,0" in commands
+
+def test_connect_fails_without_reply(device):
+    device._write = lambda text: None
+
+    async def main():
+        sr400 = AsyncSR400(device.port, baudrate=device.baudrate, timeout=0.1)
+        errors = []
+        sr400.on_error = errors.append
+        return await sr400.connect(settle_time=0.05), sr400.is_connected, errors
+
+    connected, is_connected, errors = asyncio.run(main())
+    #Abrir el puerto no basta: sin respuesta a SS no hay conexión
+    assert not connected and not is_connected
+    assert any("no respondió" in error for error in errors)
+
+def test_scan_rejects_bad_parameters(device):
+    async def scenario(sr400):
+        with pytest.raises(ValueError):
+            await sr400._measure_s_curve_scan(DiscriminatorChannel.A, -0.1, 0.1, 2001, 0.01, None)
+        #Periodo de conteo fuera de rango: el setter lo rechaza y el barrido no arranca
+        with pytest.raises(RuntimeError):
+            await sr400.measure_s_curve(DiscriminatorChannel.A, -0.1, 0.1, 11, dwell_time=1e-9)
+
+    _run(device, scenario)
+    assert "CS" not in device.received
+
+def test_scan_restores_settings_and_keeps_original_error(device):
+    errors = []
+
+    async def scenario(sr400):
+        sr400.on_error = errors.append
+        await sr400.set_dwell_time(0.01)
+        await sr400.set_scan_periods(7)
+
+        async def no_counts(counter='A', periods=1):
+            #El equipo rechaza el lote de restauración después de la falla
+            device._process_line("DL7,0")
+            return None
+
+        sr400.read_stored_counts = no_counts
+        with pytest.raises(RuntimeError, match="No se pudieron leer"):
+            await sr400.measure_s_curve(DiscriminatorChannel.A, -0.1, 0.1, 11, dwell_time=0.01)
+
+    _run(device, scenario)
+    assert any("restaurar" in error for error in errors)
+    #El lote se envió aunque el status reportó un error: los ajustes del barrido se restauraron
+    assert device.settings['DM0'] == 0 and device.settings['DT'] == 0.01 and device.settings['NP'] == 7
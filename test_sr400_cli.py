@@ -0,0 +1,61 @@
+# test_sr400_cli.py
+"""
+Pruebas de la línea de comandos contra el SR400 virtual
+"""
+
+import csv
+import io
+import json
+
+import numpy as np
+import pytest
+
+import sr400_cli
+from session_store import SessionReader
+
+VIRTUAL = ["--virtual", "--seed", "1", "--baudrate", "115200", "--timeout", "0.3"]
+
+def _rows(text):
+    return list(csv.reader(io.StringIO(text)))
+
+def test_status_prints_json(capsys):
+    assert sr400_cli.main(VIRTUAL + ["--default-config", "--level", "A=0.02", "status"]) == sr400_cli.EXIT_OK
+    report = json.loads(capsys.readouterr().out)
+    assert report['discriminator_levels']['A'] == pytest.approx(0.02)
+    assert report['settings']['DL0'] == pytest.approx(0.02)
+
+def test_scurve_writes_csv_to_stdout(capsys):
+    assert sr400_cli.main(VIRTUAL + ["--default-config", "scurve", "--steps", "11", "--dwell", "0.02"]) == 0
+    captured = capsys.readouterr()
+    rows = _rows(captured.out)
+    assert rows[0] == ["threshold", "count_rate"] and len(rows) == 12
+    assert np.allclose([float(row[0]) for row in rows[1:]], np.linspace(-0.1, 0.1, 11))
+    #Los mensajes van a stderr, no se mezclan con los datos
+    assert "Threshold óptimo" in captured.err or "threshold empírico" in captured.err
+
+def test_count_to_csv_file(tmp_path, capsys):
+    output = tmp_path / "conteo.csv"
+    assert sr400_cli.main(VIRTUAL + ["count", "--periods", "5", "--period", "0.01", "-o", str(output)]) == 0
+    rows = _rows(output.read_text())
+    assert rows[0] == ["timestamp", "count_a", "count_b"] and len(rows) == 6
+    assert all(np.isfinite(float(value)) for row in rows[1:] for value in row)
+    assert capsys.readouterr().out == ""
+
+def test_count_to_session(tmp_path):
+    output = str(tmp_path / "sesion")
+    assert sr400_cli.main(VIRTUAL + ["-q", "count", "--periods", "4", "--period", "0.01",
+                                     "--format", "session", "-o", output]) == 0
+    reader = SessionReader(output)
+    assert len(reader) == 4 and reader.metadata['count_period'] == pytest.approx(0.01)
+    #La transcripción serial queda con la sesión para poder reproducirla
+    sent = [entry.data for entry in reader.transcript() if entry.direction == 'tx']
+    assert "CR;FA" in sent and "EB" in sent
+
+def test_exit_codes(monkeypatch, tmp_path):
+    #Formato session sin destino: error de la medición
+    assert sr400_cli.main(VIRTUAL + ["-q", "count", "--periods", "2", "--format", "session"]) == 2
+    assert sr400_cli.main(["-q", "--port", str(tmp_path / "no_existe"), "status"]) == 1
+    monkeypatch.setattr(sr400_cli, "find_sr400", lambda baudrate: None)
+    assert sr400_cli.main(["-q", "--auto", "status"]) == 1
+    with pytest.raises(SystemExit):
+        sr400_cli.main(VIRTUAL + ["--level", "A", "status"])
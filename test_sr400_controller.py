@@ -0,0 +1,564 @@
+# test_sr400_controller.py
+"""
+Pruebas del cliente SR400 contra el SR400 virtual
+"""
+
+import math
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import sr400_controller
+from sr400_controller import (SR400, CommandPriority, CommandScheduler, DiscriminatorChannel, DiscriminatorMode,
+                              DwellControl, ReconnectPolicy)
+from sr400_virtual import PulseSource
+
+#-----Lectura por terminador ------
+class _ChunkedSerial:
+    """Puerto falso que entrega la respuesta en trozos arbitrarios"""
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+
+    @property
+    def in_waiting(self):
+        return len(self.chunks[0]) if self.chunks else 0
+
+    def read(self, size=1):
+        return self.chunks.pop(0) if self.chunks else b""
+
+def test_read_line_joins_split_chunks():
+    sr400 = SR400("virtual")
+    sr400.ser = _ChunkedSerial([b"12", b"3\r", b"\n\r\n45\n"])
+    deadline = time.monotonic() + 1.0
+    assert sr400._read_line(deadline) == "123"
+    #Las líneas vacías entre terminadores se ignoran y el resto queda en el buffer
+    assert sr400._read_line(deadline) == "45"
+    assert sr400._read_line(time.monotonic() + 0.05) is None
+
+def test_query_returns_at_terminator(sr400):
+    start = time.monotonic()
+    assert sr400.query("NN") == "0"
+    #Sin esperas fijas: la respuesta llega mucho antes del timeout
+    assert time.monotonic() - start < sr400.timeout / 2
+
+def test_query_without_reply_times_out(sr400, device):
+    device._write = lambda text: None
+    start = time.monotonic()
+    assert sr400.query("NN", timeout=0.1) is None
+    assert 0.1 <= time.monotonic() - start < 0.5
+
+#-----Lotes de comandos ------
+def _record_lines(sr400):
+    lines = []
+    write = sr400._write_command
+    sr400._write_command = lambda command, *args, **kwargs: lines.append(command) or write(command, *args, **kwargs)
+    return lines
+
+def test_batch_sends_one_line_and_checks_status_once(sr400, device):
+    lines = _record_lines(sr400)
+    with sr400.batch() as batch:
+        sr400.set_discriminator_level(DiscriminatorChannel.A, 0.02)
+        sr400.set_discriminator_level(DiscriminatorChannel.B, -0.02)
+        sr400.set_dwell_time(0.01)
+    assert batch.ok
+    assert lines == ["DL0,0.0200;DL1,-0.0200;DT0.01", "SS"]
+    assert device.settings['DL0'] == 0.02 and device.settings['DL1'] == -0.02
+
+def test_nested_batch_joins_outer(sr400):
+    lines = _record_lines(sr400)
+    with sr400.batch():
+        sr400.set_dwell_time(0.01)
+        with sr400.batch():
+            sr400.set_scan_periods(5)
+        assert lines == []
+    assert lines == ["DT0.01;NP5", "SS"]
+
+def test_pack_commands_respects_line_limit():
+    commands = [f"DL0,0.{i:04d}" for i in range(40)]
+    lines = SR400._pack_commands(commands)
+    assert all(len(line) + 1 <= SR400.MAX_COMMAND_LINE for line in lines)
+    assert ";".join(lines).split(";") == commands
+
+def test_rejected_batch_invalidates_its_settings(sr400):
+    sr400.set_dwell_time(0.01)
+    with sr400.batch() as batch:
+        sr400.set_discriminator_level(DiscriminatorChannel.A, 0.02)
+        #Nivel válido para el cliente pero con un canal que el equipo no tiene
+        sr400.send_command("DL7,0.01")
+    assert not batch.ok
+    assert any("rechazó" in error for error in sr400.errors)
+    assert 'DL0' not in sr400.get_cached_settings()
+    assert sr400.get_cached_settings()['DT'] == 0.01
+
+#-----Protocolo ------
+def test_commands_use_zero_based_channels(sr400, device):
+    lines = _record_lines(sr400)
+    sr400.set_discriminator_level(DiscriminatorChannel.A, 0.02)
+    sr400.set_input_source(DiscriminatorChannel.T, sr400_controller.InputSource.MHZ_10)
+    sr400.set_gate_mode(sr400_controller.GateChannel.B, sr400_controller.GateMode.FIXED)
+    sr400.set_count_mode(sr400_controller.CountMode.A_MINUS_B)
+    _sync(sr400)
+    #A = 0, B = 1, T = 2; la puerta se programa con GM y CM queda para el modo de conteo
+    assert lines[:4] == ["DL0,0.0200", "CI2,0", "GM1,1", "CM1"]
+    assert device.settings['DL0'] == 0.02 and device.settings['GM1'] == 1 and device.settings['CM'] == 1
+
+#-----Curva S ------
+def _strong_source(device):
+    #Tasa alta para que el ruido Poisson de cada punto sea de pocos %
+    device.inputs[1] = PulseSource(max_rate=40000.0, width=0.03)
+    return device.inputs[1]
+
+def test_scan_s_curve_in_hz(sr400, device):
+    source = _strong_source(device)
+    sr400.set_default_configuration()
+    thresholds, rates = sr400.measure_s_curve(DiscriminatorChannel.A, -0.1, 0.1, 11, dwell_time=0.05)
+    #Barrido en el instrumento: un solo CS y una sola transferencia EA
+    assert device.received.count("EA") == 1
+    assert "DM0,1" in device.received and "DY0,0.0200" in device.received
+    expected = [source.rate(t, slope=1) for t in thresholds]
+    assert np.allclose(rates, expected, rtol=0.15, atol=400)
+    #Al terminar el discriminador vuelve a nivel fijo y al threshold original
+    assert device.settings['DM0'] == 0 and device.settings['DL0'] == -0.01
+
+def test_scan_restores_the_settings_it_changes(sr400, device):
+    _strong_source(device)
+    sr400.set_input_source(DiscriminatorChannel.T, sr400_controller.InputSource.TRIG)
+    sr400.set_count_period(0.2)
+    sr400.set_dwell_time(0.01)
+    sr400.set_scan_periods(7)
+    sr400.set_discriminator_scan_step(DiscriminatorChannel.A, 0.001)
+    before = sr400.get_cached_settings()
+    sr400.measure_s_curve(DiscriminatorChannel.A, -0.1, 0.1, 11, dwell_time=0.05)
+    _sync(sr400)
+    #T, periodo, dwell, periodos y paso vuelven a lo que había, en el equipo y en la copia local
+    assert device.settings['CI2'] == 3 and device.settings['CP2'] == 2e6
+    assert device.settings['DT'] == 0.01 and device.settings['NP'] == 7 and device.settings['DY0'] == 0.001
+    after = sr400.get_cached_settings()
+    assert all(after[key] == value for key, value in before.items())
+    assert sr400.count_period == 0.2
+
+def _record_count_windows(device):
+    #Tiempo que el equipo virtual contó realmente entre CS y CH en cada punto
+    windows = []
+    start, stop = device._start_count, device._stop_count
+    def _start():
+        windows.append(time.monotonic())
+        start()
+    def _stop():
+        stop()
+        windows[-1] = min(time.monotonic() - windows[-1], device.count_period)
+    device._start_count, device._stop_count = _start, _stop
+    return windows
+
+def test_host_and_scan_s_curves_agree(sr400, device):
+    _strong_source(device)
+    sr400.set_default_configuration()
+    _, scan = sr400.measure_s_curve(DiscriminatorChannel.A, -0.1, 0.1, 6, dwell_time=0.1)
+    windows = _record_count_windows(device)
+    _, host = sr400.measure_s_curve(DiscriminatorChannel.A, -0.1, 0.1, 6, dwell_time=0.1, use_scan=False)
+    #Las dos rutas devuelven Hz, no conteos por dwell. El dwell del host se mide con el reloj
+    #de la PC y la latencia del enlace lo alarga; se corrige con lo que el equipo contó
+    assert len(windows) == len(host)
+    corrected = host * 0.1 / np.array(windows)
+    assert np.allclose(scan, corrected, rtol=0.15, atol=400)
+
+def test_scan_step_limits():
+    assert sr400_controller.scan_step(-0.1, 0.1, 11) == 0.02
+    assert sr400_controller.scan_step(-0.1, 0.1, 5) is None
+    assert sr400_controller.scan_step(0.0, 0.0, 5) is None
+    assert sr400_controller.scan_step(0.0, 0.1, 1) is None
+
+def test_large_step_falls_back_to_host_sweep(sr400, device):
+    thresholds, rates = sr400.measure_s_curve(DiscriminatorChannel.A, -0.1, 0.1, 5, dwell_time=0.01)
+    assert len(rates) == 5
+    assert "EA" not in device.received and "DM0,1" not in device.received
+    with pytest.raises(ValueError):
+        sr400_controller.measure_s_curve_scan(sr400, DiscriminatorChannel.A, -0.1, 0.1, 5, 0.01)
+
+def test_rejected_scan_setting_aborts(sr400, device, monkeypatch):
+    monkeypatch.setattr(sr400, "set_discriminator_scan_step", lambda channel, step: False)
+    with pytest.raises(RuntimeError):
+        sr400.measure_s_curve(DiscriminatorChannel.A, -0.1, 0.1, 11, dwell_time=0.01)
+    assert "CS" not in device.received
+
+def _logistic(threshold):
+    #Transición abrupta en 0.02 V, sin ruido
+    return 1000.0 / (1.0 + math.exp((threshold - 0.02) / 0.004))
+
+def test_adaptive_points_concentrate_on_transition():
+    thresholds, rates = sr400_controller.adaptive_s_curve(_logistic, -0.2, 0.2, 40)
+    assert len(thresholds) == 40 and np.all(np.diff(thresholds) > 0)
+    assert np.allclose(rates, [_logistic(t) for t in thresholds])
+    #La transición ocupa el 10% del rango pero recibe buena parte de los puntos
+    near = np.abs(thresholds - 0.02) <= 0.02
+    assert near.sum() >= 15
+    #Los niveles respetan la resolución del discriminador
+    resolution = sr400_controller.LEVEL_RESOLUTION
+    assert np.allclose(np.round(thresholds / resolution) * resolution, thresholds)
+
+def test_adaptive_ignores_noise_on_plateaus():
+    flat = lambda threshold: 500.0 + 10.0 * math.sin(threshold * 1e4)
+    #Con un error esperado mayor que las variaciones todos los intervalos pesan igual
+    thresholds, _ = sr400_controller.adaptive_s_curve(flat, -0.2, 0.2, 21, coarse_steps=11,
+                                                      uncertainty=lambda rate: 50.0)
+    assert np.ptp(np.diff(thresholds)) < 1e-9
+
+def test_adaptive_stops_when_cancelled():
+    measured = []
+    thresholds, _ = sr400_controller.adaptive_s_curve(
+        _logistic, -0.2, 0.2, 40, point_callback=lambda t, rate: measured.append(t),
+        should_cancel=lambda: len(measured) >= 12)
+    assert len(thresholds) == 12
+
+def test_adaptive_s_curve_on_device(sr400, device):
+    _strong_source(device)
+    sr400.set_default_configuration()
+    #Con dwell corto la latencia del CH pesa en la tasa y el barrido perseguiría ese error
+    thresholds, rates = sr400.measure_s_curve(DiscriminatorChannel.A, -0.2, 0.2, 12,
+                                              dwell_time=0.1, adaptive=True)
+    assert len(thresholds) == 12 and not np.isnan(rates).any()
+    #Barrido punto a punto desde el host
+    assert "EA" not in device.received
+    #La transición es el 30% del rango; una malla uniforme pondría ahí unos 4 puntos
+    assert np.sum(np.abs(thresholds) <= 0.06) >= 6
+
+#-----Dwell con parada temprana ------
+def test_count_until_stops_at_target_error(sr400, device):
+    source = _strong_source(device)
+    sr400.set_default_configuration()
+    control = DwellControl(target_error=0.05, min_dwell=0.05, max_dwell=1.0, slice_time=0.02)
+    rate, counts, elapsed = sr400_controller.count_until(sr400, control)
+    assert counts >= control.target_counts
+    assert control.min_dwell <= elapsed < control.max_dwell / 2
+    assert rate == pytest.approx(source.rate(-0.01, slope=1), rel=0.3)
+
+def test_count_until_low_rate_runs_to_max_dwell(sr400, device):
+    device.inputs[1] = PulseSource(max_rate=50.0, width=0.03)
+    sr400.set_default_configuration()
+    control = DwellControl(target_error=0.01, min_dwell=0.05, max_dwell=0.2, slice_time=0.05)
+    _, counts, elapsed = sr400_controller.count_until(sr400, control)
+    assert counts < control.target_counts
+    assert elapsed >= control.max_dwell
+
+def test_host_sweep_restores_count_period(sr400, device):
+    sr400.set_count_period(0.05)
+    sr400.measure_s_curve(DiscriminatorChannel.A, -0.1, 0.1, 3, dwell_time=0.05, use_scan=False)
+    #Durante el barrido el periodo cubrió el dwell con margen
+    assert "CP2,1E6" in device.received
+    _sync(sr400)
+    assert device.settings['CP2'] == 5e5 and sr400.count_period == 0.05
+
+def test_quick_measure_with_dwell_control_restores_count_period(sr400, device):
+    _strong_source(device)
+    sr400.set_count_period(0.05)
+    control = DwellControl(target_error=0.05, min_dwell=0.05, max_dwell=0.3, slice_time=0.02)
+    assert sr400_controller.quick_measure(sr400, dwell_control=control) > 0
+    _sync(sr400)
+    assert device.settings['CP2'] == 5e5
+
+#-----Streaming ------
+def test_stream_counts_delivers_each_period(sr400, device):
+    sr400.set_default_configuration()
+    sr400.set_count_period(0.02)
+    sr400.set_dwell_time(sr400.SCAN_DWELL_TIME)
+    records = list(sr400.stream_counts(5))
+    assert [record.period for record in records] == list(range(5))
+    assert all(np.isfinite(record.count_a) and np.isnan(record.count_b) for record in records)
+    #Los mismos conteos quedan guardados en el equipo
+    assert [record.count_a for record in records] == device.data[0]
+
+    records = list(sr400.stream_counts(3, command="FB"))
+    assert [record.count_b for record in records] == device.data[1]
+
+def test_stream_counts_refuses_queries(sr400):
+    sr400.set_count_period(0.05)
+    for record in sr400.stream_counts(2):
+        assert sr400.query("NN") is None
+    assert any("streaming en curso" in error for error in sr400.errors)
+    #Al terminar el streaming las consultas vuelven a funcionar
+    assert sr400.query("NN") == "2"
+
+def test_stream_counts_times_out_when_device_stops(sr400, device):
+    sr400.set_count_period(0.02)
+    stream = sr400.stream_counts(50)
+    next(stream)
+    device._write = lambda text: None
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        for record in stream:
+            pass
+    #Un periodo más el timeout, no el scan completo
+    assert time.monotonic() - start < 0.02 + sr400.SCAN_DWELL_TIME + sr400.timeout + 0.5
+
+def test_stream_counts_rejects_unknown_command(sr400):
+    with pytest.raises(ValueError):
+        list(sr400.stream_counts(2, command="EA"))
+
+#-----Scheduler ------
+def test_scheduler_runs_by_priority_then_fifo():
+    scheduler = CommandScheduler("prueba")
+    scheduler.start()
+    release = threading.Event()
+    order = []
+    try:
+        scheduler.submit(release.wait)
+        futures = [scheduler.submit(order.append, name, priority=priority) for name, priority in [
+            ("estado", CommandPriority.STATUS),
+            ("adquisición", CommandPriority.ACQUISITION),
+            ("usuario 1", CommandPriority.USER),
+            ("usuario 2", CommandPriority.USER),
+        ]]
+        release.set()
+        for future in futures:
+            future.result(timeout=1.0)
+    finally:
+        scheduler.stop()
+    assert order == ["usuario 1", "usuario 2", "adquisición", "estado"]
+
+def test_scheduler_stop_finishes_pending_work():
+    scheduler = CommandScheduler("prueba")
+    scheduler.start()
+    release = threading.Event()
+    scheduler.submit(release.wait)
+    futures = [scheduler.submit(lambda i=i: i, priority=CommandPriority.STATUS) for i in range(3)]
+    threading.Timer(0.05, release.set).start()
+    scheduler.stop()
+    assert not scheduler.is_running
+    assert [future.result(timeout=0) for future in futures] == [0, 1, 2]
+
+def test_concurrent_queries_do_not_mix_replies(sr400):
+    levels = {0: 0.01, 1: 0.02, 2: 0.03}
+    with sr400.batch():
+        for channel, level in levels.items():
+            sr400.set_discriminator_level(DiscriminatorChannel(channel), level)
+    replies = []
+
+    def worker(channel):
+        for _ in range(10):
+            replies.append((channel, sr400.query(f"DZ{channel}")))
+
+    threads = [threading.Thread(target=worker, args=(channel % 3,)) for channel in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(replies) == 60
+    assert all(float(reply) == levels[channel] for channel, reply in replies)
+
+#-----Copia local de ajustes ------
+def _sync(sr400):
+    #Los ajustes no esperan respuesta: una consulta asegura que el equipo ya los procesó
+    sr400.query("NN")
+
+def test_written_settings_are_served_from_cache(sr400, device):
+    sr400.set_discriminator_level(DiscriminatorChannel.A, 0.05)
+    received = len(device.received)
+    assert sr400.get_discriminator_level(DiscriminatorChannel.A) == 0.05
+    assert len(device.received) == received
+    #refresh=True consulta al equipo
+    _sync(sr400)
+    device.settings['DL0'] = 0.07
+    assert sr400.get_discriminator_level(DiscriminatorChannel.A, refresh=True) == 0.07
+
+def test_unknown_setting_is_queried_once(sr400, device):
+    assert sr400.get_setting(('CP', 2)) == 1e7
+    received = len(device.received)
+    assert sr400.get_setting(('CP', 2)) == 1e7
+    assert len(device.received) == received
+    assert sr400.get_cached_settings()['CP2'] == 1e7
+
+def test_cache_ttl_expires(sr400, device):
+    sr400.cache_ttl = 0.05
+    sr400.set_dwell_time(0.01)
+    _sync(sr400)
+    device.settings['DT'] = 0.5
+    assert sr400.get_setting(('DT',)) == 0.01
+    time.sleep(0.06)
+    assert sr400.get_setting(('DT',)) == 0.5
+
+def test_scan_mode_level_is_read_live(sr400, device):
+    with sr400.batch():
+        sr400.set_discriminator_mode(DiscriminatorChannel.A, DiscriminatorMode.SCAN)
+        sr400.set_discriminator_level(DiscriminatorChannel.A, -0.02)
+        sr400.set_discriminator_scan_step(DiscriminatorChannel.A, 0.01)
+    with device._lock:
+        device.position = 3
+    #El nivel avanzó con el scan: no sirve el valor inicial de la copia local
+    assert sr400.get_discriminator_level(DiscriminatorChannel.A) == pytest.approx(0.01)
+    assert 'DL0' in sr400.get_cached_settings()
+    assert sr400.get_cached_settings()['DL0'] == -0.02
+
+def test_query_inside_batch_sends_pending_commands(sr400, device):
+    with sr400.batch() as batch:
+        sr400.set_discriminator_level(DiscriminatorChannel.B, 0.04)
+        #Sin enviar antes el lote, la consulta vería el valor anterior o se quedaría sin respuesta
+        assert sr400.query("DL1") == "0.0400"
+        sr400.set_dwell_time(0.01)
+    assert batch.ok
+    assert device.settings['DT'] == 0.01
+
+#-----Estadísticas de comandos ------
+def test_command_mnemonic():
+    assert sr400_controller.command_mnemonic("DL0,0.1000") == "DL"
+    assert sr400_controller.command_mnemonic("cs") == "CS"
+    assert sr400_controller.command_mnemonic("*IDN?") == "*IDN"
+    assert sr400_controller.command_mnemonic(";") == "?"
+
+def test_stats_count_batched_commands_and_latencies():
+    stats = sr400_controller.CommandStats()
+    stats.record_sent("DL0,0.1000;DY0,0.0100\r", sleep_time=0.05)
+    stats.record_reply("QA1", 7, 0.004, 0.004)
+    stats.record_reply("QA2", 7, 0.03, 0.03)
+    stats.record_reply("QA3", 0, 0.3)
+    snapshot = stats.snapshot()
+    assert snapshot["DL"]['count'] == 1 and snapshot["DL"]['bytes_sent'] == len("DL0,0.1000;")
+    #La espera de la línea se reparte entre sus dos comandos
+    assert snapshot["DL"]['sleep_time'] == snapshot["DY"]['sleep_time'] == 0.025
+    qa = snapshot["QA"]
+    assert qa['bytes_received'] == 14 and qa['timeouts'] == 1
+    assert qa['mean_latency'] == pytest.approx(0.017) and qa['max_latency'] == 0.03
+    #p95: límite superior del intervalo que contiene la respuesta más lenta
+    assert qa['p95_latency'] == 0.05 and sum(qa['histogram']) == 2
+    stats.reset()
+    assert stats.snapshot() == {}
+
+def test_joined_line_splits_sleep_time():
+    stats = sr400_controller.CommandStats()
+    stats.record_sent("DL0,0.1000;DL1,0.1000;DY0,0.0100;DT0.01\r", sleep_time=0.2)
+    stats.record_sent("CS", sleep_time=0.1)
+    snapshot = stats.snapshot()
+    #Cada comando carga su parte, no el último mnemónico de la línea
+    assert snapshot["DL"]['sleep_time'] == pytest.approx(0.1)
+    assert snapshot["DY"]['sleep_time'] == pytest.approx(0.05) and snapshot["DT"]['sleep_time'] == pytest.approx(0.05)
+    assert snapshot["CS"]['sleep_time'] == 0.1
+    assert sum(stat['sleep_time'] for stat in snapshot.values()) == pytest.approx(0.3)
+
+def test_link_usage():
+    stats = sr400_controller.CommandStats()
+    stats.record_sent("CS")
+    stats.record_reply("XA", 8, 0.01, 0.01)
+    stats.started -= 1.0
+    #11 bytes de 10 bits en 1 s sobre 1100 baudios: 10% del enlace
+    assert stats.link_usage(1100) == pytest.approx(0.1, rel=0.05)
+    assert stats.link_usage(0) == 0.0
+
+def test_client_records_queries_and_timeouts(sr400, device):
+    sr400.reset_command_stats()
+    for _ in range(3):
+        assert sr400.query("NN") is not None
+    stats = sr400.get_command_stats()
+    assert stats["NN"]['count'] == 3 and sum(stats["NN"]['histogram']) == 3
+    assert stats["NN"]['mean_latency'] < 0.3
+    device._write = lambda text: None
+    assert sr400.query("SS", timeout=0.05) is None
+    assert sr400.get_command_stats()["SS"]['timeouts'] == 1
+    assert 0 < sr400.get_link_usage() < 1
+
+#-----Reconexión ------
+def _silence(device):
+    #El equipo sigue recibiendo pero deja de responder (enlace muerto con el puerto abierto)
+    device._write = lambda text: None
+
+def test_timeout_limit_triggers_recovery(sr400, device):
+    sr400.reconnect_policy = ReconnectPolicy(max_attempts=2, initial_delay=0.01, timeout_limit=3)
+    attempts = []
+    reopen = sr400._reopen_port
+    sr400._reopen_port = lambda: attempts.append(1) or reopen()
+    _silence(device)
+
+    for _ in range(2):
+        assert sr400.query("NN") is None
+    #Por debajo del límite no se intenta reconectar
+    assert attempts == []
+    assert sr400.is_connected
+
+    assert sr400.query("NN") is None
+    assert len(attempts) == 2
+    assert not sr400.is_connected
+    assert any("3 consultas sin respuesta" in error for error in sr400.errors)
+
+def test_answered_query_resets_missed_replies(sr400, device):
+    sr400.reconnect_policy = ReconnectPolicy(max_attempts=1, initial_delay=0.01, timeout_limit=2)
+    write = device._write
+    _silence(device)
+    assert sr400.query("NN") is None
+    device._write = write
+    assert sr400.query("NN") == "0"
+    _silence(device)
+    assert sr400.query("NN") is None
+    #Dos consultas perdidas pero no seguidas: el enlace sigue supervisado
+    assert sr400.is_connected
+
+def test_recovers_after_link_drop_and_reapplies_settings(sr400, device):
+    sr400.reconnect_policy = ReconnectPolicy(max_attempts=8, initial_delay=0.1)
+    statuses = []
+    sr400.on_status_changed = statuses.append
+    assert sr400.set_discriminator_level(DiscriminatorChannel.A, 0.05)
+    assert sr400.query("DL 0") == "0.0500"
+
+    device.drop_link(0.3)
+    #El equipo vuelve con los valores de encendido
+    device.reset()
+    assert sr400.query("NN") == "0"
+
+    assert sr400.reconnections == 1
+    assert sr400.is_connected
+    assert statuses[:2] == ["Reconectando", "Reconectado"]
+    assert device.settings['DL0'] == 0.05
+
+def test_recovery_gives_up_after_max_attempts(sr400, device):
+    sr400.reconnect_policy = ReconnectPolicy(max_attempts=2, initial_delay=0.01, max_delay=0.01)
+    device.stop()
+    assert sr400.query("NN") is None
+    assert not sr400.is_connected
+    assert any("Se perdió la conexión" in error for error in sr400.errors)
+
+def test_host_sweep_stores_failing_point_as_nan(sr400, monkeypatch):
+    measure_point = sr400_controller._measure_point
+    calls = []
+
+    def flaky(self, channel, threshold_v, dwell_time, dwell_control=None):
+        calls.append(threshold_v)
+        if math.isclose(threshold_v, 0.0):
+            return None
+        return measure_point(self, channel, threshold_v, dwell_time, dwell_control)
+
+    monkeypatch.setattr(sr400_controller, "_measure_point", flaky)
+    thresholds, rates = sr400.measure_s_curve(DiscriminatorChannel.A, -0.02, 0.02, 3, dwell_time=0.01,
+                                              use_scan=False)
+    assert np.allclose(thresholds, [-0.02, 0.0, 0.02])
+    assert np.isnan(rates[1]) and np.all(np.isfinite(rates[[0, 2]]))
+    #El punto fallido se repite POINT_ATTEMPTS veces
+    assert sum(math.isclose(t, 0.0) for t in calls) == sr400_controller.POINT_ATTEMPTS
+    assert sr400.is_connected
+
+def test_reconnect_delays_back_off():
+    policy = ReconnectPolicy(max_attempts=5, initial_delay=0.25, max_delay=1.0, factor=2.0)
+    assert list(policy.delays()) == [0.25, 0.5, 1.0, 1.0, 1.0]
+
+def test_disabled_policy_only_reports(sr400, device):
+    sr400.reconnect_policy = ReconnectPolicy(enabled=False, timeout_limit=1)
+    attempts = []
+    sr400._reopen_port = lambda: attempts.append(1)
+    _silence(device)
+    assert sr400.query("NN", timeout=0.05) is None
+    assert attempts == [] and sr400.is_connected
+
+def test_host_sweep_keeps_points_before_lost_link(sr400, device, monkeypatch):
+    sr400.reconnect_policy = ReconnectPolicy(max_attempts=2, initial_delay=0.01, max_delay=0.01)
+    measure_point = sr400_controller._measure_point
+
+    def drop_at_zero(self, channel, threshold_v, dwell_time, dwell_control=None):
+        if math.isclose(threshold_v, 0.0):
+            device.stop()
+        return measure_point(self, channel, threshold_v, dwell_time, dwell_control)
+
+    monkeypatch.setattr(sr400_controller, "_measure_point", drop_at_zero)
+    thresholds, rates = sr400.measure_s_curve(DiscriminatorChannel.A, -0.02, 0.02, 3, dwell_time=0.01,
+                                              use_scan=False)
+    #La curva termina en el último punto bueno, sin ceros ni NaN de relleno
+    assert np.allclose(thresholds, [-0.02]) and np.all(np.isfinite(rates))
+    assert not sr400.is_connected
+    assert any("Curva S interrumpida en el punto 2/3" in error for error in sr400.errors)
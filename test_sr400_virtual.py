@@ -0,0 +1,82 @@
+# test_sr400_virtual.py
+"""
+Pruebas del SR400 virtual hablando el protocolo directamente por el pty
+"""
+
+import time
+
+import pytest
+import serial
+
+from sr400_virtual import VirtualSR400, STATUS_PARAMETER_ERROR, STATUS_COMMAND_ERROR
+
+@pytest.fixture
+def port(device):
+    with serial.Serial(device.port, device.baudrate, timeout=1.0) as ser:
+        yield ser
+
+def _ask(port, command):
+    port.write(f"{command}\r".encode('ascii'))
+    return port.readline().decode('ascii').strip()
+
+def _lines(port, n):
+    return [port.readline().decode('ascii').strip() for _ in range(n)]
+
+def test_channels_are_zero_based(port):
+    port.write(b"DL0,0.05;DL2,-0.1;CP2,1E5\r")
+    assert _ask(port, "DL0") == "0.0500"
+    assert _ask(port, "DL2") == "-0.1000"
+    assert _ask(port, "CP2") == "100000"
+    assert _ask(port, "SS") == "0"
+    #No hay discriminador 3 ni preset del contador A
+    port.write(b"DL3,0.1\r")
+    assert int(_ask(port, "SS")) & STATUS_PARAMETER_ERROR
+    port.write(b"CP0,1E5\r")
+    assert int(_ask(port, "SS")) & STATUS_PARAMETER_ERROR
+    #El status byte se borra al leerlo
+    assert _ask(port, "SS") == "0"
+
+def test_slope_and_scan_step_commands(port):
+    port.write(b"DS0,0;DY0,0.02\r")
+    assert _ask(port, "DS0") == "0"
+    assert _ask(port, "DY0") == "0.0200"
+    #DS es la pendiente (0 o 1), no el paso
+    port.write(b"DS0,0.01\r")
+    assert int(_ask(port, "SS")) & STATUS_PARAMETER_ERROR
+    port.write(b"DP0,1\r")
+    assert int(_ask(port, "SS")) & STATUS_COMMAND_ERROR
+
+def test_scan_advances_level_and_stores_points(port, device):
+    port.write(b"CP2,1E5;DT0.002;NP4;DM0,1;DL0,-0.02;DY0,0.01;CR;CS\r")
+    time.sleep(4 * 0.012 + 0.1)
+    assert _ask(port, "NN") == "4"
+    #Al terminar, el nivel quedó en el último paso
+    assert _ask(port, "DZ0") == "0.0200"
+    assert _ask(port, "DL0") == "-0.0200"
+
+    stored = [str(value) for value in device.data[0]]
+    assert len(stored) == 4
+    assert _ask(port, "QA1") == stored[0]
+    #Sin índice: el último periodo completo
+    assert _ask(port, "QA") == stored[-1]
+    port.write(b"EA\r")
+    assert _lines(port, 4) == stored
+    port.write(b"QA9\r")
+    assert int(_ask(port, "SS")) & STATUS_PARAMETER_ERROR
+
+def test_fa_and_fb_send_each_period(port, device):
+    port.write(b"CP2,1E5;DT0.002;NP3;CR;FA\r")
+    counts_a = _lines(port, 3)
+    assert counts_a == [str(value) for value in device.data[0]]
+    port.write(b"CR;FB\r")
+    counts_b = _lines(port, 3)
+    assert counts_b == [str(value) for value in device.data[1]]
+
+def test_counts_are_reproducible_with_seed():
+    data = []
+    for _ in range(2):
+        with VirtualSR400(baudrate=115200, seed=3) as device:
+            with serial.Serial(device.port, device.baudrate, timeout=1.0) as port:
+                port.write(b"CP2,1E5;DT0.002;NP5;CR;FA\r")
+                data.append(_lines(port, 5))
+    assert data[0] == data[1]